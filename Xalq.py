@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 from PySide6.QtWidgets import QApplication, QSplashScreen
 from PySide6.QtGui import QPixmap, QPainter, QColor, QFont
 from PySide6.QtCore import Qt, QTimer
@@ -77,4 +78,6 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    # Required for the DOCX render process pool in the frozen executable
+    multiprocessing.freeze_support()
     main()
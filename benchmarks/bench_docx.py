@@ -0,0 +1,88 @@
+"""
+DOCX rendering benchmark on a 14-section, ~500-line report: python-docx
+add_paragraph per line on a freshly parsed template (previous
+generate_word_report) vs the cached skeleton + bulk XML emitter in
+core/docx_renderer.py. Fails if the two documents differ.
+
+    python benchmarks/bench_docx.py --repeat 20 --lines 500
+"""
+import os
+import sys
+import time
+import zipfile
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from docx import Document
+
+from core.response_parser import SECTIONS
+from core.docx_renderer import render_report, report_paragraphs
+
+TEMPLATE = os.path.join(ROOT, 'templates', 'template_xalq.docx')
+
+
+def make_report(lines):
+    per_section = max(1, lines // len(SECTIONS))
+    kinds = ["- Tópico {n} com detalhes de processos & dados",
+             "{n}. Passo numerado com prazo e responsável",
+             "Parágrafo corrido número {n}, com texto de análise."]
+    return {
+        section: "\n".join(kinds[n % 3].format(n=n) for n in range(per_section))
+        for section in SECTIONS
+    }
+
+
+def legacy_render(parsed_data, out_path):
+    """generate_word_report before the skeleton cache and the fast emitter."""
+    doc = Document(TEMPLATE)
+    for i in range(len(doc.paragraphs) - 1, -1, -1):
+        p = doc.paragraphs[i]
+        p._element.getparent().remove(p._element)
+    for i in range(len(doc.tables) - 1, -1, -1):
+        t = doc.tables[i]
+        t._element.getparent().remove(t._element)
+    for style, text in report_paragraphs(parsed_data):
+        if text is None:
+            doc.add_paragraph()
+        else:
+            doc.add_paragraph(text, style=style)
+    doc.save(out_path)
+    return out_path
+
+
+def document_xml(path):
+    with zipfile.ZipFile(path) as package:
+        return package.read('word/document.xml')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--lines', type=int, default=500)
+    args = parser.parse_args()
+
+    report = make_report(args.lines)
+    out_dir = tempfile.mkdtemp(prefix="xalq-bench-docx-")
+    legacy_path, fast_path = os.path.join(out_dir, 'legacy.docx'), os.path.join(out_dir, 'fast.docx')
+    if document_xml(legacy_render(report, legacy_path)) != document_xml(render_report(report, TEMPLATE, fast_path)):
+        sys.exit("Output mismatch between legacy and fast renderer")
+
+    paragraphs = len(report_paragraphs(report))
+    print(f"{paragraphs} paragraphs per report, identical document.xml")
+    print(f"{'renderer':>10} {'ms/report':>10}")
+    timings = {}
+    for name, render in [("legacy", lambda: legacy_render(report, legacy_path)),
+                         ("fast", lambda: render_report(report, TEMPLATE, fast_path))]:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            render()
+        timings[name] = (time.perf_counter() - started) / args.repeat * 1000
+        print(f"{name:>10} {timings[name]:>10.1f}")
+    print(f"speedup: {timings['legacy'] / timings['fast']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
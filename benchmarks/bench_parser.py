@@ -0,0 +1,139 @@
+"""
+Micro-benchmark of WorkerEngine.parse_response: previous implementation (one
+regex scan per section + per-line header loop) vs the single-pass parser in
+core/response_parser.py. Fails if any response parses differently.
+
+Corpus: cached real responses (cache/responses/*.json) when present, plus
+synthetic tagged, header-style and malformed answers.
+
+    python benchmarks/bench_parser.py --repeat 200 --corpus cache/responses
+"""
+import os
+import re
+import sys
+import json
+import glob
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.response_parser import SECTIONS, parse_tagged, parse_headers
+from core.fake_backend import FakeBackend
+
+
+def legacy_parse(ai_response):
+    """parse_response as it was before the single-pass parser (reference output)."""
+    parsed_data = {}
+    for section in SECTIONS:
+        pattern = fr"\[{section}\](.*?)\[/{section}\]"
+        match = re.search(pattern, ai_response, re.DOTALL | re.IGNORECASE)
+        parsed_data[section] = match.group(1).strip() if match else ""
+
+    if sum(1 for v in parsed_data.values() if v) < 3:
+        clean_response = ai_response.replace("*", "").replace("#", "")
+        current_section = None
+        map_headers = {
+            "RESUMO EXECUTIVO": "RESUMO_EXECUTIVO",
+            "DIAGNOSTICO": "DIAGNOSTICO",
+            "LACUNAS": "LACUNAS",
+            "CLASSIFICACAO": "CLASSIFICACAO",
+            "ESTRUTURA TO BE": "ESTRUTURA_TO_BE",
+            "ESTRUTURA TO-BE": "ESTRUTURA_TO_BE",
+            "MATRIZ DE METRICAS": "MATRIZ_DE_METRICAS",
+            "ARQUITETURA CONCEITUAL": "ARQUITETURA_CONCEITUAL_DE_DADOS",
+            "PERGUNTAS DECISORIAS": "PERGUNTAS_DECISORIAS",
+            "KPIS ASSOCIADOS": "KPIS_ASSOCIADOS",
+            "VISUALIZACAO CONCEITUAL": "VISUALIZACAO_CONCEITUAL",
+            "RISCOS ATUAIS": "RISCOS_ATUAIS",
+            "RISCOS SE NAO": "RISCOS_SE_NAO_IMPLEMENTAR",
+            "OBSERVACOES": "OBSERVACOES_XALQ",
+            "PROXIMOS PASSOS": "PROXIMOS_PASSOS",
+        }
+        for line in clean_response.split('\n'):
+            upper_line = line.strip().upper().replace(":", "").replace("Á", "A").replace("É", "E").replace("Ó", "O").replace("Ê", "E")
+            found = False
+            for k, v in map_headers.items():
+                if k in upper_line and len(upper_line) < 50:
+                    current_section = v
+                    found = True
+                    break
+            if found:
+                continue
+            if current_section:
+                parsed_data[current_section] = parsed_data.get(current_section, "") + line + "\n"
+    return parsed_data
+
+
+def single_pass_parse(ai_response):
+    """Same steps as WorkerEngine.parse_response, without the engine."""
+    parsed = parse_tagged(ai_response)
+    if sum(1 for v in parsed.values() if v) < 3:
+        parse_headers(ai_response, parsed)
+    return parsed
+
+
+def synthetic_corpus():
+    body = "\n".join(f"- Ponto {i}: análise detalhada com **negrito** e números {i * 7}" for i in range(40))
+    tagged = FakeBackend.canned_response("empresa exemplo").replace("Texto corrido.", body)
+    headers = "\n".join(
+        f"## {title}:\n{body}" for title in [
+            "Resumo Executivo", "DIAGNÓSTICO", "Lacunas", "Classificação", "Estrutura TO-BE",
+            "Matriz de Métricas", "Arquitetura Conceitual", "Perguntas Decisórias", "KPIs Associados",
+            "Visualização Conceitual", "Riscos Atuais", "Riscos se não implementar",
+            "Observações XALQ", "Próximos Passos",
+        ]
+    )
+    return [
+        tagged,
+        tagged.lower(),
+        tagged[: len(tagged) // 2],                       # truncated stream
+        "Intro\n" + tagged.replace("[/LACUNAS]", "") + "\n[LACUNAS]extra[/LACUNAS]",
+        "[RESUMO_EXECUTIVO][/RESUMO_EXECUTIVO][RESUMO_EXECUTIVO]x[/RESUMO_EXECUTIVO]" + tagged,
+        headers,
+        "[RESUMO_EXECUTIVO]só um[/RESUMO_EXECUTIVO]\n" + headers,
+        "",
+    ]
+
+
+def load_corpus(directory):
+    responses = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                response = json.load(f).get("response")
+        except (OSError, ValueError):
+            continue
+        if isinstance(response, str):
+            responses.append(response)
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--corpus', default=os.path.join(ROOT, 'cache', 'responses'))
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus) + synthetic_corpus()
+    for i, response in enumerate(corpus):
+        if legacy_parse(response) != single_pass_parse(response):
+            sys.exit(f"Output mismatch on corpus item {i}")
+
+    print(f"{len(corpus)} responses, identical output")
+    print(f"{'parser':>12} {'seconds':>8} {'per response (us)':>18}")
+    timings = {}
+    for name, parse in [("legacy", legacy_parse), ("single-pass", single_pass_parse)]:
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            for response in corpus:
+                parse(response)
+        timings[name] = time.perf_counter() - started
+        per_response = timings[name] / (args.repeat * len(corpus)) * 1e6
+        print(f"{name:>12} {timings[name]:>8.3f} {per_response:>18.1f}")
+    print(f"speedup: {timings['legacy'] / timings['single-pass']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
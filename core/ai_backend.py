@@ -0,0 +1,133 @@
+import datetime
+
+
+class GenerationResult:
+    """Outcome of a non-streamed generation. `text` is None when the answer was blocked."""
+
+    def __init__(self, text, prompt_feedback=None):
+        self.text = text
+        self.prompt_feedback = prompt_feedback
+
+
+class GenerationStream:
+    """
+    Iterable of text chunks for a streamed generation. `cancel` aborts the
+    request in flight; `prompt_feedback` is meaningful once iteration ends.
+    """
+
+    prompt_feedback = None
+
+    def __iter__(self):
+        raise NotImplementedError
+
+    def cancel(self):
+        pass
+
+
+class AIBackend:
+    """
+    Interface between WorkerEngine and the model provider.
+
+    Errors are raised as-is: the engine classifies them by message
+    (404/NotFound, 429/ResourceExhausted, 5xx...) for health and retry decisions.
+    `generation_config` is a plain dict with temperature, top_p and max_output_tokens.
+    `cached_prefix` is a handle from `create_cached_prefix` or None.
+    """
+
+    name = "base"
+
+    def configure(self, api_key):
+        pass
+
+    def generate(self, model_name, contents, generation_config, timeout=600, cached_prefix=None):
+        raise NotImplementedError
+
+    def stream(self, model_name, contents, generation_config, timeout=600, cached_prefix=None):
+        raise NotImplementedError
+
+    def count_tokens(self, model_name, text):
+        raise NotImplementedError
+
+    def create_cached_prefix(self, model_name, prefix_text, ttl_seconds):
+        raise NotImplementedError
+
+    def delete_cached_prefix(self, handle):
+        pass
+
+
+class _GeminiStream(GenerationStream):
+    def __init__(self, response):
+        self._response = response
+
+    def __iter__(self):
+        for chunk in self._response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunk without parts (e.g. finish/safety metadata only)
+                continue
+            yield text
+
+    @property
+    def prompt_feedback(self):
+        return self._response.prompt_feedback
+
+    def cancel(self):
+        # Cancels the underlying gRPC stream so the server stops generating
+        iterator = getattr(self._response, '_iterator', None)
+        cancel = getattr(iterator, 'cancel', None)
+        if callable(cancel):
+            try:
+                cancel()
+            except Exception:
+                pass
+
+
+class GeminiBackend(AIBackend):
+    """Google Gemini through the google-generativeai SDK."""
+
+    name = "gemini"
+
+    def __init__(self):
+        import google.generativeai as genai
+        self.genai = genai
+
+    def configure(self, api_key):
+        self.genai.configure(api_key=api_key)
+
+    def _model(self, model_name, cached_prefix):
+        if cached_prefix is not None:
+            return self.genai.GenerativeModel.from_cached_content(cached_content=cached_prefix)
+        return self.genai.GenerativeModel(model_name)
+
+    def generate(self, model_name, contents, generation_config, timeout=600, cached_prefix=None):
+        response = self._model(model_name, cached_prefix).generate_content(
+            contents,
+            generation_config=self.genai.types.GenerationConfig(**generation_config),
+            request_options={'timeout': timeout}
+        )
+        return GenerationResult(response.text if response.parts else None, response.prompt_feedback)
+
+    def stream(self, model_name, contents, generation_config, timeout=600, cached_prefix=None):
+        response = self._model(model_name, cached_prefix).generate_content(
+            contents,
+            generation_config=self.genai.types.GenerationConfig(**generation_config),
+            request_options={'timeout': timeout},
+            stream=True
+        )
+        return _GeminiStream(response)
+
+    def count_tokens(self, model_name, text):
+        return self.genai.GenerativeModel(model_name).count_tokens(text).total_tokens
+
+    def create_cached_prefix(self, model_name, prefix_text, ttl_seconds):
+        if not model_name.startswith('models/'):
+            model_name = 'models/' + model_name
+        return self.genai.caching.CachedContent.create(
+            model=model_name,
+            contents=[prefix_text],
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        )
+
+    def delete_cached_prefix(self, handle):
+        handle.delete()
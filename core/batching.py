@@ -0,0 +1,46 @@
+import re
+
+BATCH_INSTRUCTIONS = """
+ATENÇÃO: esta solicitação contém {count} empresas. Produza a análise COMPLETA de cada uma,
+com todas as seções no formato pedido acima, delimitando cada análise exatamente assim:
+<<<EMPRESA n>>>
+(análise da empresa n)
+<<<FIM EMPRESA n>>>
+Não misture dados de empresas diferentes.
+"""
+
+_SLICE_PATTERN = re.compile(
+    r"<<<\s*EMPRESA\s+(\d+)\s*>>>(.*?)<<<\s*FIM\s+EMPRESA\s+\1\s*>>>", re.DOTALL | re.IGNORECASE
+)
+
+
+def build_batch_prompt(prompt_text, row_blocks):
+    """Packs several rows into one request. `row_blocks` are the serialized rows, in order."""
+    parts = [prompt_text, BATCH_INSTRUCTIONS.format(count=len(row_blocks))]
+    for n, block in enumerate(row_blocks, start=1):
+        parts.append(f"DADOS DO CLIENTE (EMPRESA {n}):\n{block}")
+    return "\n\n".join(parts)
+
+
+def split_batch_response(ai_response, count):
+    """
+    Demultiplexes a batched answer. Returns a list of `count` slices (1-based
+    delimiters in the response, 0-based in the list); missing slices are None.
+    """
+    slices = [None] * count
+    for match in _SLICE_PATTERN.finditer(ai_response or ""):
+        n = int(match.group(1))
+        if 1 <= n <= count and slices[n - 1] is None:
+            slices[n - 1] = match.group(2).strip()
+    return slices
+
+
+def adaptive_batch_size(requested, max_output_tokens, expected_tokens_per_row):
+    """
+    Largest batch (up to `requested`) whose expected answer fits the model's
+    output token limit, keeping ~10% headroom for delimiters.
+    """
+    if requested <= 1 or expected_tokens_per_row <= 0:
+        return max(1, requested)
+    fits = int(max_output_tokens * 0.9) // expected_tokens_per_row
+    return max(1, min(requested, fits))
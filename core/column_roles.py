@@ -0,0 +1,79 @@
+from functools import lru_cache
+
+# Columns whose header contains one of these name the file prefix of each report
+PREFIX_KEYS = ['nome da empresa', 'empresa', 'company']
+# Company name for the report header: tiered, most specific first (header equals or starts with)
+NAME_TIERS = [
+    ['nome da empresa'],
+    ['razão social', 'razao social'],
+    ['cliente', 'company', 'organization'],
+]
+# Column listed in the company selector
+LABEL_KEYS = [
+    'nome da empresa', 'empresa', 'company', 'name', 'cliente', 'organization', 'razão social', 'razao social'
+]
+DATE_KEYS = ['data', 'date', 'time', 'carimbo', 'timestamp', 'hora']
+TIMESTAMP_KEYS = ['carimbo', 'data/hora', 'timestamp']
+PROMPT_SELECTOR_KEY = 'modelo'
+
+
+def _first(columns, match):
+    for col in columns:
+        if match(str(col).lower().strip()):
+            return col
+    return None
+
+
+class ColumnRoles:
+    """
+    Which spreadsheet column plays each role, inferred once per column set.
+
+    - `prefix`: names the report files (None -> "Row_<n>");
+    - `company`: company name for the report header;
+    - `label`: shown in the company selector (always set when there are columns);
+    - `timestamp`: form submission time ("carimbo de data/hora");
+    - `prompt_selector`: the "modelo de atuação" answer that picks the prompt.
+
+    Rows are then read with `row[roles.x]`, instead of scanning the headers per row.
+    """
+
+    def __init__(self, columns):
+        columns = list(columns)
+        self.prefix = _first(columns, lambda c: any(k in c for k in PREFIX_KEYS))
+        self.company = None
+        for tier in NAME_TIERS:
+            self.company = _first(columns, lambda c: any(c == k or c.startswith(k) for k in tier))
+            if self.company is not None:
+                break
+        self.label = (
+            _first(columns, lambda c: any(k in c for k in LABEL_KEYS))
+            # Fallback: first column that is not a timestamp, then the first column
+            or _first(columns, lambda c: not any(k in c for k in DATE_KEYS))
+            or (columns[0] if columns else None)
+        )
+        self.timestamp = _first(columns, lambda c: any(k in c for k in TIMESTAMP_KEYS))
+        self.prompt_selector = _first(columns, lambda c: PROMPT_SELECTOR_KEY in c)
+
+    def as_dict(self):
+        return {
+            'prefix': self.prefix,
+            'company': self.company,
+            'label': self.label,
+            'timestamp': self.timestamp,
+            'prompt_selector': self.prompt_selector,
+        }
+
+    def describe(self):
+        """One-line summary for the UI log."""
+        names = {'label': 'Empresa', 'timestamp': 'Carimbo', 'prompt_selector': 'Modelo de atuação'}
+        return ", ".join(f"{title}: {getattr(self, role) or '—'}" for role, title in names.items())
+
+
+@lru_cache(maxsize=32)
+def _infer(columns):
+    return ColumnRoles(columns)
+
+
+def infer_column_roles(columns):
+    """Roles for this column set, computed once and shared by every stage and row."""
+    return _infer(tuple(columns))
@@ -0,0 +1,203 @@
+import os
+import glob
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import pyarrow  # noqa: F401  (enables DataFrame.to_parquet / pd.read_parquet)
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+def file_version(path):
+    """(size, mtime) of the source file; any change means the dataset must be reloaded."""
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+class DatasetCache:
+    """
+    Spreadsheets loaded once per (path, size, mtime).
+
+    The last `max_entries` DataFrames stay in memory, so the company list in the
+    UI and the ProcessingWorker that starts right after share one load. Every
+    load also leaves a columnar copy in `store_dir` (Parquet when pyarrow is
+    installed, pickle otherwise), so reopening an unchanged workbook in a new
+    session skips pd.read_excel entirely. Copies are named after the source
+    path and version; older copies of the same file are removed. Like the
+    response cache, copies unused for `max_age_days` are pruned and the least
+    recently used ones are evicted once the store passes `max_size_mb`.
+
+    Returned DataFrames are shared: callers must not modify them in place.
+    Use `get_dataset_cache(store_dir)` so every engine shares the same instance.
+    """
+
+    def __init__(self, store_dir, max_entries=2, max_age_days=30, max_size_mb=500):
+        self.store_dir = store_dir
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        self.max_size = max_size_mb * 1024 * 1024
+        self.logger = logging.getLogger("DatasetCache")
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # normalized path -> (version, df)
+        self._loading = {}             # normalized path -> lock, one load per file at a time
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _stem(self, key):
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    def _store_path(self, key, version, ext):
+        size, mtime = version
+        return os.path.join(self.store_dir, f"{self._stem(key)}_{size}_{mtime}{ext}")
+
+    def _read_store(self, key, version):
+        import pandas as pd
+        candidates = [('.pkl', pd.read_pickle)]
+        if PARQUET_AVAILABLE:
+            candidates.insert(0, ('.parquet', pd.read_parquet))
+        for ext, reader in candidates:
+            path = self._store_path(key, version, ext)
+            if os.path.exists(path):
+                try:
+                    df = reader(path)
+                    # Touch to keep LRU ordering by mtime
+                    os.utime(path, None)
+                    return df
+                except Exception as e:
+                    self.logger.warning(f"Cópia local inválida ignorada ({path}): {e}")
+                    self._remove(path)
+        return None
+
+    def _write_store(self, key, version, df):
+        os.makedirs(self.store_dir, exist_ok=True)
+        for old in glob.glob(os.path.join(self.store_dir, f"{self._stem(key)}_*")):
+            self._remove(old)
+        # Parquet needs string column names and one type per column; anything else goes to pickle
+        writers = [('.pkl', lambda f: df.to_pickle(f))]
+        if PARQUET_AVAILABLE:
+            writers.insert(0, ('.parquet', lambda f: df.to_parquet(f)))
+        for ext, write in writers:
+            fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+            os.close(fd)
+            try:
+                write(tmp_path)
+                path = self._store_path(key, version, ext)
+                os.replace(tmp_path, path)
+                self.prune(keep=path)
+                return
+            except Exception as e:
+                self.logger.info(f"Cópia {ext} não gerada: {e}")
+                self._remove(tmp_path)
+
+    def prune(self, keep=None):
+        """
+        Removes copies older than `max_age` and trims the store down to `max_size`,
+        least recently used first. `keep` (the copy just written) is never removed.
+        Runs once per new file version, so scanning the directory is cheap here.
+        """
+        now = time.time()
+        entries = []
+        total = 0
+        try:
+            names = os.listdir(self.store_dir)
+        except OSError:
+            return
+        for name in names:
+            path = os.path.join(self.store_dir, name)
+            if name.endswith('.tmp') or path == keep:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if now - st.st_mtime > self.max_age:
+                self._remove(path)
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        if keep:
+            try:
+                total += os.path.getsize(keep)
+            except OSError:
+                pass
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def get(self, file_path, loader):
+        """
+        DataFrame for `file_path`, calling `loader(file_path)` only when neither
+        memory nor the local copy has the current version of the file.
+        """
+        key = self._key(file_path)
+        version = file_version(file_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1]
+            file_lock = self._loading.setdefault(key, threading.Lock())
+
+        with file_lock:
+            # Another thread may have loaded it while we waited
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry and entry[0] == version:
+                    return entry[1]
+
+            df = self._read_store(key, version)
+            if df is None:
+                df = loader(file_path)
+                if file_version(file_path) != version:
+                    # File changed while it was being read: keep the result, cache nothing
+                    return df
+                try:
+                    self._write_store(key, version, df)
+                except OSError as e:
+                    self.logger.warning(f"Não foi possível salvar cópia local de {file_path}: {e}")
+
+            with self._lock:
+                self._entries[key] = (version, df)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return df
+
+    def invalidate(self, file_path=None):
+        """Forgets one file (or everything) in memory; local copies are checked by version anyway."""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self._key(file_path), None)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_dataset_cache(store_dir, **limits):
+    """Shared DatasetCache for `store_dir`; `limits` (max_age_days, max_size_mb) apply when it is created."""
+    key = os.path.normcase(os.path.abspath(store_dir))
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = DatasetCache(store_dir, **limits)
+        return cache
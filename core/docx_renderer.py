@@ -0,0 +1,215 @@
+import os
+import re
+import copy
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape, quoteattr
+
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+
+from core.response_parser import SECTIONS
+
+# Characters python-docx turns into <w:tab/>/<w:br/> or rejects: such lines take the regular path
+_SPECIAL_CHARS = re.compile(r"[\x00-\x1f]")
+
+# Human-readable titles for the report sections
+SECTION_TITLES = {
+    "RESUMO_EXECUTIVO": "Resumo Executivo",
+    "DIAGNOSTICO": "Diagnóstico Situacional",
+    "LACUNAS": "Lacunas & Gaps",
+    "CLASSIFICACAO": "Classificação de Maturidade",
+    "ESTRUTURA_TO_BE": "Estrutura Recomendada (To-Be)",
+    "MATRIZ_DE_METRICAS": "Matriz de Métricas",
+    "ARQUITETURA_CONCEITUAL_DE_DADOS": "Arquitetura Conceitual de Dados",
+    "PERGUNTAS_DECISORIAS": "Perguntas Decisórias",
+    "KPIS_ASSOCIADOS": "KPIs Associados",
+    "VISUALIZACAO_CONCEITUAL": "Visualização Conceitual",
+    "RISCOS_ATUAIS": "Riscos Atuais",
+    "RISCOS_SE_NAO_IMPLEMENTAR": "Riscos de Não Implementação",
+    "OBSERVACOES_XALQ": "Observações XALQ",
+    "PROXIMOS_PASSOS": "Próximos Passos"
+}
+
+
+class TemplateCache:
+    """
+    Parsed DOCX templates with the body already cleared.
+
+    The template is unzipped and parsed once per thread; its body paragraphs
+    and tables are stripped once and what remains (section properties) is kept
+    as the skeleton. Each `document()` call resets the body of that same
+    Document to a copy of the skeleton, so styles, headers, footers and media
+    are never parsed again. Entries are keyed by (mtime, size) and reloaded
+    when the template file changes.
+
+    A returned Document is only valid until the next `document()` call on the
+    same thread: fill it and save it before asking for another.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _entries(self):
+        entries = getattr(self._local, 'entries', None)
+        if entries is None:
+            entries = self._local.entries = {}
+        return entries
+
+    @staticmethod
+    def _load(template_path):
+        doc = Document(template_path)
+        body = doc.element.body
+        # Same clearing as before: top-level paragraphs and tables only
+        for child in list(body):
+            if child.tag in (qn('w:p'), qn('w:tbl')):
+                body.remove(child)
+        skeleton = [copy.deepcopy(child) for child in body]
+        return doc, skeleton
+
+    def document(self, template_path):
+        st = os.stat(template_path)
+        version = (st.st_mtime_ns, st.st_size)
+        entries = self._entries()
+        entry = entries.get(template_path)
+        if entry is None or entry[0] != version:
+            doc, skeleton = self._load(template_path)
+            entries[template_path] = (version, doc, skeleton, {})
+            return doc
+
+        _, doc, skeleton, _ = entry
+        body = doc.element.body
+        for child in list(body):
+            body.remove(child)
+        for child in skeleton:
+            body.append(copy.deepcopy(child))
+        return doc
+
+    def style_id(self, template_path, doc, name):
+        """Paragraph style ID for a style name, resolved once per loaded template."""
+        entry = self._entries().get(template_path)
+        memo = entry[3] if entry and entry[1] is doc else {}
+        if name not in memo:
+            # Same lookup python-docx does on every add_paragraph(style=...); raises KeyError if missing
+            memo[name] = doc.part.get_style_id(name, WD_STYLE_TYPE.PARAGRAPH)
+        return memo[name]
+
+    def clear(self):
+        self._entries().clear()
+
+
+_template_cache = TemplateCache()
+
+
+def template_document(template_path):
+    """Fresh report Document from the cached, pre-cleared template skeleton."""
+    return _template_cache.document(template_path)
+
+
+def _paragraph_xml(style_id, text):
+    """Same markup as python-docx add_paragraph(text, style) for text without special characters."""
+    ppr = f'<w:pPr><w:pStyle w:val={quoteattr(style_id)}/></w:pPr>' if style_id else ''
+    if not text:
+        return f'<w:p>{ppr}</w:p>' if ppr else '<w:p/>'
+    space = ' xml:space="preserve"' if len(text.strip()) < len(text) else ''
+    return f'<w:p>{ppr}<w:r><w:t{space}>{escape(text)}</w:t></w:r></w:p>'
+
+
+def report_paragraphs(parsed_data):
+    """(style name, text) for every paragraph of the report body, in order."""
+    paragraphs = []
+    for sec_key in SECTIONS:
+        content = parsed_data.get(sec_key, '').strip()
+        if content:
+            # Heading (add_heading level 1 uses the 'Heading 1' style)
+            title = SECTION_TITLES.get(sec_key, sec_key.replace('_', ' ').title())
+            paragraphs.append(('Heading 1', title))
+
+            # Content: basic handling of list items starting with - or *
+            for line in content.split('\n'):
+                line = line.strip()
+                if not line:
+                    continue
+
+                if line.startswith('- ') or line.startswith('* '):
+                    paragraphs.append(('List Bullet', line[2:]))
+                elif line[0].isdigit() and line[1:3] in ['. ', ') ']:
+                    # Simple heuristic for numbered lists
+                    paragraphs.append(('List Number', line))
+                else:
+                    paragraphs.append((None, line))
+
+            # Spacing between sections
+            paragraphs.append((None, None))
+    return paragraphs
+
+
+def emit_paragraphs(doc, paragraphs, style_id=None):
+    """
+    Appends the paragraphs to the body in bulk: one XML parse for each run of
+    plain lines instead of one python-docx call (and style-name lookup) per line.
+    `style_id(name)` resolves style names; lines with tabs, line breaks or
+    control characters go through add_paragraph so the output stays identical.
+    """
+    style_id = style_id or (lambda name: doc.part.get_style_id(name, WD_STYLE_TYPE.PARAGRAPH))
+    body = doc.element.body
+    pending = []
+
+    def flush():
+        if pending:
+            fragment = parse_xml(f'<w:body {nsdecls("w")}>{"".join(pending)}</w:body>')
+            anchor = body.sectPr
+            for p in list(fragment):
+                if anchor is not None:
+                    anchor.addprevious(p)
+                else:
+                    body.append(p)
+            pending.clear()
+
+    for style, text in paragraphs:
+        if text and _SPECIAL_CHARS.search(text):
+            flush()
+            doc.add_paragraph(text, style=style)
+        else:
+            pending.append(_paragraph_xml(style_id(style) if style else None, text))
+    flush()
+
+
+def render_report(parsed_data, template_path, out_path):
+    """
+    Writes the report for `parsed_data` ({section: text}) to `out_path` and returns it.
+    Top-level and free of engine state so it can run in a worker process.
+    """
+    doc = template_document(template_path)
+    emit_paragraphs(
+        doc, report_paragraphs(parsed_data),
+        lambda name: _template_cache.style_id(template_path, doc, name),
+    )
+    doc.save(out_path)
+    return out_path
+
+
+class RenderStage:
+    """
+    DOCX rendering in a process pool, off the threads that wait on the AI.
+
+    `submit` queues a report and returns a Future of its path immediately, so
+    the row moves on to the next request while python-docx/lxml (CPU-bound,
+    GIL-holding) runs in another process. Each worker process keeps its own
+    TemplateCache, so the template is parsed once per worker.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        # Spawn everywhere (as on Windows): forking a process full of threads is unsafe
+        self._pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, parsed_data, template_path, out_path):
+        return self._pool.submit(render_report, dict(parsed_data), template_path, out_path)
+
+    def shutdown(self, cancel=False):
+        """Waits for queued reports (or drops the ones not started yet with `cancel`)."""
+        self._pool.shutdown(wait=True, cancel_futures=cancel)
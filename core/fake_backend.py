@@ -0,0 +1,165 @@
+import re
+import json
+import random
+import hashlib
+import threading
+from collections import Counter
+
+from core.ai_backend import AIBackend, GenerationResult, GenerationStream
+from core.response_parser import SECTIONS
+
+_BATCH_MARKER = re.compile(r"DADOS DO CLIENTE \(EMPRESA (\d+)\)")
+
+
+def constant(seconds):
+    return lambda rng: seconds
+
+
+def lognormal(median, sigma=0.5):
+    """Right-skewed latency, like real LLM calls: most fast, a long tail of slow ones."""
+    import math
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+def uniform(low, high):
+    return lambda rng: rng.uniform(low, high)
+
+
+class _FakeStream(GenerationStream):
+    def __init__(self, backend, text):
+        self._backend = backend
+        self._text = text
+        self._cancelled = threading.Event()
+
+    def __iter__(self):
+        step = max(1, len(self._text) // 20)
+        for i in range(0, len(self._text), step):
+            if self._cancelled.is_set():
+                return
+            yield self._text[i:i + step]
+
+    def cancel(self):
+        self._cancelled.set()
+        self._backend._count("cancelled")
+
+
+class FakeBackend(AIBackend):
+    """
+    Deterministic local backend for tests and offline benchmarks.
+
+    - `latency`: distribution built with `constant`, `lognormal` or `uniform`
+      (seconds, scaled by `time_scale`), sampled from a seeded RNG.
+    - `not_found_models`: models that always raise 404 NotFound.
+    - `rate_limit_rate`, `safety_block_rate`, `error_rate`: probability of
+      injecting a 429, an empty (blocked) answer or a 503 per call.
+    - `responses`: callable(contents) -> text; defaults to a canned answer
+      with all 14 [SECTION] tags (and per-company slices for batched prompts),
+      or a JSON object of the 14 sections when JSON output is requested.
+    - Calls slower than the request `timeout` raise a 504, like the real API.
+
+    Sleeps wait on an event, so `interrupt()` releases every in-flight call.
+    """
+
+    name = "fake"
+
+    def __init__(self, latency=None, not_found_models=(), rate_limit_rate=0.0, safety_block_rate=0.0,
+                 error_rate=0.0, responses=None, seed=42, time_scale=1.0):
+        self.latency = latency or constant(0.0)
+        self.not_found_models = {m.replace('models/', '') for m in not_found_models}
+        self.rate_limit_rate = rate_limit_rate
+        self.safety_block_rate = safety_block_rate
+        self.error_rate = error_rate
+        self.responses = responses or self.canned_response
+        self.time_scale = time_scale
+        self.calls = Counter()
+        self.prompts = []
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._interrupted = threading.Event()
+        self._prefixes = {}
+
+    @staticmethod
+    def canned_response(contents):
+        """Section-tagged answer derived from the prompt, so it is stable across runs."""
+        digest = hashlib.sha1(contents.encode('utf-8')).hexdigest()[:8]
+
+        def report(tag):
+            return "\n".join(
+                f"[{s}]\n- Item {tag}-{digest} sobre {s.lower()}\n1. Detalhe numerado\nTexto corrido.\n[/{s}]"
+                for s in SECTIONS
+            )
+
+        companies = _BATCH_MARKER.findall(contents)
+        if companies:
+            return "\n".join(f"<<<EMPRESA {n}>>>\n{report(n)}\n<<<FIM EMPRESA {n}>>>" for n in companies)
+        return report("0")
+
+    def _count(self, key):
+        with self._lock:
+            self.calls[key] += 1
+
+    def _roll(self):
+        with self._lock:
+            return self._rng.random()
+
+    def interrupt(self):
+        """Wakes every simulated request in flight (they then raise)."""
+        self._interrupted.set()
+
+    @staticmethod
+    def canned_json_response(contents):
+        """JSON-mode answer: one string per section, like a schema-constrained model."""
+        digest = hashlib.sha1(contents.encode('utf-8')).hexdigest()[:8]
+        return json.dumps(
+            {s: f"- Item {digest} sobre {s.lower()}\n1. Detalhe numerado\nTexto corrido." for s in SECTIONS},
+            ensure_ascii=False,
+        )
+
+    def _simulate(self, model_name, contents, cached_prefix, timeout=600, generation_config=None):
+        model_name = model_name.replace('models/', '')
+        with self._lock:
+            self.calls[model_name] += 1
+            delay = self.latency(self._rng) * self.time_scale
+            self.prompts.append(contents)
+        if self._interrupted.wait(min(delay, timeout)):
+            raise ConnectionError("Fake request interrupted")
+        if delay > timeout:
+            raise Exception("504 DeadlineExceeded: request timed out")
+        if model_name in self.not_found_models:
+            raise Exception(f"404 NotFound: models/{model_name} is not found")
+        if self._roll() < self.rate_limit_rate:
+            raise Exception("429 ResourceExhausted: quota exceeded. Please retry in 0.01s.")
+        if self._roll() < self.error_rate:
+            raise Exception("503 ServiceUnavailable: the model is overloaded")
+        if self._roll() < self.safety_block_rate:
+            return None
+        prefix = self._prefixes.get(cached_prefix, "") if cached_prefix is not None else ""
+        if (generation_config or {}).get('response_mime_type') == "application/json" \
+                and self.responses == self.canned_response:
+            return self.canned_json_response(prefix + contents)
+        return self.responses(prefix + contents)
+
+    def generate(self, model_name, contents, generation_config, timeout=600, cached_prefix=None):
+        text = self._simulate(model_name, contents, cached_prefix, timeout, generation_config)
+        return GenerationResult(text, None if text else "block_reason: SAFETY")
+
+    def stream(self, model_name, contents, generation_config, timeout=600, cached_prefix=None):
+        text = self._simulate(model_name, contents, cached_prefix, timeout, generation_config)
+        stream = _FakeStream(self, text or "")
+        stream.prompt_feedback = None if text else "block_reason: SAFETY"
+        return stream
+
+    def count_tokens(self, model_name, text):
+        return len(text.split())
+
+    def create_cached_prefix(self, model_name, prefix_text, ttl_seconds):
+        with self._lock:
+            handle = f"cachedContents/fake-{len(self._prefixes)}"
+            self._prefixes[handle] = prefix_text
+            self.calls["cache_create"] += 1
+        return handle
+
+    def delete_cached_prefix(self, handle):
+        with self._lock:
+            self._prefixes.pop(handle, None)
+            self.calls["cache_delete"] += 1
@@ -0,0 +1,195 @@
+import os
+import time
+import sqlite3
+import threading
+
+QUEUED = "queued"
+IN_FLIGHT = "in_flight"
+AI_DONE = "ai_done"
+RENDERED = "rendered"
+FAILED = "failed"
+TIMED_OUT = "timed_out"
+
+# Jobs untouched for this long are dropped when the journal is opened
+RETENTION_SECONDS = 30 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_path TEXT NOT NULL,
+    file_version TEXT NOT NULL,
+    prompt_type TEXT NOT NULL,
+    model TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_rows (
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    row_idx TEXT NOT NULL,
+    state TEXT NOT NULL,
+    response TEXT,
+    report TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, row_idx)
+);
+"""
+
+
+class JobJournal:
+    """
+    Durable record of batch runs in a SQLite file under processing/.
+
+    Every row of a job moves through queued -> in_flight -> ai_done -> rendered
+    (or failed / timed_out), and each transition is committed as it happens together with
+    the raw AI response, so a crash, reboot or cancel loses at most the rows
+    that were in flight. A later run of the same file, prompt and model can
+    resume the job: rendered rows are skipped and rows with a response but no
+    DOCX are rendered again without calling the AI.
+
+    Only what a resume can use is kept: when a job completes, its rows (and those
+    of the older runs it supersedes) are deleted, and jobs older than
+    RETENTION_SECONDS are pruned on open.
+
+    One connection shared by the row threads, serialized by a lock.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.prune()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _version(file_path):
+        st = os.stat(file_path)
+        return f"{st.st_size}:{st.st_mtime_ns}"
+
+    def prune(self, max_age=RETENTION_SECONDS):
+        """Deletes jobs (and their rows) not updated in the last `max_age` seconds."""
+        cutoff = time.time() - max_age
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM job_rows WHERE job_id IN (SELECT id FROM jobs WHERE updated_at < ?)", (cutoff,)
+            )
+            self._conn.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+
+    def start(self, file_path, prompt_type, model, resume=False):
+        """
+        JobRun for this file, prompt and model. With `resume`, continues the latest
+        job for the same file version, unless that one completed.
+        """
+        file_path = os.path.abspath(file_path)
+        version = self._version(file_path)
+        now = time.time()
+        with self._lock:
+            if resume:
+                job = self._conn.execute(
+                    "SELECT id, status FROM jobs"
+                    " WHERE file_path = ? AND file_version = ? AND prompt_type = ? AND model = ?"
+                    " ORDER BY id DESC LIMIT 1",
+                    (file_path, version, prompt_type or "", model),
+                ).fetchone()
+                # A newer run already completed this file: nothing to resume
+                if job and job[1] not in ("done", "superseded"):
+                    self._conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (now, job[0]))
+                    rows = self._conn.execute(
+                        "SELECT row_idx, state, response, report FROM job_rows WHERE job_id = ?", (job[0],)
+                    ).fetchall()
+                    return JobRun(self, job[0], {r[0]: r[1:] for r in rows})
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (file_path, file_version, prompt_type, model, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, 'running', ?, ?)",
+                (file_path, version, prompt_type or "", model, now, now),
+            )
+            return JobRun(self, cursor.lastrowid, {})
+
+    def mark(self, job_id, row_ids, state, response=None, report=None, error=None):
+        """Moves rows to `state`; a response or report already recorded is kept unless replaced."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO job_rows (job_id, row_idx, state, response, report, error, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (job_id, row_idx) DO UPDATE SET state = excluded.state,"
+                " response = COALESCE(excluded.response, response), report = COALESCE(excluded.report, report),"
+                " error = excluded.error, updated_at = excluded.updated_at",
+                [(job_id, str(row_idx), state, response, report, error, now) for row_idx in row_ids],
+            )
+
+    def finish(self, job_id, status):
+        """
+        Sets the job's final status. A completed job drops its rows, and older
+        unfinished runs of the same file version, prompt and model are superseded.
+        """
+        with self._lock:
+            self._conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (status, time.time(), job_id))
+            if status != "done":
+                return
+            same_job = (
+                "SELECT older.id FROM jobs AS older, jobs AS job WHERE job.id = ? AND older.id <= job.id"
+                " AND older.file_path = job.file_path AND older.file_version = job.file_version"
+                " AND older.prompt_type = job.prompt_type AND older.model = job.model"
+            )
+            self._conn.execute(
+                f"UPDATE jobs SET status = 'superseded' WHERE id < ? AND status != 'done' AND id IN ({same_job})",
+                (job_id, job_id),
+            )
+            self._conn.execute(f"DELETE FROM job_rows WHERE job_id IN ({same_job})", (job_id,))
+
+    def row_states(self, job_id):
+        """{row_idx: state} for a job."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT row_idx, state FROM job_rows WHERE job_id = ?", (job_id,)))
+
+    def unfinished_jobs(self):
+        """(id, file_path, prompt_type, model, status, updated_at) of jobs that can be resumed, newest first."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, file_path, prompt_type, model, status, updated_at FROM jobs"
+                " WHERE status NOT IN ('done', 'superseded') ORDER BY id DESC"
+            ).fetchall()
+
+
+class JobRun:
+    """One job as seen by process_file: row transitions plus what a resumed job already has."""
+
+    def __init__(self, journal, job_id, previous):
+        self.journal = journal
+        self.job_id = job_id
+        self.resumed = bool(previous)
+        self._previous = previous  # row_idx -> (state, response, report)
+
+    def mark(self, row_ids, state, **fields):
+        self.journal.mark(self.job_id, row_ids, state, **fields)
+
+    def report(self, row_idx):
+        """Report of a row rendered by the previous run, if the file is still there."""
+        state, _, report = self._previous.get(str(row_idx), (None, None, None))
+        if state == RENDERED and report and os.path.exists(report):
+            return report
+        return None
+
+    def response(self, row_idx):
+        """AI response recorded by the previous run, if any."""
+        return self._previous.get(str(row_idx), (None, None, None))[1]
+
+    def finish(self, cancelled=False):
+        """Closes the job: 'done' only when every journaled row has its report."""
+        if cancelled:
+            status = "cancelled"
+        elif all(state == RENDERED for state in self.journal.row_states(self.job_id).values()):
+            status = "done"
+        else:
+            status = "incomplete"
+        self.journal.finish(self.job_id, status)
+        return status
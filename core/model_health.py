@@ -0,0 +1,181 @@
+import time
+import threading
+from collections import deque
+
+
+class ModelHealth:
+    """Mutable health record for a single model."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, window=20):
+        self.state = self.CLOSED
+        self.not_found = False
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.outcomes = deque(maxlen=window)   # True = success, False = failure
+        self.latencies = deque(maxlen=window)  # seconds, successful or censored (see record_latency)
+
+    @property
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    @property
+    def avg_latency(self):
+        if not self.latencies:
+            return None
+        return sum(self.latencies) / len(self.latencies)
+
+
+class ModelHealthRegistry:
+    """
+    Engine-level registry of model health shared by every row of a batch.
+
+    - Models that answered NotFound/404 are skipped for the rest of the session.
+    - A model that fails `failure_threshold` times in a row (errors, 429s,
+      safety blocks) has its circuit opened and is skipped for `cooldown` seconds.
+    - After the cooldown the circuit is half-open: a single probe request is
+      allowed; success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=3, cooldown=120.0, window=20, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.window = window
+        self._clock = clock
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def _get(self, model_name):
+        health = self._models.get(model_name)
+        if health is None:
+            health = self._models[model_name] = ModelHealth(self.window)
+        return health
+
+    def _refresh(self, health):
+        if health.state == ModelHealth.OPEN and self._clock() - health.opened_at >= self.cooldown:
+            health.state = ModelHealth.HALF_OPEN
+            health.probe_in_flight = False
+
+    def is_available(self, model_name):
+        with self._lock:
+            health = self._get(model_name)
+            self._refresh(health)
+            if health.not_found or health.state == ModelHealth.OPEN:
+                return False
+            return not (health.state == ModelHealth.HALF_OPEN and health.probe_in_flight)
+
+    def acquire(self, model_name):
+        """
+        Reserves a request slot for the model. Returns False when the circuit is
+        open, the model is gone, or another row already holds the half-open probe.
+        """
+        with self._lock:
+            health = self._get(model_name)
+            self._refresh(health)
+            if health.not_found or health.state == ModelHealth.OPEN:
+                return False
+            if health.state == ModelHealth.HALF_OPEN:
+                if health.probe_in_flight:
+                    return False
+                health.probe_in_flight = True
+            return True
+
+    def release(self, model_name):
+        """Gives back a slot taken by `acquire` that ended up not being used."""
+        with self._lock:
+            self._get(model_name).probe_in_flight = False
+
+    def order(self, model_names):
+        """
+        Filters out dead/open models and orders the rest by observed health.
+        Chain order is kept between equally healthy models, so the user's
+        preferred model stays first while it behaves.
+        """
+        with self._lock:
+            ranked = []
+            for position, name in enumerate(model_names):
+                health = self._get(name)
+                self._refresh(health)
+                if health.not_found or health.state == ModelHealth.OPEN:
+                    continue
+                half_open = health.state == ModelHealth.HALF_OPEN
+                ranked.append((half_open, round(health.error_rate, 1), position, name))
+
+            return [name for *_, name in sorted(ranked)]
+
+    def seconds_until_available(self, model_names):
+        """
+        Time until the first open circuit among `model_names` goes half-open.
+        Returns 0 if some model is usable now and None if all of them are gone.
+        """
+        with self._lock:
+            waits = []
+            for name in model_names:
+                health = self._get(name)
+                self._refresh(health)
+                if health.not_found:
+                    continue
+                if health.state == ModelHealth.OPEN:
+                    waits.append(max(0.0, self.cooldown - (self._clock() - health.opened_at)))
+                else:
+                    waits.append(0.0)
+            return min(waits) if waits else None
+
+    def record_success(self, model_name, latency=None):
+        with self._lock:
+            health = self._get(model_name)
+            health.outcomes.append(True)
+            if latency is not None:
+                health.latencies.append(latency)
+            health.consecutive_failures = 0
+            health.state = ModelHealth.CLOSED
+            health.probe_in_flight = False
+
+    def record_latency(self, model_name, latency):
+        """
+        Latency sample without an outcome, e.g. a lower bound for a request that was
+        cancelled before it answered (a censored sample for the hedge threshold).
+        """
+        with self._lock:
+            self._get(model_name).latencies.append(latency)
+
+    def record_failure(self, model_name):
+        """Counts an error, 429 or safety block against the model."""
+        with self._lock:
+            health = self._get(model_name)
+            health.outcomes.append(False)
+            health.consecutive_failures += 1
+            health.probe_in_flight = False
+            if (health.state == ModelHealth.HALF_OPEN
+                    or health.consecutive_failures >= self.failure_threshold):
+                health.state = ModelHealth.OPEN
+                health.opened_at = self._clock()
+
+    def record_not_found(self, model_name):
+        with self._lock:
+            health = self._get(model_name)
+            health.not_found = True
+            health.probe_in_flight = False
+
+    def latencies(self, model_name):
+        with self._lock:
+            return list(self._get(model_name).latencies)
+
+    def snapshot(self):
+        """Returns a plain dict summary, useful for logs and the UI."""
+        with self._lock:
+            out = {}
+            for name, health in self._models.items():
+                self._refresh(health)
+                out[name] = {
+                    "state": "not_found" if health.not_found else health.state,
+                    "error_rate": health.error_rate,
+                    "avg_latency": health.avg_latency,
+                }
+            return out
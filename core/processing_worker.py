@@ -14,13 +14,28 @@ class ProcessingWorker(QObject):
 
     files_generated = Signal(list)
 
-    def __init__(self, file_path, model_override=None, rows_to_process=None, prompt_type_override=None, api_key=None):
+    def __init__(self, file_path, model_override=None, rows_to_process=None, prompt_type_override=None, api_key=None,
+                 max_workers=None, use_cache=True, stream=None, batch_size=None,
+                 prompt_cache=None, hedge=None, row_deadline=None, structured=None, render_workers=None,
+                 stream_rows=None, resume=False, backend=None):
         super().__init__()
         self.file_path = file_path
         self.model_override = model_override
         self.rows_to_process = rows_to_process
         self.prompt_type_override = prompt_type_override
         self.api_key = api_key
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.stream = stream
+        self.batch_size = batch_size
+        self.prompt_cache = prompt_cache
+        self.hedge = hedge
+        self.row_deadline = row_deadline
+        self.structured = structured
+        self.render_workers = render_workers
+        self.stream_rows = stream_rows
+        self.resume = resume
+        self.backend = backend
         self._is_running = True
 
     def run(self):
@@ -42,14 +57,25 @@ class ProcessingWorker(QObject):
                 else:
                     self.progress.emit(message)
 
-            engine = WorkerEngine(progress_callback=bridge_callback, api_key=self.api_key)
+            engine = WorkerEngine(progress_callback=bridge_callback, api_key=self.api_key, backend=self.backend)
             engine.set_cancellation_callback(lambda: not self._is_running)
             # Returns list of generated files
             generated_files = engine.process_file(
                 self.file_path, 
                 model_override=self.model_override,
                 rows_to_process=self.rows_to_process,
-                prompt_type_override=self.prompt_type_override
+                prompt_type_override=self.prompt_type_override,
+                max_workers=self.max_workers,
+                use_cache=self.use_cache,
+                stream=self.stream,
+                batch_size=self.batch_size,
+                prompt_cache=self.prompt_cache,
+                hedge=self.hedge,
+                row_deadline=self.row_deadline,
+                structured=self.structured,
+                render_workers=self.render_workers,
+                stream_rows=self.stream_rows,
+                resume=self.resume
             )
 
             if generated_files:
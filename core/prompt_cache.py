@@ -0,0 +1,82 @@
+import hashlib
+import logging
+import threading
+
+from core.token_budget import estimate_tokens
+
+
+class PrefixCacheSession:
+    """
+    Per-run registry of cached prefixes, keyed by (model, prefix hash).
+
+    `backend` is an AIBackend (create_cached_prefix / delete_cached_prefix).
+    The first row that needs a prefix creates it; every other row reuses the
+    handle. Models that refuse caching (prompt below the minimum size, model
+    not supported) are remembered so no row pays for the failed attempt twice.
+    `close` deletes every handle when the run ends; the TTL is only a safety
+    net for crashes. A handle the server no longer knows (expired on a long
+    run) is dropped and created again by the next row that needs it.
+    """
+
+    def __init__(self, backend, ttl_seconds=3600, min_prefix_tokens=1024):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.min_prefix_tokens = min_prefix_tokens
+        self.logger = logging.getLogger("PrefixCacheSession")
+        self._handles = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_name, prefix_text):
+        return model_name, hashlib.sha256(prefix_text.encode('utf-8')).hexdigest()
+
+    def handle_for(self, model_name, prefix_text):
+        """Returns a handle for the prefix on this model, creating it once. None if unavailable."""
+        # Providers reject caches below a minimum size
+        if estimate_tokens(prefix_text) < self.min_prefix_tokens:
+            return None
+        key = self._key(model_name, prefix_text)
+        # Creation is serialized so concurrent rows never create duplicates
+        with self._lock:
+            if key in self._failed:
+                return None
+            if key in self._handles:
+                return self._handles[key]
+            try:
+                handle = self.backend.create_cached_prefix(model_name, prefix_text, self.ttl_seconds)
+            except Exception as e:
+                self.logger.warning(f"Cache de prompt indisponível para {model_name}: {e}")
+                self._failed.add(key)
+                return None
+            self._handles[key] = handle
+            return handle
+
+    @staticmethod
+    def is_rejected(error):
+        """True if the request failed because of the cached content itself (not found, expired, invalid)."""
+        text = str(error).lower()
+        if not any(k in text for k in ('cachedcontent', 'cached content', 'cached_content')):
+            return False
+        return any(k in text for k in ('404', 'not found', 'notfound', '403', 'permission', 'invalid', 'expired'))
+
+    def invalidate(self, model_name, prefix_text, handle=None):
+        """
+        Drops a handle the server no longer recognises (e.g. expired early), so the
+        next request creates a fresh one. With `handle`, only that handle is dropped:
+        a concurrent row may already have replaced it.
+        """
+        key = self._key(model_name, prefix_text)
+        with self._lock:
+            if handle is None or self._handles.get(key) == handle:
+                self._handles.pop(key, None)
+
+    def close(self):
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+        for handle in handles:
+            try:
+                self.backend.delete_cached_prefix(handle)
+            except Exception as e:
+                self.logger.warning(f"Falha ao expirar cache de prompt: {e}")
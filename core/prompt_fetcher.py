@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PromptFetcher:
+    """
+    Shared HTTP client for remote prompts (raw.githubusercontent.com).
+
+    - One pooled `requests.Session`, so repeated fetches reuse the connection.
+    - On-disk cache (one JSON per URL under `cache_dir`) with the body, ETag and
+      Last-Modified; revalidation is a conditional GET answered by a cheap 304.
+    - Entries younger than `fresh_ttl` are served without any request; older ones
+      are served immediately while a background revalidation refreshes them
+      (stale-while-revalidate), up to `max_stale` after which the caller waits.
+    - Failures (404, network errors without a cached copy) are remembered for
+      `negative_ttl` seconds only, so a missing prompt is retried soon after.
+
+    Use `get_fetcher(cache_dir)` to share one instance per cache directory.
+    """
+
+    def __init__(self, cache_dir, session=None, fresh_ttl=300, max_stale=7 * 86400, negative_ttl=60,
+                 timeout=10, clock=time.time):
+        self.cache_dir = cache_dir
+        self.fresh_ttl = fresh_ttl
+        self.max_stale = max_stale
+        self.negative_ttl = negative_ttl
+        self.timeout = timeout
+        self._clock = clock
+        self.logger = logging.getLogger("PromptFetcher")
+        self.session = session or self._make_session()
+        self._lock = threading.Lock()
+        self._url_locks = {}
+        self._negative = {}  # url -> (expires_at, reason)
+        self._revalidating = set()
+
+    @staticmethod
+    def _make_session():
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode('utf-8')).hexdigest() + ".json")
+
+    def _load(self, url):
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            return entry if entry.get('url') == url else None
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, entry):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(entry['url']))
+        except Exception as e:
+            self.logger.warning(f"Falha ao gravar cache HTTP: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _url_lock(self, url):
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def last_error(self, url):
+        """Reason of the last failed fetch while it is still negatively cached, else None."""
+        with self._lock:
+            negative = self._negative.get(url)
+        if negative and negative[0] > self._clock():
+            return negative[1]
+        return None
+
+    def fetch(self, url, headers=None):
+        """Prompt text for `url`, or None if unavailable (see `last_error`)."""
+        if self.last_error(url):
+            return None
+
+        entry = self._load(url)
+        if entry:
+            age = self._clock() - entry.get('checked_at', 0)
+            if age < self.fresh_ttl:
+                return entry['body']
+            if age < self.max_stale:
+                self._revalidate_in_background(url, headers)
+                return entry['body']
+
+        with self._url_lock(url):
+            # Another thread may have refreshed it while we waited
+            current = self._load(url)
+            if current and self._clock() - current.get('checked_at', 0) < self.fresh_ttl:
+                return current['body']
+            return self._revalidate(url, headers, current)
+
+    def _revalidate_in_background(self, url, headers):
+        with self._lock:
+            if url in self._revalidating:
+                return
+            self._revalidating.add(url)
+
+        def run():
+            try:
+                with self._url_lock(url):
+                    self._revalidate(url, headers, self._load(url))
+            finally:
+                with self._lock:
+                    self._revalidating.discard(url)
+
+        threading.Thread(target=run, name="xalq-prompt-revalidate", daemon=True).start()
+
+    def _revalidate(self, url, headers, entry):
+        """Conditional GET. Returns the current body (cached copy on 304 or network error), or None."""
+        request_headers = dict(headers or {})
+        if entry:
+            if entry.get('etag'):
+                request_headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                request_headers['If-Modified-Since'] = entry['last_modified']
+        try:
+            response = self.session.get(url, headers=request_headers, timeout=self.timeout)
+        except Exception as e:
+            if entry:
+                self.logger.warning(f"Revalidação falhou, usando cópia em cache de {url}: {e}")
+                return entry['body']
+            self._remember_failure(url, str(e))
+            return None
+
+        if response.status_code == 304 and entry:
+            entry['checked_at'] = self._clock()
+            self._store(entry)
+            return entry['body']
+        if response.status_code == 200:
+            self._store({
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'checked_at': self._clock(),
+                'body': response.text,
+            })
+            with self._lock:
+                self._negative.pop(url, None)
+            return response.text
+        if entry and response.status_code >= 500:
+            # Server trouble: keep serving the copy we have
+            return entry['body']
+        if entry and response.status_code == 404:
+            # Prompt removed upstream: do not resurrect it from the stale copy
+            try:
+                os.remove(self._path(url))
+            except OSError:
+                pass
+        self._remember_failure(url, f"HTTP {response.status_code}")
+        return None
+
+    def _remember_failure(self, url, reason):
+        with self._lock:
+            self._negative[url] = (self._clock() + self.negative_ttl, reason)
+
+    def invalidate(self, url=None):
+        """Forgets negative results (all, or for one URL) so the next fetch retries."""
+        with self._lock:
+            if url is None:
+                self._negative.clear()
+            else:
+                self._negative.pop(url, None)
+
+
+_fetchers = {}
+_fetchers_lock = threading.Lock()
+
+
+def get_fetcher(cache_dir):
+    """Shared PromptFetcher for `cache_dir`."""
+    key = os.path.normcase(os.path.abspath(cache_dir))
+    with _fetchers_lock:
+        fetcher = _fetchers.get(key)
+        if fetcher is None:
+            fetcher = _fetchers[key] = PromptFetcher(cache_dir)
+        return fetcher
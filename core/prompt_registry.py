@@ -0,0 +1,144 @@
+import os
+import time
+import tempfile
+import threading
+import unicodedata
+
+
+def normalize_prompt_name(text):
+    """Accent/case/separator-insensitive key: 'Diagnóstico-Revenue' == 'diagnostico_revenue'."""
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('utf-8')
+    return text.lower().replace(" ", "").replace("-", "").replace("_", "")
+
+
+class PromptRegistry:
+    """
+    In-memory index of the .md prompts in one directory.
+
+    The directory is listed once and re-listed only when its mtime changes;
+    bodies are read once and re-read only when the file's (mtime, size) changes.
+    Stats are throttled to one per `check_interval` seconds per entry, so a
+    large batch costs a handful of syscalls instead of a listdir + open per row.
+    Writes through `write` update the registry immediately.
+
+    Use `get_registry(prompts_dir)` so every engine (UI, worker threads,
+    settings dialog) shares the same instance.
+    """
+
+    def __init__(self, prompts_dir, check_interval=2.0, clock=time.monotonic):
+        self.prompts_dir = prompts_dir
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._dir_mtime = None
+        self._dir_checked = None
+        self._files = {}       # filename -> normalized stem
+        self._by_norm = {}     # normalized stem -> filename
+        self._bodies = {}      # filename -> (mtime, size, content)
+        self._body_checked = {}
+
+    def _due(self, checked_at):
+        return checked_at is None or self._clock() - checked_at >= self.check_interval
+
+    def _refresh_index(self, force=False):
+        if not force and not self._due(self._dir_checked):
+            return
+        self._dir_checked = self._clock()
+        try:
+            mtime = os.stat(self.prompts_dir).st_mtime_ns
+        except OSError:
+            self._dir_mtime = None
+            self._files, self._by_norm = {}, {}
+            return
+        if not force and mtime == self._dir_mtime:
+            return
+        self._dir_mtime = mtime
+        files = {f: normalize_prompt_name(os.path.splitext(f)[0])
+                 for f in os.listdir(self.prompts_dir) if f.endswith('.md')}
+        by_norm = {}
+        for fname in sorted(files):
+            by_norm.setdefault(files[fname], fname)
+        self._files, self._by_norm = files, by_norm
+        # Forget bodies of files that no longer exist
+        for fname in list(self._bodies):
+            if fname not in files:
+                self._bodies.pop(fname, None)
+                self._body_checked.pop(fname, None)
+
+    def names(self):
+        """Prompt names (file stems), sorted."""
+        with self._lock:
+            self._refresh_index()
+            return sorted(os.path.splitext(f)[0] for f in self._files)
+
+    def resolve(self, agent_type):
+        """Filename for an exact ('x' / 'x.md') or normalized match, or None."""
+        with self._lock:
+            self._refresh_index()
+            for candidate in (agent_type, f"{agent_type}.md"):
+                if candidate in self._files:
+                    return candidate
+            return self._by_norm.get(normalize_prompt_name(agent_type))
+
+    def exists(self, filename):
+        with self._lock:
+            self._refresh_index()
+            return filename in self._files
+
+    def read(self, filename):
+        """Prompt body, served from memory while the file is unchanged. Raises OSError if missing."""
+        with self._lock:
+            cached = self._bodies.get(filename)
+            if cached and not self._due(self._body_checked.get(filename)):
+                return cached[2]
+            path = os.path.join(self.prompts_dir, filename)
+            st = os.stat(path)
+            self._body_checked[filename] = self._clock()
+            if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+                return cached[2]
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            self._bodies[filename] = (st.st_mtime_ns, st.st_size, content)
+            return content
+
+    def write(self, filename, content):
+        """Atomically writes a prompt and makes it visible to every reader at once."""
+        path = os.path.join(self.prompts_dir, filename)
+        os.makedirs(self.prompts_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.prompts_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        st = os.stat(path)
+        with self._lock:
+            self._bodies[filename] = (st.st_mtime_ns, st.st_size, content)
+            self._body_checked[filename] = self._clock()
+            self._refresh_index(force=True)
+
+    def invalidate(self):
+        """Drops everything; the next access re-lists the directory."""
+        with self._lock:
+            self._dir_mtime = None
+            self._dir_checked = None
+            self._files, self._by_norm = {}, {}
+            self._bodies.clear()
+            self._body_checked.clear()
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(prompts_dir):
+    """Shared PromptRegistry for `prompts_dir`."""
+    key = os.path.normcase(os.path.abspath(prompts_dir))
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            registry = _registries[key] = PromptRegistry(prompts_dir)
+        return registry
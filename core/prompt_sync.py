@@ -0,0 +1,177 @@
+import os
+import sys
+import json
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST_NAME = "manifest.json"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_manifest(prompts_dir, version):
+    """Manifest for the .md files of `prompts_dir`: {"version", "prompts": [{name, sha256, size}]}."""
+    entries = []
+    for name in sorted(os.listdir(prompts_dir)):
+        path = os.path.join(prompts_dir, name)
+        if name.endswith('.md') and os.path.isfile(path):
+            entries.append({'name': name, 'sha256': file_sha256(path), 'size': os.path.getsize(path)})
+    return {'version': version, 'prompts': entries}
+
+
+def _atomic_write_bytes(path, data):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class PromptSync:
+    """
+    Brings prompts/ in line with the remote manifest (prompts/manifest.json).
+
+    Only prompts whose local sha256 differs from the manifest are downloaded,
+    in parallel, verified against the manifest hash and size, and written
+    atomically. The last fully synced manifest version is kept in `state_path`,
+    so when version.json's `assets.prompt_manifest_v` has not changed the sync
+    costs nothing.
+
+    The state also records the hash each file had when it was last synced. A
+    file whose hash no longer matches it was edited locally (e.g. in Settings)
+    and is left alone; a differing file never synced before is backed up to
+    `<name>.bak` before being replaced.
+
+    `session` is the pooled requests.Session of the prompt fetcher.
+    `on_updated(names)` is called after files change (e.g. to refresh a registry).
+    """
+
+    def __init__(self, prompts_dir, state_path, session, base_url, headers=None, max_workers=4,
+                 timeout=15, on_updated=None):
+        self.prompts_dir = prompts_dir
+        self.state_path = state_path
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.headers = headers or {}
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.on_updated = on_updated
+        self.logger = logging.getLogger("PromptSync")
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        _atomic_write_bytes(self.state_path, json.dumps(state).encode('utf-8'))
+
+    def _get(self, name):
+        response = self.session.get(f"{self.base_url}/{name}", headers=self.headers, timeout=self.timeout)
+        if response.status_code != 200:
+            raise IOError(f"HTTP {response.status_code} ao baixar {name}")
+        return response.content
+
+    def fetch_manifest(self):
+        manifest = json.loads(self._get(MANIFEST_NAME).decode('utf-8'))
+        if not isinstance(manifest.get('prompts'), list):
+            raise ValueError("Manifesto de prompts inválido")
+        return manifest
+
+    def _local_hash(self, name):
+        """sha256 of the local prompt, or None if it does not exist."""
+        try:
+            return file_sha256(os.path.join(self.prompts_dir, name))
+        except OSError:
+            return None
+
+    def _download(self, entry, backup=False):
+        data = self._get(entry['name'])
+        if len(data) != entry.get('size', len(data)) or hashlib.sha256(data).hexdigest() != entry['sha256']:
+            raise ValueError(f"Hash divergente para {entry['name']}")
+        path = os.path.join(self.prompts_dir, entry['name'])
+        if backup:
+            with open(path, 'rb') as f:
+                _atomic_write_bytes(f"{path}.bak", f.read())
+        _atomic_write_bytes(path, data)
+        return entry['name']
+
+    def sync(self, manifest_version=None):
+        """
+        Returns (updated_names, failed_names). Skips everything when `manifest_version`
+        (from version.json) matches the last complete sync.
+        """
+        state = self._load_state()
+        if manifest_version and state.get('manifest_v') == manifest_version:
+            return [], []
+
+        manifest = self.fetch_manifest()
+        entries = []
+        for entry in manifest['prompts']:
+            name = entry.get('name', '')
+            # Never let a manifest write outside prompts/
+            if not name.endswith('.md') or os.path.basename(name) != name or not entry.get('sha256'):
+                self.logger.warning(f"Entrada de manifesto ignorada: {entry}")
+                continue
+            entries.append(entry)
+
+        os.makedirs(self.prompts_dir, exist_ok=True)
+        synced = dict(state.get('files', {}))  # name -> sha256 at the last sync
+        stale = []
+        for entry in entries:
+            name = entry['name']
+            local = self._local_hash(name)
+            if local == entry['sha256']:
+                synced[name] = local
+            elif local is not None and name in synced and local != synced[name]:
+                # Edited locally since the last sync: never overwrite the user's changes
+                self.logger.warning(f"Prompt {name} foi editado localmente; versão remota não aplicada.")
+            else:
+                stale.append((entry, local is not None and name not in synced))
+
+        updated, failed = [], []
+        if stale:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="xalq-prompt-sync") as pool:
+                futures = {pool.submit(self._download, entry, backup): entry for entry, backup in stale}
+                for future, entry in futures.items():
+                    try:
+                        updated.append(future.result())
+                        synced[entry['name']] = entry['sha256']
+                    except Exception as e:
+                        self.logger.error(f"Falha ao sincronizar prompt {entry['name']}: {e}")
+                        failed.append(entry['name'])
+
+        if updated and self.on_updated:
+            self.on_updated(updated)
+        new_state = {'manifest_v': state.get('manifest_v'), 'files': synced}
+        if not failed:
+            new_state['manifest_v'] = manifest_version or manifest.get('version')
+        self._save_state(new_state)
+        return updated, failed
+
+
+if __name__ == "__main__":
+    # Regenerates prompts/manifest.json before publishing prompt changes:
+    #   python -m core.prompt_sync 20260212.12
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    prompts = os.path.join(root, 'prompts')
+    manifest_version = sys.argv[1] if len(sys.argv) > 1 else None
+    with open(os.path.join(prompts, MANIFEST_NAME), 'w', encoding='utf-8') as out:
+        json.dump(build_manifest(prompts, manifest_version), out, indent=2, ensure_ascii=False)
+        out.write("\n")
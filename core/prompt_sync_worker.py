@@ -0,0 +1,30 @@
+from PySide6.QtCore import QObject, Signal
+from core.updater import Updater
+
+
+class PromptSyncWorker(QObject):
+    """
+    Sincroniza os prompts com o manifesto do GitHub em uma thread separada,
+    para que nenhuma linha espere por download no meio de um lote.
+    Usa o Updater diretamente: nenhum WorkerEngine (nem o logger compartilhado)
+    é criado nesta thread.
+    """
+    progress = Signal(str)
+    finished = Signal(list)
+
+    def __init__(self, manifest_version=None):
+        super().__init__()
+        self.manifest_version = manifest_version
+
+    def run(self):
+        updated = []
+        try:
+            updated, failed = Updater().sync_prompts(self.manifest_version)
+            if updated:
+                self.progress.emit(f"🔄 {len(updated)} prompt(s) atualizados do GitHub: {', '.join(sorted(updated))}")
+            if failed:
+                self.progress.emit(f"Falha ao sincronizar {len(failed)} prompt(s): {', '.join(sorted(failed))}")
+        except Exception as e:
+            self.progress.emit(f"Erro na sincronização de prompts: {e}")
+        finally:
+            self.finished.emit(updated)
@@ -0,0 +1,141 @@
+import re
+from functools import lru_cache
+
+# Row data block; without it the block is appended after the prompt as before
+DATA_PLACEHOLDER = "DADOS_CLIENTE"
+DATA_HEADER = "DADOS DO CLIENTE:"
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(.+?)\s*\}\}")
+# <!-- campos: Coluna A | Coluna B -->  /  <!-- ignorar: Coluna C -->
+_DIRECTIVE = re.compile(r"<!--\s*(campos|ignorar)\s*:\s*(.*?)\s*-->\n?", re.IGNORECASE | re.DOTALL)
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    try:
+        # NaN / NaT are the only values not equal to themselves
+        return bool(value != value)
+    except (TypeError, ValueError):
+        return False
+
+
+def format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _resolve(name, columns):
+    """Column position for `name` (exact, then case/space-insensitive), or None."""
+    if name in columns:
+        return columns.index(name)
+    wanted = " ".join(name.lower().split())
+    for position, col in enumerate(columns):
+        if " ".join(str(col).lower().split()) == wanted:
+            return position
+    return None
+
+
+class PromptTemplate:
+    """
+    A prompt compiled against the spreadsheet columns.
+
+    Prompts may declare, anywhere in the text:
+    - `{{Nome da Coluna}}`: replaced by that cell of the row (empty if missing);
+    - `{{DADOS_CLIENTE}}`: where the row data block goes (default: appended at the end);
+    - `<!-- campos: A | B -->`: only these columns, in this order, go into the block;
+    - `<!-- ignorar: C | D -->`: columns left out of the block.
+
+    The data block is a compact `coluna: valor` list with empty and NaN cells
+    dropped. `prefix` is the static start of every rendered prompt, shared by
+    the prefix cache; `batchable` templates can pack several rows per request
+    after their prefix.
+    """
+
+    def __init__(self, prompt_text, columns):
+        columns = [str(col) for col in columns]
+        selected, ignored = None, set()
+        for kind, names in _DIRECTIVE.findall(prompt_text):
+            names = [n.strip() for n in names.split('|') if n.strip()]
+            if kind.lower() == 'campos':
+                selected = (selected or []) + names
+            else:
+                ignored.update(names)
+        text = _DIRECTIVE.sub("", prompt_text)
+
+        if selected is None:
+            fields = list(range(len(columns)))
+        else:
+            fields = [p for p in (_resolve(n, columns) for n in selected) if p is not None]
+        ignored_positions = {_resolve(n, columns) for n in ignored}
+        self.fields = [(columns[p], p) for p in fields if p not in ignored_positions]
+
+        # Static pieces alternate with placeholders: parts[0], ph[0], parts[1], ...
+        self.parts = []
+        self.placeholders = []
+        has_block = False
+        last = 0
+        for match in _PLACEHOLDER.finditer(text):
+            name = match.group(1)
+            if name == DATA_PLACEHOLDER:
+                has_block = True
+                position = DATA_PLACEHOLDER
+            else:
+                position = _resolve(name, columns)
+                if position is None:
+                    # Not a column: leave the text untouched
+                    continue
+            self.parts.append(text[last:match.start()])
+            self.placeholders.append(position)
+            last = match.end()
+        tail = text[last:]
+        if not has_block:
+            tail = f"{tail}\n\n{DATA_HEADER}\n"
+            self.placeholders.append(DATA_PLACEHOLDER)
+            self.parts.append(tail)
+            tail = ""
+        self.parts.append(tail)
+        self.text = text
+        # Prompts whose only placeholder is the data block at the end can be shared by a batch request
+        self.batchable = self.placeholders == [DATA_PLACEHOLDER] and not self.parts[-1].strip()
+        # Static text before the first placeholder: single-row and batch requests both start
+        # with it, so one server-side cache serves both
+        self.prefix = self.parts[0]
+
+    def _block(self, values):
+        lines = []
+        for label, position in self.fields:
+            value = values[position]
+            if not _is_empty(value):
+                lines.append(f"{label}: {format_value(value)}")
+        return "\n".join(lines)
+
+    def render_block(self, row):
+        """Compact `coluna: valor` lines for the row (a Series aligned with the compiled columns)."""
+        return self._block(row.tolist())
+
+    def render(self, row):
+        """Full prompt for the row."""
+        values = row.tolist()
+        out = [self.parts[0]]
+        for placeholder, part in zip(self.placeholders, self.parts[1:]):
+            if placeholder == DATA_PLACEHOLDER:
+                out.append(self._block(values))
+            else:
+                value = values[placeholder]
+                out.append("" if _is_empty(value) else format_value(value))
+            out.append(part)
+        return "".join(out)
+
+
+@lru_cache(maxsize=32)
+def _compile(prompt_text, columns):
+    return PromptTemplate(prompt_text, columns)
+
+
+def compile_template(prompt_text, columns):
+    """Compiled template for this prompt and column set, built once and reused by every row."""
+    return _compile(prompt_text, tuple(str(col) for col in columns))
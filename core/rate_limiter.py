@@ -0,0 +1,164 @@
+import re
+import time
+import random
+import threading
+
+
+def normalize_model_name(model_name):
+    """'models/gemini-2.5-pro' and 'gemini-2.5-pro' share the same quota."""
+    return model_name[len('models/'):] if model_name.startswith('models/') else model_name
+
+
+def parse_retry_after(error):
+    """
+    Extracts the server's retry hint (in seconds) from a Gemini/HTTP error.
+    Understands gRPC RetryInfo ("retry_delay { seconds: 34 }"), the
+    "Please retry in 12.3s" message and HTTP Retry-After headers.
+    """
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        if headers.get('Retry-After'):
+            return float(headers['Retry-After'])
+    except (TypeError, ValueError, AttributeError):
+        pass
+
+    text = str(error)
+    match = re.search(r"retry_delay\s*\{\s*seconds:\s*(\d+)", text)
+    if match:
+        return float(match.group(1))
+    match = re.search(r"retry in\s*([\d.]+)\s*s", text, re.IGNORECASE)
+    if match:
+        return float(match.group(1))
+    return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate_per_min`."""
+
+    def __init__(self, rate_per_min, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_min / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_min)
+        self.tokens = self.capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_consume(self, amount):
+        """Consumes `amount` tokens if available. Returns 0 on success or the seconds to wait."""
+        with self._lock:
+            self._refill()
+            # Requests larger than the bucket are allowed once it is full
+            amount = min(amount, self.capacity)
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0.0
+            return (amount - self.tokens) / self.rate
+
+    def refund(self, amount):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    """
+    Per-model quota shared by every row of a batch: one bucket for requests/min
+    and one for tokens/min. `penalize` honours retry-after hints by pausing the
+    model for everyone, so concurrent rows stop hammering an exhausted quota.
+    """
+
+    DEFAULT_LIMITS = {'rpm': 60, 'tpm': 1_000_000}
+
+    def __init__(self, limits=None, default_limits=None, clock=time.monotonic, sleep=time.sleep):
+        self.limits = {normalize_model_name(k): v for k, v in (limits or {}).items()}
+        self.default_limits = default_limits or dict(self.DEFAULT_LIMITS)
+        self._clock = clock
+        self._sleep = sleep
+        self._buckets = {}
+        self._paused_until = {}
+        self._lock = threading.Lock()
+
+    def _buckets_for(self, model_name):
+        with self._lock:
+            buckets = self._buckets.get(model_name)
+            if buckets is None:
+                limits = dict(self.default_limits, **self.limits.get(model_name, {}))
+                buckets = (
+                    TokenBucket(limits['rpm'], clock=self._clock) if limits.get('rpm') else None,
+                    TokenBucket(limits['tpm'], clock=self._clock) if limits.get('tpm') else None,
+                )
+                self._buckets[model_name] = buckets
+            return buckets
+
+    def penalize(self, model_name, seconds):
+        model_name = normalize_model_name(model_name)
+        with self._lock:
+            until = self._clock() + seconds
+            self._paused_until[model_name] = max(self._paused_until.get(model_name, 0.0), until)
+
+    def acquire(self, model_name, tokens=0, cancel_check=None, max_wait=None):
+        """
+        Blocks until the model has quota for one request of `tokens` tokens.
+        Returns False if cancelled or if the wait would exceed `max_wait` seconds.
+        """
+        model_name = normalize_model_name(model_name)
+        request_bucket, token_bucket = self._buckets_for(model_name)
+        started = self._clock()
+
+        while True:
+            if cancel_check and cancel_check():
+                return False
+
+            with self._lock:
+                wait = self._paused_until.get(model_name, 0.0) - self._clock()
+            if wait <= 0 and request_bucket:
+                wait = request_bucket.try_consume(1)
+            if wait <= 0 and token_bucket and tokens:
+                wait = token_bucket.try_consume(tokens)
+                if wait > 0 and request_bucket:
+                    # Give the request slot back while waiting for token budget
+                    request_bucket.refund(1)
+            if wait <= 0:
+                return True
+
+            if max_wait is not None and self._clock() - started + wait > max_wait:
+                return False
+            # Sleep in short slices so cancellation stays responsive
+            self._sleep(min(wait, 1.0))
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter, applied per model rather than per fallback chain."""
+
+    def __init__(self, max_attempts=3, base_delay=2.0, max_delay=60.0, jitter=0.25):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (1-based)."""
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * (1 + random.uniform(-self.jitter, self.jitter))
+
+    @staticmethod
+    def is_retryable(error):
+        """429s, 5xx and network/timeouts are worth retrying on the same model."""
+        text = str(error)
+        markers = ("429", "ResourceExhausted", "500", "502", "503", "504",
+                   "InternalServerError", "ServiceUnavailable", "DeadlineExceeded", "timed out", "Timeout")
+        return any(m in text for m in markers) or error.__class__.__name__ in (
+            "ConnectionError", "Timeout", "ReadTimeout", "ServiceUnavailable", "DeadlineExceeded",
+        )
+
+    @staticmethod
+    def is_rate_limit(error):
+        text = str(error)
+        return "429" in text or "ResourceExhausted" in text
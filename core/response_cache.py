@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache of AI responses.
+
+    Each entry is a JSON file named after the SHA-256 of the request (prompt,
+    serialized row, model and generation config). Entries older than
+    `max_age_days` are ignored and pruned; when the cache grows beyond
+    `max_size_mb` the least recently used entries are evicted.
+
+    Writes keep a running size total, so the directory is only scanned on the
+    first write, when the total passes `max_size_mb`, or every `evict_every`
+    writes (to prune expired entries), not on every put.
+    """
+
+    def __init__(self, cache_dir, max_age_days=30, max_size_mb=200, evict_every=256):
+        self.cache_dir = cache_dir
+        self.max_age = max_age_days * 86400
+        self.max_size = max_size_mb * 1024 * 1024
+        self.evict_every = evict_every
+        self.logger = logging.getLogger("ResponseCache")
+        self._lock = threading.Lock()
+        self._size = None  # bytes on disk as of the last scan plus later writes; None = not scanned yet
+        self._writes = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(prompt_text, row_data, model_name, generation_config):
+        """Builds a stable hash for a request. `generation_config` must be JSON serializable."""
+        payload = json.dumps(
+            {
+                "prompt": prompt_text,
+                "row": row_data,
+                "model": model_name,
+                "config": generation_config,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                self._remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            # Touch to keep LRU ordering by mtime
+            os.utime(path, None)
+            return entry.get("response")
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.error(f"Entrada de cache corrompida {key}: {e}")
+            self._remove(path)
+            return None
+
+    def put(self, key, response, model_name=None):
+        entry = {"created": time.time(), "model": model_name, "response": response}
+        path = self._path(key)
+        try:
+            # Atomic write: concurrent rows never observe a half-written entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            written = os.path.getsize(tmp_path)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.error(f"Falha ao gravar cache {key}: {e}")
+            return
+        with self._lock:
+            self._writes += 1
+            if self._size is not None:
+                self._size += written - replaced
+            scan = self._size is None or self._size > self.max_size or self._writes >= self.evict_every
+        if scan:
+            self.evict()
+
+    def evict(self):
+        """Removes expired entries and trims the cache down to `max_size`."""
+        with self._lock:
+            now = time.time()
+            entries = []
+            total = 0
+            try:
+                names = os.listdir(self.cache_dir)
+            except OSError:
+                return
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                if now - st.st_mtime > self.max_age:
+                    self._remove(path)
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+            if total > self.max_size:
+                for _, size, path in sorted(entries):
+                    self._remove(path)
+                    total -= size
+                    if total <= self.max_size:
+                        break
+            self._size = total
+            self._writes = 0
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    self._remove(os.path.join(self.cache_dir, name))
+            self._size = 0
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,117 @@
+import re
+
+# All 14 sections matching template_xalq.docx, in report order
+SECTIONS = [
+    "RESUMO_EXECUTIVO", "DIAGNOSTICO", "LACUNAS", "CLASSIFICACAO",
+    "ESTRUTURA_TO_BE", "MATRIZ_DE_METRICAS", "ARQUITETURA_CONCEITUAL_DE_DADOS",
+    "PERGUNTAS_DECISORIAS", "KPIS_ASSOCIADOS", "VISUALIZACAO_CONCEITUAL",
+    "RISCOS_ATUAIS", "RISCOS_SE_NAO_IMPLEMENTAR",
+    "OBSERVACOES_XALQ", "PROXIMOS_PASSOS"
+]
+
+# One pattern for every opening/closing tag, so the response is scanned once
+_TAG = re.compile(r"\[(/?)(" + "|".join(SECTIONS) + r")\]", re.IGNORECASE)
+_CANONICAL = {s.casefold(): s for s in SECTIONS}
+
+# Header-style answers ("## Resumo Executivo:"), matched after uppercasing and
+# dropping accents. Dict order is the precedence when a line holds several headers.
+HEADER_SECTIONS = {
+    "RESUMO EXECUTIVO": "RESUMO_EXECUTIVO",
+    "DIAGNOSTICO": "DIAGNOSTICO",
+    "LACUNAS": "LACUNAS",
+    "CLASSIFICACAO": "CLASSIFICACAO",
+    "ESTRUTURA TO BE": "ESTRUTURA_TO_BE",
+    "ESTRUTURA TO-BE": "ESTRUTURA_TO_BE",
+    "MATRIZ DE METRICAS": "MATRIZ_DE_METRICAS",
+    "ARQUITETURA CONCEITUAL": "ARQUITETURA_CONCEITUAL_DE_DADOS",
+    "PERGUNTAS DECISORIAS": "PERGUNTAS_DECISORIAS",
+    "KPIS ASSOCIADOS": "KPIS_ASSOCIADOS",
+    "VISUALIZACAO CONCEITUAL": "VISUALIZACAO_CONCEITUAL",
+    "RISCOS ATUAIS": "RISCOS_ATUAIS",
+    "RISCOS SE NAO": "RISCOS_SE_NAO_IMPLEMENTAR",
+    "OBSERVACOES": "OBSERVACOES_XALQ",
+    "PROXIMOS PASSOS": "PROXIMOS_PASSOS",
+}
+_HEADER = re.compile("|".join(re.escape(k) for k in HEADER_SECTIONS))
+_HEADER_MAX_LEN = 50
+
+
+def parse_tagged(text):
+    """
+    [SECTION]...[/SECTION] answers in a single scan. For each section the content
+    runs from its first opening tag to the first closing tag after it; sections
+    without a complete pair map to "".
+    """
+    parsed = dict.fromkeys(SECTIONS, "")
+    opened = {}
+    closed = set()
+    for match in _TAG.finditer(text):
+        name = _CANONICAL.get(match.group(2).casefold())
+        if not match.group(1):
+            opened.setdefault(name, match.end())
+        elif name in opened and name not in closed:
+            parsed[name] = text[opened[name]:match.start()].strip()
+            closed.add(name)
+    return parsed
+
+
+def parse_headers(text, parsed):
+    """
+    Fallback for header-style answers: every line after a short header line
+    ("Resumo Executivo:", "## DIAGNÓSTICO") is appended to that section in `parsed`.
+    """
+    current = None
+    appended = {}
+    # Chained str.replace is much faster than str.translate on non-ASCII text
+    for line in text.replace("*", "").replace("#", "").split('\n'):
+        header = line.strip().upper()
+        # Cheap length test first: only short lines can be headers
+        if len(header) - header.count(":") < _HEADER_MAX_LEN:
+            header = (
+                header.replace(":", "").replace("\u00c1", "A").replace("\u00c9", "E")
+                .replace("\u00d3", "O").replace("\u00ca", "E")
+            )
+            if _HEADER.search(header):
+                current = next(v for k, v in HEADER_SECTIONS.items() if k in header)
+                appended.setdefault(current, [])
+                continue
+        if current:
+            appended[current].append(line)
+    for name, lines in appended.items():
+        if lines:
+            parsed[name] = parsed.get(name, "") + "\n".join(lines) + "\n"
+    return parsed
+
+
+class StreamingSectionParser:
+    """
+    Incremental [SECTION]...[/SECTION] parser for streamed responses.
+
+    `feed` receives each chunk as it arrives and returns the sections that were
+    closed by it, so progress can be reported while the model is still writing.
+    Only the unscanned tail of the buffer is searched on every chunk.
+    """
+
+    _TAG = _TAG
+    _MAX_TAG_LEN = max(len(s) for s in SECTIONS) + 3
+
+    def __init__(self):
+        self.text = ""
+        self.sections = {}
+        self._scan_from = 0
+        self._open = {}
+
+    def feed(self, chunk):
+        self.text += chunk
+        completed = []
+        # Re-scan a tag's length back so tags split across chunks are still found
+        for match in self._TAG.finditer(self.text, self._scan_from):
+            closing, name = match.group(1), match.group(2).upper()
+            if not closing:
+                self._open.setdefault(name, match.end())
+            elif name in self._open and name not in self.sections:
+                self.sections[name] = self.text[self._open[name]:match.start()].strip()
+                completed.append(name)
+            self._scan_from = match.end()
+        self._scan_from = max(self._scan_from, len(self.text) - self._MAX_TAG_LEN)
+        return completed
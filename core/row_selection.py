@@ -0,0 +1,47 @@
+def select_rows(df, selection):
+    """
+    Rows of `df` named by `selection`, in file order, without visiting the others:
+    - None: every row;
+    - a slice: positional, like df.iloc[selection];
+    - a range, list, set or other iterable: index labels (missing labels are ignored);
+    - a callable: a filter `selection(df) -> boolean mask`, evaluated on the whole column.
+    """
+    if selection is None:
+        return df
+    if callable(selection):
+        return df[selection(df)]
+    if isinstance(selection, slice):
+        return df.iloc[selection]
+    return df.loc[df.index.isin(list(selection))]
+
+
+def iter_selected(rows, selection):
+    """
+    `select_rows` for rows arriving one at a time as (row_idx, row) (streaming ingestion).
+    Slices must be non-negative; with labels or a bounded slice, reading stops after the last match.
+    """
+    if selection is None:
+        yield from rows
+        return
+    labels = last = None
+    if isinstance(selection, slice):
+        start, stop, step = selection.start or 0, selection.stop, selection.step or 1
+    elif not callable(selection):
+        labels = set(selection)
+        if labels and all(isinstance(label, int) for label in labels):
+            last = max(labels)
+
+    for position, (row_idx, row) in enumerate(rows):
+        if labels is not None:
+            if row_idx in labels:
+                yield row_idx, row
+            if last is not None and row_idx >= last:
+                return
+        elif callable(selection):
+            if bool(selection(row.to_frame().T).iloc[0]):
+                yield row_idx, row
+        else:
+            if stop is not None and position >= stop:
+                return
+            if position >= start and (position - start) % step == 0:
+                yield row_idx, row
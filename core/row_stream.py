@@ -0,0 +1,102 @@
+import math
+
+
+def _column_names(header):
+    """Header cells as pandas names them: blanks become 'Unnamed: i', duplicates get '.1', '.2'."""
+    names, seen = [], {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None or (isinstance(value, str) and not value.strip()) else value
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+class RowStream:
+    """
+    Rows of a CSV/XLSX file read as they are needed, never the whole file.
+
+    CSV is read `chunk_rows` rows at a time with pd.read_csv(chunksize=...);
+    XLSX goes through openpyxl in read-only mode, one row at a time. Iterating
+    yields (row_idx, row) like DataFrame.iterrows(), with the same 0-based
+    index and column names pd.read_csv / pd.read_excel would give, so memory
+    stays flat with the file size and the first row is available as soon as
+    it is parsed.
+
+    `columns` is known once the stream is open; `total` is the row count when
+    the file declares it (XLSX dimensions), None otherwise. Use as a context
+    manager, or call `close()`.
+    """
+
+    def __init__(self, file_path, chunk_rows=1000):
+        import pandas as pd
+        self._pd = pd
+        self.file_path = file_path
+        self.chunk_rows = chunk_rows
+        self.total = None
+        self._workbook = None
+        self._reader = None
+        if file_path.endswith('.csv'):
+            self._reader = pd.read_csv(file_path, chunksize=chunk_rows)
+            self._first_chunk = next(self._reader, None)
+            if self._first_chunk is None:
+                self.columns = pd.Index([])
+            else:
+                self.columns = self._first_chunk.columns
+        else:
+            from openpyxl import load_workbook
+            self._workbook = load_workbook(file_path, read_only=True, data_only=True)
+            sheet = self._workbook.worksheets[0]
+            self._rows = sheet.iter_rows(values_only=True)
+            header = list(next(self._rows, ()))
+            while header and header[-1] is None:
+                header.pop()
+            self.columns = pd.Index(_column_names(header))
+            if sheet.max_row:
+                self.total = max(0, sheet.max_row - 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+
+    def __iter__(self):
+        if self._reader is not None:
+            return self._iter_csv()
+        return self._iter_xlsx()
+
+    def _iter_csv(self):
+        chunk, self._first_chunk = self._first_chunk, None
+        while chunk is not None:
+            # The reader keeps numbering across chunks, like a single read_csv
+            yield from chunk.iterrows()
+            chunk = next(self._reader, None) if self._reader is not None else None
+
+    def _iter_xlsx(self):
+        width = len(self.columns)
+        blank = 0  # Blank rows are only kept when data follows (read_excel drops trailing ones)
+        row_idx = 0
+        for values in self._rows:
+            values = [math.nan if v is None else v for v in values[:width]]
+            values += [math.nan] * (width - len(values))
+            if all(isinstance(v, float) and math.isnan(v) for v in values):
+                blank += 1
+                continue
+            for _ in range(blank):
+                yield row_idx, self._pd.Series([math.nan] * width, index=self.columns, name=row_idx, dtype=object)
+                row_idx += 1
+            blank = 0
+            yield row_idx, self._pd.Series(values, index=self.columns, name=row_idx, dtype=object)
+            row_idx += 1
@@ -0,0 +1,69 @@
+import json
+
+from core.response_parser import SECTIONS
+
+# JSON schema of the answer in structured mode: one string per report section
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {section: {"type": "string"} for section in SECTIONS},
+    "required": list(SECTIONS),
+}
+
+JSON_INSTRUCTIONS = """
+FORMATO DE SAÍDA: responda APENAS com um objeto JSON com exatamente estas chaves:
+{keys}.
+Cada valor é o texto completo da seção (use "- " para tópicos, "1. " para listas numeradas
+e quebras de linha normais). Não use as tags [SEÇÃO] nem texto fora do JSON.
+""".format(keys=", ".join(SECTIONS))
+
+MIN_SECTIONS = 3
+
+
+def structured_generation_config(generation_config):
+    """Adds JSON mode and the section schema to a generation config dict."""
+    return dict(generation_config, response_mime_type="application/json", response_schema=RESPONSE_SCHEMA)
+
+
+def with_json_instructions(prompt):
+    """Appends the output contract at the end, so the shared prompt prefix stays intact."""
+    return f"{prompt}\n\n{JSON_INSTRUCTIONS}"
+
+
+def parse_structured(text):
+    """
+    Validates a JSON answer against the section schema. Returns {section: text}
+    for all 14 sections, or None when the text is not a usable JSON report
+    (not JSON, not an object, or fewer than MIN_SECTIONS filled sections).
+    """
+    if not text:
+        return None
+    text = text.strip()
+    if text.startswith("```"):
+        # Some models wrap JSON in a markdown fence despite the MIME type
+        text = text.strip("`")
+        if text[:4].lower() == "json":
+            text = text[4:]
+        text = text.strip()
+    if not text.startswith("{"):
+        return None
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    lookup = {str(k).upper(): v for k, v in data.items()}
+    parsed = {}
+    for section in SECTIONS:
+        value = lookup.get(section, "")
+        if isinstance(value, list):
+            value = "\n".join(str(item) for item in value)
+        elif value is None:
+            value = ""
+        elif not isinstance(value, str):
+            value = str(value)
+        parsed[section] = value.strip()
+    if sum(1 for v in parsed.values() if v) < MIN_SECTIONS:
+        return None
+    return parsed
@@ -0,0 +1,70 @@
+import math
+
+# Published limits per model (tokens) and a relative cost rank (lower = cheaper)
+MODEL_LIMITS = {
+    'gemini-3-pro-preview': {'input': 1_048_576, 'output': 65_536, 'cost': 5},
+    'gemini-2.5-pro': {'input': 1_048_576, 'output': 65_536, 'cost': 4},
+    'gemini-1.5-pro': {'input': 2_097_152, 'output': 8_192, 'cost': 3},
+    'gemini-2.5-flash': {'input': 1_048_576, 'output': 65_536, 'cost': 2},
+    'gemini-flash-latest': {'input': 1_048_576, 'output': 65_536, 'cost': 2},
+    'gemini-2.0-flash': {'input': 1_048_576, 'output': 8_192, 'cost': 1},
+    'gemini-1.5-flash': {'input': 1_048_576, 'output': 8_192, 'cost': 1},
+}
+
+TRUNCATION_MARKER = " [...]"
+
+
+def estimate_tokens(text):
+    """Cheap local estimate (~3.5 chars per token for Portuguese prose), errs on the high side."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / 3.5)
+
+
+def fit_values(values, available_tokens):
+    """
+    Trims the longest values so their total estimated size fits `available_tokens`.
+    Uses water-filling: every value above a common cap is cut down to that cap,
+    short values are left untouched. Returns (values, trimmed_keys).
+    """
+    sizes = {k: estimate_tokens(v) for k, v in values.items()}
+    if sum(sizes.values()) <= available_tokens:
+        return values, []
+
+    # Find the largest cap such that sum(min(size, cap)) fits
+    ordered = sorted(sizes.values())
+    remaining = max(0, available_tokens)
+    cap = 0
+    for i, size in enumerate(ordered):
+        share = remaining // (len(ordered) - i)
+        if size > share:
+            cap = share
+            break
+        remaining -= size
+    else:
+        cap = ordered[-1]
+
+    fitted = dict(values)
+    trimmed = []
+    for k, size in sizes.items():
+        if size > cap:
+            keep_chars = max(0, int(cap * 3.5) - len(TRUNCATION_MARKER))
+            fitted[k] = values[k][:keep_chars].rstrip() + TRUNCATION_MARKER
+            trimmed.append(k)
+    return fitted, trimmed
+
+
+def route_model(candidates, input_tokens, output_tokens):
+    """
+    Cheapest model of `candidates` whose limits fit the request. Unknown models
+    are considered to fit but rank last. Returns None if nothing fits.
+    """
+    best = None
+    for position, name in enumerate(candidates):
+        limits = MODEL_LIMITS.get(name[len('models/'):] if name.startswith('models/') else name)
+        if limits and (limits['input'] < input_tokens or limits['output'] < output_tokens):
+            continue
+        rank = (limits['cost'] if limits else math.inf, position)
+        if best is None or rank < best[0]:
+            best = (rank, name)
+    return best[1] if best else None
@@ -1,9 +1,10 @@
 import os
 import json
-import requests
 import logging
-from functools import lru_cache
 from PySide6.QtCore import QSettings
+from core.prompt_fetcher import get_fetcher
+from core.prompt_registry import get_registry
+from core.prompt_sync import PromptSync
 
 class Updater:
     def __init__(self, base_dir=None):
@@ -33,7 +34,8 @@ class Updater:
         """
         try:
             url = f"{self.github_repo_url}/version.json"
-            response = requests.get(url, timeout=5)
+            # Pooled session shared with the prompt fetcher
+            response = get_fetcher(os.path.join(self.base_dir, 'cache', 'http')).session.get(url, timeout=5)
             response.raise_for_status()
             remote_data = response.json()
             
@@ -71,11 +73,10 @@ class Updater:
         except ValueError:
             return 0
 
-    @lru_cache(maxsize=32)
     def get_github_prompt(self, filename):
         """
         Fetches a prompt file from GitHub using the configured PAT.
-        Uses LRU cache to minimize requests.
+        Goes through the shared prompt fetcher (ETag revalidation, short negative TTL).
         """
         pat = self.settings.value("github_pat", "")
         headers = {}
@@ -88,14 +89,41 @@ class Updater:
             
         url = f"{self.github_repo_url}/prompts/{filename}"
         
-        try:
-            self.logger.debug(f"Fetching prompt from GitHub: {url}")
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            return response.text
-        except Exception as e:
-            self.logger.error(f"Error fetching prompt {filename}: {e}")
-            return None
+        self.logger.debug(f"Fetching prompt from GitHub: {url}")
+        fetcher = get_fetcher(os.path.join(self.base_dir, 'cache', 'http'))
+        content = fetcher.fetch(url, headers)
+        if content is None:
+            self.logger.error(f"Error fetching prompt {filename}: {fetcher.last_error(url)}")
+        return content
+
+    def sync_prompts(self, manifest_version=None, max_workers=None):
+        """
+        Brings prompts/ in line with the remote manifest (see core/prompt_sync.py) without
+        needing a WorkerEngine, e.g. from a background thread. `manifest_version` is
+        version.json's assets.prompt_manifest_v; unchanged means no work.
+        Returns (updated_names, failed_names); raises if the manifest is unavailable.
+        """
+        pat = os.environ.get("GITHUB_PAT") or self.settings.value("github_pat", "")
+        headers = {"Authorization": f"token {pat}"} if pat else {}
+        if max_workers is None:
+            try:
+                max_workers = max(1, int(
+                    os.environ.get("XALQ_PROMPT_SYNC_WORKERS") or self.settings.value("prompt_sync_workers", 4)
+                ))
+            except (TypeError, ValueError):
+                max_workers = 4
+        prompts_dir = os.path.join(self.base_dir, 'prompts')
+        sync = PromptSync(
+            prompts_dir,
+            os.path.join(self.base_dir, 'cache', 'prompt_sync.json'),
+            get_fetcher(os.path.join(self.base_dir, 'cache', 'http')).session,
+            f"{self.github_repo_url}/prompts",
+            headers=headers,
+            max_workers=max_workers,
+            # The registry is shared, so every engine of this process sees the new prompts
+            on_updated=lambda names: get_registry(prompts_dir).invalidate(),
+        )
+        return sync.sync(manifest_version)
 
     def perform_update(self):
         """
@@ -2,14 +2,31 @@ import os
 import datetime
 import logging
 import json
-import requests
 import re
 import platform
-import google.generativeai as genai
-from docx import Document
+import time
+import threading
 from PySide6.QtCore import QSettings
-from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, Future, wait, as_completed, FIRST_COMPLETED
 from core.updater import Updater
+from core.response_cache import ResponseCache
+from core.model_health import ModelHealthRegistry
+from core.rate_limiter import RateLimiter, RetryPolicy, parse_retry_after, normalize_model_name
+from core.response_parser import SECTIONS, StreamingSectionParser, parse_tagged, parse_headers
+from core.batching import build_batch_prompt, split_batch_response, adaptive_batch_size
+from core.prompt_cache import PrefixCacheSession
+from core.prompt_registry import get_registry
+from core.prompt_fetcher import get_fetcher
+from core.prompt_template import compile_template
+from core.dataset_cache import get_dataset_cache
+from core.row_stream import RowStream
+from core.column_roles import infer_column_roles
+from core.row_selection import select_rows, iter_selected
+from core.job_journal import JobJournal, QUEUED, IN_FLIGHT, AI_DONE, RENDERED, FAILED, TIMED_OUT
+from core.docx_renderer import RenderStage, render_report
+from core.structured_output import parse_structured, structured_generation_config, with_json_instructions
+from core.ai_backend import GeminiBackend
+from core.token_budget import estimate_tokens, fit_values, route_model
 
 # Load .env file if present
 try:
@@ -18,13 +35,39 @@ try:
 except ImportError:
     pass  # dotenv not installed, rely on system env vars
 
+
+class GenerationCancelled(Exception):
+    """Raised when the user cancels while a generation is in flight."""
+
+
+class RowTimeout(Exception):
+    """Raised when a row exhausts its deadline across the whole fallback chain."""
+
+
+class _PrefixRejected(Exception):
+    """A request using a cached prompt prefix failed; retry without the cache."""
+
+    def __init__(self, error):
+        super().__init__(str(error))
+        self.error = error
+
+
+# _generate_once result when the model's circuit refused the request
+_SKIPPED = object()
+
 class WorkerEngine:
-    def __init__(self, base_dir=None, progress_callback=None, api_key=None):
+    def __init__(self, base_dir=None, progress_callback=None, api_key=None, backend=None):
         # Initialize attributes first to prevent AttributeError in log_and_progress or elsewhere
+        # backend: AIBackend implementation (core/ai_backend.py); Gemini unless given, e.g. FakeBackend in tests
+        self.backend = backend or GeminiBackend()
         self.api_key = None
         self.github_pat = None
         self.check_cancellation = None
         self.progress_callback = progress_callback
+        self._report_tokens_avg = None
+        self._token_counts = {}  # (model, prompt) -> tokens, see _prompt_tokens
+        self._token_counts_lock = threading.Lock()
+        self._row_outcome = threading.local()  # .timed_out: last call_ai_api on this thread expired
         
         self.base_dir = base_dir or os.path.dirname(os.path.abspath(__file__))
         
@@ -38,12 +81,32 @@ class WorkerEngine:
         self.templates_dir = os.path.join(self.base_dir, 'templates')
         self.error_dir = os.path.join(self.base_dir, 'error')
         self.log_dir = os.path.join(self.base_dir, 'logs')
+        self.cache_dir = os.path.join(self.base_dir, 'cache')
         
         self._ensure_dirs()
         self.logger = self._setup_logging()
+        self.prompts = get_registry(self.prompts_dir)
+        self.journal_path = os.path.join(self.processing_dir, 'jobs.sqlite3')
         
         self.settings = QSettings("XALQ", "XALQ Agent")
         self.updater = Updater(self.base_dir)
+        # Shared by every row (and worker thread) of this engine
+        self.model_health = ModelHealthRegistry()
+        self.rate_limiter = RateLimiter(self._load_rate_limits())
+        self.retry_policy = RetryPolicy(
+            max_attempts=self._get_int_setting("max_attempts_per_model", "XALQ_MAX_ATTEMPTS_PER_MODEL", 3)
+        )
+        self.response_cache = ResponseCache(
+            os.path.join(self.cache_dir, 'responses'),
+            max_age_days=self._get_int_setting("cache_max_age_days", "XALQ_CACHE_MAX_AGE_DAYS", 30),
+            max_size_mb=self._get_int_setting("cache_max_size_mb", "XALQ_CACHE_MAX_SIZE_MB", 200),
+        )
+        # Shared with the other engines of this process (UI listing + ProcessingWorker)
+        self.datasets = get_dataset_cache(
+            os.path.join(self.processing_dir, 'datasets'),
+            max_age_days=self._get_int_setting("dataset_cache_max_age_days", "XALQ_DATASET_CACHE_MAX_AGE_DAYS", 30),
+            max_size_mb=self._get_int_setting("dataset_cache_max_size_mb", "XALQ_DATASET_CACHE_MAX_SIZE_MB", 500),
+        )
         
         # GitHub Config
         self.repo_url = "https://raw.githubusercontent.com/andreocc/XALQ-Agent/main/prompts/"
@@ -87,7 +150,7 @@ class WorkerEngine:
 
     def _configure_gemini(self):
         if self.api_key:
-            genai.configure(api_key=self.api_key)
+            self.backend.configure(self.api_key)
             self.log_and_progress("Gemini configurado com sucesso.", "debug")
         else:
             self.log_and_progress("Gemini API Key não configurada!", "error")
@@ -115,31 +178,48 @@ class WorkerEngine:
         if self.progress_callback:
             self.progress_callback(message)
 
-    @lru_cache(maxsize=32)
     def fetch_github_prompt(self, filename):
-        """Fetches prompt from GitHub with caching and PAT authentication."""
+        """
+        Fetches prompt from GitHub with PAT authentication through the shared
+        fetcher (pooled session, on-disk ETag cache, short negative TTL).
+        """
+        url = f"{self.repo_url}{filename}"
+        headers = {}
+        if self.github_pat:
+            headers["Authorization"] = f"token {self.github_pat}"
+
+        fetcher = get_fetcher(os.path.join(self.cache_dir, 'http'))
+        content = fetcher.fetch(url, headers)
+        if content is not None:
+            self.log_and_progress(f"Prompt obtido do GitHub: {filename}", "debug")
+            return content
+        reason = fetcher.last_error(url)
+        self.log_and_progress(f"Falha ao baixar prompt do GitHub ({reason}): {filename}", "error")
+        return None
+
+    def sync_prompts(self, manifest_version=None):
+        """
+        Downloads the prompts changed since the last sync (see core/prompt_sync.py).
+        `manifest_version` is version.json's assets.prompt_manifest_v; unchanged means no work.
+        Returns the list of updated prompt files.
+        """
         try:
-            url = f"{self.repo_url}{filename}"
-            headers = {}
-            if self.github_pat:
-                headers["Authorization"] = f"token {self.github_pat}"
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                self.log_and_progress(f"Prompt baixado do GitHub: {filename}", "debug")
-                return response.text
-            else:
-                self.log_and_progress(f"Falha ao baixar prompt do GitHub ({response.status_code}): {filename}", "error")
-                return None
+            updated, failed = self.updater.sync_prompts(
+                manifest_version,
+                max_workers=self._get_int_setting("prompt_sync_workers", "XALQ_PROMPT_SYNC_WORKERS", 4),
+            )
         except Exception as e:
-            self.log_and_progress(f"Erro de conexão GitHub: {e}", "error")
-            return None
+            self.log_and_progress(f"Sincronização de prompts indisponível: {e}", "error")
+            return []
+        if updated:
+            self.log_and_progress(f"🔄 {len(updated)} prompt(s) atualizados do GitHub: {', '.join(sorted(updated))}")
+        if failed:
+            self.log_and_progress(f"Falha ao sincronizar {len(failed)} prompt(s): {', '.join(sorted(failed))}", "error")
+        return updated
 
     def save_prompt_content(self, filename, content):
         try:
-            path = os.path.join(self.prompts_dir, filename)
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            self.prompts.write(filename, content)
             return True
         except Exception as e:
             self.logger.error(f"Erro ao salvar prompt {filename}: {e}")
@@ -147,9 +227,7 @@ class WorkerEngine:
 
     def read_prompt_content(self, filename):
         try:
-            full_path = os.path.join(self.prompts_dir, filename)
-            with open(full_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return self.prompts.read(filename)
         except Exception as e:
             self.log_and_progress(f"Error reading prompt file {filename}: {e}", "error")
             return None
@@ -157,27 +235,14 @@ class WorkerEngine:
     def load_agent_prompt(self, agent_type):
         """
         Loads prompt content. Prioritizes local file, falls back to GitHub.
-        Normalizes filenames for robustness.
+        Normalizes filenames for robustness. Local prompts come from the shared
+        in-memory registry (core/prompt_registry.py), not a directory scan per row.
         """
-        import unicodedata
-
-        def normalize(text):
-            text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode('utf-8')
-            return text.lower().replace(" ", "").replace("-", "").replace("_", "")
-
-        target_normalized = normalize(agent_type)
-        
-        # 1. Try Local
+        # 1. Try Local (exact, then normalized name)
         try:
-            local_files = [f for f in os.listdir(self.prompts_dir) if f.endswith('.md')]
-            for fname in local_files:
-                # Exact
-                if fname == agent_type or fname == f"{agent_type}.md":
-                    return self.read_prompt_content(fname)
-                # Fuzzy
-                fname_normalized = normalize(fname.replace(".md", ""))
-                if fname_normalized == target_normalized:
-                    return self.read_prompt_content(fname)
+            fname = self.prompts.resolve(agent_type)
+            if fname:
+                return self.read_prompt_content(fname)
         except Exception as e:
             self.log_and_progress(f"Error listing local prompts: {e}", "error")
 
@@ -193,8 +258,7 @@ class WorkerEngine:
              mapped_name += '.md'
 
         # Check local mapped
-        full_path = os.path.join(self.prompts_dir, mapped_name)
-        if os.path.exists(full_path):
+        if self.prompts.exists(mapped_name):
              return self.read_prompt_content(mapped_name)
 
         # 3. GitHub Fetch
@@ -207,150 +271,567 @@ class WorkerEngine:
         self.log_and_progress(f"Prompt not found: {mapped_name}", "error")
         return None
 
-    from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-    
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type((requests.exceptions.RequestException, Exception)), # Broad retry for AI errors
-        reraise=True
-    )
-    def call_ai_api(self, prompt_content, config):
+    def call_ai_api(self, prompt_content, config, cached_prefix=None):
         # Strategy:
         # 1. Primary: User-selected model
         # 2. Fallback chain of current available models
+        # Each model gets its own retry budget (self.retry_policy); quota is shared
+        # between rows through self.rate_limiter.
+        # `cached_prefix`: static start of `prompt_content` (the agent prompt). When the run
+        # has a prefix cache session (config['prefix_cache']) it is sent once per model
+        # and only the remainder goes with each request.
+        # With config['hedge'], the first attempt races the next healthy model once the
+        # primary is slower than its usual latency (see _generate_hedged).
+        # config['row_deadline'] (seconds) bounds the whole row: every attempt, backoff and
+        # quota wait draws from the same budget, and an expired row is reported as timed out.
         
-        user_model = config.get('model', 'gemini-3-pro-preview')
+        row_deadline = config.get('row_deadline')
+        deadline = time.monotonic() + row_deadline if row_deadline else None
+        self._row_outcome.timed_out = False
         
-        candidate_models = [
-            user_model,
-            'models/' + user_model if not user_model.startswith('models/') else user_model,
-            'gemini-3-pro-preview',
-            'gemini-2.5-pro',
-            'gemini-2.5-flash',
-            'gemini-2.0-flash',
-            'gemini-flash-latest',
-        ]
+        user_model = config.get('model', 'gemini-3-pro-preview')
+        chain = self._candidate_models(user_model)
         
-        # Deduplicate preserving order
-        models_to_try = list(dict.fromkeys(candidate_models))
+        # Skip models known to be dead (NotFound / open circuit) and put the healthiest first
+        try:
+            models_to_try = self._healthy_models(chain, deadline)
+        except RowTimeout:
+            self._row_timed_out(row_deadline)
+            return None
+        if not models_to_try:
+            self.log_and_progress("FALHA FATAL: Nenhum modelo disponível (todos indisponíveis nesta sessão).", "error")
+            return None
         
         last_error = None
+        hedge_sent = threading.Event()
         
-        for model_name in models_to_try:
-            try:
+        for position, model_name in enumerate(models_to_try):
+            for attempt in range(1, self.retry_policy.max_attempts + 1):
                 # Check cancellation if callback provided
                 if self.check_cancellation and self.check_cancellation():
                     self.log_and_progress("Processamento cancelado pelo usuário.", "error")
                     return None
 
-                self.log_and_progress(f"Tentando modelo: {model_name}...", "debug")
-                model = genai.GenerativeModel(model_name)
-                
-                # Temperature Strategy: Pro = 0.1 (Precision), Flash = 0.2 (Creative/Fast)
-                is_pro = "pro" in model_name.lower()
-                temp = 0.1 if is_pro else 0.2
-                
-                generation_config = genai.types.GenerationConfig(
-                    temperature=config.get('temperature', temp),
-                    top_p=0.9,
-                    max_output_tokens=6144,
-                )
-                
-                self.log_and_progress(f"⏳ Gerando análise com {model_name}... (pode levar 2-5 min)", "info")
-                # Increase timeout to 10 minutes (600s) to avoid 504 on complex prompts
-                response = model.generate_content(
-                    prompt_content,
-                    generation_config=generation_config,
-                    request_options={'timeout': 600}
-                )
-                
-                if not response.parts:
-                    if response.prompt_feedback:
-                         self.log_and_progress(f"Safety Block ({model_name}): {response.prompt_feedback}", "error")
-                    # If safety block, maybe don't retry same model? But loop continues.
-                    # For now, treat as failure of this model
-                    continue 
-
-                self.log_and_progress(f"✅ Resposta recebida de {model_name}.", "info")
-                return response.text
-                
-            except Exception as e:
-                # Log usage limits or 404s
-                self.log_and_progress(f"Erro em {model_name}: {e}", "debug")
-                last_error = e
-                # If it's a 429 (Resource Exhausted), tenacity might treat it, 
-                # BUT since we are inside a loop of models, maybe we want to fail over to next model?
-                # The @retry decorator wraps the WHOLE function. 
-                # If we raise here, it retries the WHOLE function (starting from first model again).
-                # That might be what we want for transient network errors.
-                # But for 404 (Model not found), we should just continue loop.
-                if "404" in str(e) or "NotFound" in str(e):
+                try:
+                    timeout = self._attempt_timeout(deadline, len(models_to_try) - position)
+                    hedge_model = None
+                    if config.get('hedge') and not hedge_sent.is_set():
+                        hedge_model = self._next_distinct_model(models_to_try[position + 1:], model_name)
+                    if hedge_model:
+                        # At most one hedge per row keeps the extra cost bounded; it only
+                        # counts once the hedge request was actually sent
+                        text = self._generate_hedged(
+                            model_name, hedge_model, prompt_content, config, cached_prefix, deadline, timeout,
+                            hedge_sent=hedge_sent
+                        )
+                    else:
+                        text = self._generate_once(
+                            model_name, prompt_content, config, cached_prefix, deadline=deadline, timeout=timeout
+                        )
+                    
+                    if text is _SKIPPED:
+                        # Circuit open / half-open probe taken by another row
+                        break
+                    if not text:
+                        # Same prompt will be blocked again: move to the next model
+                        break
+                    return text
+                    
+                except GenerationCancelled:
+                    self.log_and_progress("Processamento cancelado pelo usuário.", "error")
+                    return None
+                except RowTimeout:
+                    self._row_timed_out(row_deadline)
+                    return None
+                except _PrefixRejected as e:
+                    # The cached prefix itself was gone/rejected: retry this model without it
+                    last_error = e.error
                     continue
-                if "429" in str(e) or "ResourceExhausted" in str(e):
-                    # Rate limit -> Let Tenacity retry the function (maybe wait and try again)
-                    raise e 
-                
-                continue
+                except Exception as e:
+                    last_error = e
+                    # 404 (Model not found): no point retrying, go to the next model
+                    if "404" in str(e) or "NotFound" in str(e):
+                        break
+                    if not RetryPolicy.is_retryable(e) or attempt == self.retry_policy.max_attempts:
+                        break
+
+                    retry_after = parse_retry_after(e)
+                    delay = self.retry_policy.delay(attempt, retry_after)
+                    if RetryPolicy.is_rate_limit(e):
+                        # Pause this model for every row, not just this one
+                        self.rate_limiter.penalize(model_name, delay)
+                        self.log_and_progress(f"Cota excedida em {model_name}. Nova tentativa em {delay:.0f}s.", "info")
+                    elif not self._sleep_cancellable(delay, deadline):
+                        if self.check_cancellation and self.check_cancellation():
+                            self.log_and_progress("Processamento cancelado pelo usuário.", "error")
+                            return None
+                        if position == len(models_to_try) - 1 or (deadline and time.monotonic() >= deadline):
+                            # No time left for the backoff and no other model to spend it on
+                            self._row_timed_out(row_deadline)
+                            return None
+                        # The backoff would outlast the row: spend what is left on the next model
+                        self.log_and_progress(
+                            f"Sem tempo para nova tentativa em {model_name}. Próximo modelo...", "debug"
+                        )
+                        break
         
         self.log_and_progress(f"FALHA FATAL: Nenhum modelo disponível. Erro: {last_error}", "error")
         return None
 
-    def parse_response(self, ai_response):
-        parsed_data = {}
-        # All 14 sections matching template_xalq.docx
-        sections = [
-            "RESUMO_EXECUTIVO", "DIAGNOSTICO", "LACUNAS", "CLASSIFICACAO",
-            "ESTRUTURA_TO_BE", "MATRIZ_DE_METRICAS", "ARQUITETURA_CONCEITUAL_DE_DADOS",
-            "PERGUNTAS_DECISORIAS", "KPIS_ASSOCIADOS", "VISUALIZACAO_CONCEITUAL",
-            "RISCOS_ATUAIS", "RISCOS_SE_NAO_IMPLEMENTAR",
-            "OBSERVACOES_XALQ", "PROXIMOS_PASSOS"
+    def _row_timed_out(self, row_deadline):
+        """Reports an expired row; _run_prepared_row journals it as timed out."""
+        self._row_outcome.timed_out = True
+        self.log_and_progress(
+            f"⏱️ Tempo limite da linha esgotado ({row_deadline}s). Linha marcada como expirada.", "error"
+        )
+
+    def _generate_once(self, model_name, prompt_content, config, cached_prefix=None, cancel_event=None,
+                       deadline=None, timeout=600):
+        """
+        One request to one model, with health and quota bookkeeping.
+        Returns the text, None on a safety block, or _SKIPPED if the model's circuit
+        refused the request. Errors are recorded and re-raised for the caller to classify.
+        `cancel_event` lets a hedging race abort the loser; `deadline` (monotonic) is the
+        row's budget. The request runs on a cancellable path (see _call_cancellable).
+        """
+        def cancelled():
+            if cancel_event is not None and cancel_event.is_set():
+                return True
+            return bool(self.check_cancellation and self.check_cancellation())
+
+        # Another row may hold the half-open probe, or the circuit opened meanwhile
+        if not self.model_health.acquire(model_name):
+            return _SKIPPED
+
+        # Rough input size for the tokens/min bucket (same local estimate as the token budget)
+        estimated_tokens = estimate_tokens(prompt_content)
+        max_wait = max(0.0, deadline - time.monotonic()) if deadline else None
+        if not self.rate_limiter.acquire(model_name, estimated_tokens, cancel_check=cancelled, max_wait=max_wait):
+            self.model_health.release(model_name)
+            if cancelled():
+                raise GenerationCancelled()
+            raise RowTimeout()
+
+        handle = None
+        prefix_session = config.get('prefix_cache')
+        try:
+            self.log_and_progress(f"Tentando modelo: {model_name}...", "debug")
+            if prefix_session and cached_prefix and prompt_content.startswith(cached_prefix):
+                handle = prefix_session.handle_for(model_name, cached_prefix)
+            contents = prompt_content[len(cached_prefix):] if handle is not None else prompt_content
+            
+            # Temperature Strategy: Pro = 0.1 (Precision), Flash = 0.2 (Creative/Fast)
+            is_pro = "pro" in model_name.lower()
+            temp = 0.1 if is_pro else 0.2
+            
+            generation_config = {
+                'temperature': config.get('temperature', temp),
+                'top_p': config.get('top_p', 0.9),
+                'max_output_tokens': config.get('max_output_tokens', 6144),
+            }
+            if config.get('structured'):
+                generation_config = structured_generation_config(generation_config)
+            
+            self.log_and_progress(f"⏳ Gerando análise com {model_name}... (pode levar 2-5 min)", "info")
+            started = time.monotonic()
+            aborted = threading.Event()
+            streams = []
+
+            def request():
+                if config.get('stream'):
+                    return self._generate_streaming(
+                        model_name, contents, generation_config, handle,
+                        lambda: aborted.is_set() or cancelled(), streams, timeout
+                    )
+                # Up to 10 minutes (600s) per attempt to avoid 504 on complex prompts, less if the row budget is short
+                result = self.backend.generate(
+                    model_name, contents, generation_config, timeout=timeout, cached_prefix=handle
+                )
+                return result.text, result.prompt_feedback
+
+            def abort():
+                aborted.set()
+                for stream in streams:
+                    stream.cancel()
+
+            text, feedback = self._call_cancellable(request, cancelled, deadline, abort)
+            
+            if not text:
+                if feedback:
+                     self.log_and_progress(f"Safety Block ({model_name}): {feedback}", "error")
+                # Repeated safety blocks open the model's circuit like any other failure
+                self.model_health.record_failure(model_name)
+                return None
+
+            self.model_health.record_success(model_name, time.monotonic() - started)
+            self.log_and_progress(f"✅ Resposta recebida de {model_name}.", "info")
+            return text
+            
+        except GenerationCancelled:
+            self.model_health.release(model_name)
+            raise
+        except RowTimeout:
+            # Too slow for the row's budget counts against the model's health
+            self.model_health.record_failure(model_name)
+            raise
+        except Exception as e:
+            # Log usage limits or 404s
+            self.log_and_progress(f"Erro em {model_name}: {e}", "debug")
+            if handle is not None and prefix_session.is_rejected(e):
+                # Only the cached prefix is gone: recreate it, the model itself is fine
+                prefix_session.invalidate(model_name, cached_prefix, handle)
+                self.model_health.release(model_name)
+                raise _PrefixRejected(e)
+            if "404" in str(e) or "NotFound" in str(e):
+                self.model_health.record_not_found(model_name)
+            else:
+                self.model_health.record_failure(model_name)
+            raise
+
+    def _generate_streaming(self, model_name, contents, generation_config, cached_prefix=None, cancelled=None,
+                            streams=None, timeout=600):
+        """
+        Streams the generation, reporting each section as soon as its closing tag
+        arrives. Raises GenerationCancelled as soon as `cancelled()` is true.
+        The open stream is appended to `streams` so another thread can cancel it.
+        Returns (text, prompt_feedback).
+        """
+        stream = self.backend.stream(
+            model_name, contents, generation_config, timeout=timeout, cached_prefix=cached_prefix
+        )
+        if streams is not None:
+            streams.append(stream)
+        parser = StreamingSectionParser()
+        chunks = []
+        for text in stream:
+            if cancelled and cancelled():
+                stream.cancel()
+                raise GenerationCancelled()
+            chunks.append(text)
+            completed = parser.feed(text)
+            done = len(parser.sections) - len(completed)
+            for section in completed:
+                done += 1
+                self.log_and_progress(f"📄 Seção recebida ({model_name}): {section} ({done}/{len(SECTIONS)})", "info")
+        return "".join(chunks), stream.prompt_feedback
+
+    def _next_distinct_model(self, models, current):
+        """First available model in `models` that is not just another spelling of `current`."""
+        for name in models:
+            if normalize_model_name(name) != normalize_model_name(current) and self.model_health.is_available(name):
+                return name
+        return None
+
+    def _hedge_threshold(self, model_name, config):
+        """
+        Seconds to wait for the primary before hedging: the configured percentile of its
+        recent latencies, or config['hedge_after'] until enough samples exist.
+        """
+        samples = sorted(self.model_health.latencies(model_name))
+        if len(samples) < 5:
+            return config.get('hedge_after', 120)
+        percentile = config.get('hedge_percentile', 90)
+        index = min(len(samples) - 1, int(len(samples) * percentile / 100))
+        return samples[index]
+
+    def _generate_hedged(self, model_name, hedge_model, prompt_content, config, cached_prefix=None,
+                         deadline=None, timeout=600, hedge_sent=None):
+        """
+        Runs the primary model; if it is slower than the hedge threshold, fires the same
+        prompt at `hedge_model` and keeps the first answer with enough parsed sections.
+        The loser is cancelled. Errors of the primary are re-raised if nothing succeeds.
+        `hedge_sent` (an Event) is set once the hedge request is submitted. Returns _SKIPPED
+        when the primary's circuit refused the request before any hedge was sent.
+        """
+        threshold = self._hedge_threshold(model_name, config)
+        events = {model_name: threading.Event(), hedge_model: threading.Event()}
+        pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="xalq-hedge")
+        if hedge_sent is None:
+            hedge_sent = threading.Event()
+        try:
+            started = time.monotonic()
+            primary = pool.submit(
+                self._generate_once, model_name, prompt_content, config, cached_prefix, events[model_name],
+                deadline, timeout
+            )
+            futures = {primary: model_name}
+            # When to hedge; `deadline` stays the row's budget for both requests
+            hedge_at = time.monotonic() + threshold
+            while not primary.done() and time.monotonic() < hedge_at:
+                if self.check_cancellation and self.check_cancellation():
+                    events[model_name].set()
+                    raise GenerationCancelled()
+                wait(futures, timeout=min(1.0, max(0.0, hedge_at - time.monotonic())))
+            if not primary.done():
+                self.log_and_progress(
+                    f"⚡ {model_name} acima de {threshold:.0f}s. "
+                    f"Disparando requisição paralela em {hedge_model}...", "info"
+                )
+                hedge = pool.submit(
+                    self._generate_once, hedge_model, prompt_content, config, cached_prefix, events[hedge_model],
+                    deadline, timeout
+                )
+                futures[hedge] = hedge_model
+                hedge_sent.set()
+
+            fallback_text = None
+            primary_error = None
+            while futures:
+                done, _ = wait(futures, timeout=1.0, return_when=FIRST_COMPLETED)
+                if self.check_cancellation and self.check_cancellation():
+                    for event in events.values():
+                        event.set()
+                    raise GenerationCancelled()
+                for future in done:
+                    name = futures.pop(future)
+                    try:
+                        text = future.result()
+                    except (GenerationCancelled, RowTimeout):
+                        continue
+                    except Exception as e:
+                        if future is primary:
+                            primary_error = e
+                        continue
+                    if text is _SKIPPED and not hedge_sent.is_set():
+                        return _SKIPPED
+                    if text is _SKIPPED or not text:
+                        continue
+                    if sum(1 for v in self.parse_response(text).values() if v) >= 3:
+                        for other in futures.values():
+                            events[other].set()  # cancel the loser
+                        if primary in futures:
+                            # The primary took at least this long: recording only the requests
+                            # that beat the hedge would keep lowering the threshold
+                            self.model_health.record_latency(
+                                model_name, max(threshold, time.monotonic() - started)
+                            )
+                        if future is not primary:
+                            self.log_and_progress(f"⚡ Resposta paralela de {name} venceu.", "info")
+                        return text
+                    fallback_text = fallback_text or text
+
+            if fallback_text:
+                return fallback_text
+            if primary_error:
+                raise primary_error
+            if deadline and time.monotonic() >= deadline:
+                raise RowTimeout()
+            return None
+        finally:
+            pool.shutdown(wait=False)
+
+    @staticmethod
+    def _candidate_models(user_model):
+        """User-selected model first, then the fallback chain of current models."""
+        candidate_models = [
+            user_model,
+            'models/' + user_model if not user_model.startswith('models/') else user_model,
+            'gemini-3-pro-preview',
+            'gemini-2.5-pro',
+            'gemini-2.5-flash',
+            'gemini-2.0-flash',
+            'gemini-flash-latest',
         ]
         
-        # 1. Strict: [SECTION]...[/SECTION]
-        for section in sections:
-            pattern = fr"\[{section}\](.*?)\[/{section}\]"
-            match = re.search(pattern, ai_response, re.DOTALL | re.IGNORECASE)
-            parsed_data[section] = match.group(1).strip() if match else ""
+        # Deduplicate preserving order
+        return list(dict.fromkeys(candidate_models))
+
+    def count_tokens(self, text, model_name=None):
+        """Local estimate by default; exact count from the API when XALQ_EXACT_TOKEN_COUNT is on."""
+        if model_name and self._get_bool_setting("exact_token_count", "XALQ_EXACT_TOKEN_COUNT"):
+            try:
+                return self.backend.count_tokens(model_name, text)
+            except Exception as e:
+                self.log_and_progress(f"Contagem exata de tokens indisponível ({model_name}): {e}", "debug")
+        return estimate_tokens(text)
+
+    def _prompt_tokens(self, prompt_text, model_name):
+        """count_tokens for a fixed agent prompt, counted once per (model, prompt) and reused by every row."""
+        key = (model_name, prompt_text)
+        with self._token_counts_lock:
+            if key in self._token_counts:
+                return self._token_counts[key]
+        tokens = self.count_tokens(prompt_text, model_name)
+        with self._token_counts_lock:
+            if len(self._token_counts) >= 64:
+                self._token_counts.clear()
+            self._token_counts[key] = tokens
+        return tokens
+
+    def _fit_row_to_budget(self, prompt_text, row, config, prefix=""):
+        """
+        Preflight: trims the longest free-text columns so prompt + row fit the input
+        token budget (XALQ_INPUT_TOKEN_BUDGET). Returns (row, input_tokens): the row,
+        possibly a trimmed copy, and the request size reused for routing, so each
+        row is counted once (the prompt itself only once per run).
+        """
+        budget = config.get('input_token_budget')
+        values = {col: str(val) for col, val in row.items() if isinstance(val, str)}
+        fixed = self._prompt_tokens(prompt_text, config['model']) + sum(
+            estimate_tokens(f"{col}: ") for col in row.index
+        ) + sum(estimate_tokens(str(val)) for col, val in row.items() if col not in values)
+        if not budget:
+            return row, fixed + sum(estimate_tokens(v) for v in values.values())
+        fitted, trimmed = fit_values(values, budget - fixed)
+        input_tokens = fixed + sum(estimate_tokens(v) for v in fitted.values())
+        if not trimmed:
+            return row, input_tokens
+        self.log_and_progress(
+            f"[{prefix}] Dados acima do orçamento de {budget} tokens. "
+            f"Colunas resumidas: {', '.join(map(str, trimmed))}",
+            "info"
+        )
+        row = row.copy()
+        for col in trimmed:
+            row[col] = fitted[col]
+        return row, input_tokens
+
+    def _route_config(self, input_tokens, config, prefix=""):
+        """
+        Size-based routing (XALQ_MODEL_ROUTING): picks the cheapest model of the chain
+        that fits the request's input size (from _fit_row_to_budget) and the expected output.
+        """
+        if not config.get('routing'):
+            return config
+        output_tokens = max(self._expected_report_tokens(), 1)
+        routed = route_model(self._candidate_models(config['model']), input_tokens, output_tokens)
+        if not routed or routed == config['model']:
+            return config
+        self.log_and_progress(f"[{prefix}] Roteado para {routed} (~{input_tokens} tokens de entrada).", "debug")
+        return dict(config, model=routed)
+
+    def _sleep_cancellable(self, seconds, deadline=None):
+        """
+        Sleeps in short slices; returns False if the user cancelled meanwhile or if
+        the sleep would run past `deadline` (the row's budget).
+        """
+        wake_at = time.monotonic() + seconds
+        if deadline and wake_at > deadline:
+            return False
+        while time.monotonic() < wake_at:
+            if self.check_cancellation and self.check_cancellation():
+                return False
+            time.sleep(min(1.0, max(0.0, wake_at - time.monotonic())))
+        return True
+
+    @staticmethod
+    def _attempt_timeout(deadline, models_left, max_timeout=600):
+        """
+        Splits the remaining row budget across attempts: the current one may use up to
+        a third of it (all of it on the last model), capped at `max_timeout`.
+        """
+        if not deadline:
+            return max_timeout
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise RowTimeout()
+        return max(1.0, min(max_timeout, remaining / max(1, min(models_left, 3))))
+
+    @staticmethod
+    def _call_cancellable(request, cancelled, deadline=None, abort=None, poll=0.25):
+        """
+        Runs a blocking backend call on a helper thread while this thread polls for
+        cancellation and the row deadline every `poll` seconds. On either, `abort()`
+        tears the request down (streams are cancelled, the HTTP call is abandoned and
+        ends at its own timeout) and control returns to the caller immediately.
+        """
+        outcome = {}
+        finished = threading.Event()
+
+        def target():
+            try:
+                outcome['value'] = request()
+            except BaseException as e:
+                outcome['error'] = e
+            finally:
+                finished.set()
+
+        threading.Thread(target=target, name="xalq-request", daemon=True).start()
+        while not finished.wait(poll):
+            if cancelled():
+                if abort:
+                    abort()
+                raise GenerationCancelled()
+            if deadline and time.monotonic() >= deadline:
+                if abort:
+                    abort()
+                raise RowTimeout()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['value']
+
+    def _healthy_models(self, chain, deadline=None):
+        """
+        Returns the usable models of `chain` ordered by health. When every circuit
+        is open, waits (cancellably) for the first cooldown to expire, but not past
+        `deadline` (the row's budget): RowTimeout then.
+        """
+        while True:
+            models = self.model_health.order(chain)
+            if models:
+                return models
+            wait_s = self.model_health.seconds_until_available(chain)
+            if wait_s is None:
+                return []
+            if deadline:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise RowTimeout()
+                wait_s = min(wait_s, remaining)
+            self.log_and_progress(f"Todos os modelos em pausa. Aguardando {int(wait_s)}s...", "info")
+            if not self._sleep_cancellable(wait_s):
+                return []
+
+    def _response_cache_key(self, prompt_text, row, config):
+        keys = ('temperature', 'top_p', 'max_output_tokens')
+        if config.get('structured'):
+            # Only JSON-mode entries carry the flag, so existing entries keep their keys
+            keys += ('structured',)
+        return ResponseCache.make_key(
+            prompt_text,
+            row.to_json(date_format='iso', default_handler=str),
+            config['model'],
+            {k: config.get(k) for k in keys},
+        )
+
+    def _cached_response(self, prompt_text, row, config, prefix=""):
+        if not config.get('use_cache', True):
+            return None
+        cached = self.response_cache.get(self._response_cache_key(prompt_text, row, config))
+        if cached:
+            self.log_and_progress(f"[{prefix}] ♻️ Resposta reaproveitada do cache.", "info")
+        return cached
+
+    def _store_response(self, prompt_text, row, config, response):
+        if config.get('use_cache', True) and response:
+            self.response_cache.put(self._response_cache_key(prompt_text, row, config), response, config['model'])
+
+    def call_ai_cached(self, full_prompt, prompt_text, row, config, prefix="", cached_prefix=None):
+        """
+        Serves the response from the on-disk cache when possible, otherwise calls the AI and stores it.
+        `cached_prefix` is the static start of `full_prompt` (defaults to `prompt_text`).
+        """
+        cached = self._cached_response(prompt_text, row, config, prefix)
+        if cached:
+            return cached
+
+        response = self.call_ai_api(full_prompt, config, cached_prefix=cached_prefix or prompt_text)
+        self._store_response(prompt_text, row, config, response)
+        return response
+
+    def parse_response(self, ai_response):
+        # 0. Structured mode: JSON validated against the section schema, no text parsing
+        parsed_data = parse_structured(ai_response)
+        if parsed_data:
+            return parsed_data
+
+        # 1. Strict: [SECTION]...[/SECTION] (single scan, see core/response_parser.py)
+        parsed_data = parse_tagged(ai_response)
             
         # 2. Flexible Fallback: header-based parsing
         if sum(1 for v in parsed_data.values() if v) < 3:
             self.log_and_progress("Parsing estrito falhou. Usando modo flexível...", "debug")
-            clean_response = ai_response.replace("*", "").replace("#", "")
-            current_section = None
-            
-            map_headers = {
-                "RESUMO EXECUTIVO": "RESUMO_EXECUTIVO",
-                "DIAGNOSTICO": "DIAGNOSTICO",
-                "LACUNAS": "LACUNAS",
-                "CLASSIFICACAO": "CLASSIFICACAO",
-                "ESTRUTURA TO BE": "ESTRUTURA_TO_BE",
-                "ESTRUTURA TO-BE": "ESTRUTURA_TO_BE",
-                "MATRIZ DE METRICAS": "MATRIZ_DE_METRICAS",
-                "ARQUITETURA CONCEITUAL": "ARQUITETURA_CONCEITUAL_DE_DADOS",
-                "PERGUNTAS DECISORIAS": "PERGUNTAS_DECISORIAS",
-                "KPIS ASSOCIADOS": "KPIS_ASSOCIADOS",
-                "VISUALIZACAO CONCEITUAL": "VISUALIZACAO_CONCEITUAL",
-                "RISCOS ATUAIS": "RISCOS_ATUAIS",
-                "RISCOS SE NAO": "RISCOS_SE_NAO_IMPLEMENTAR",
-                "OBSERVACOES": "OBSERVACOES_XALQ",
-                "PROXIMOS PASSOS": "PROXIMOS_PASSOS",
-            }
-            
-            lines = clean_response.split('\n')
-            for line in lines:
-                upper_line = line.strip().upper().replace(":", "").replace("\u00c1", "A").replace("\u00c9", "E").replace("\u00d3", "O").replace("\u00ca", "E")
-                found = False
-                for k, v in map_headers.items():
-                    if k in upper_line and len(upper_line) < 50:
-                        current_section = v
-                        found = True
-                        break
-                
-                if found: continue
-                
-                if current_section:
-                    parsed_data[current_section] = parsed_data.get(current_section, "") + line + "\n"
+            parse_headers(ai_response, parsed_data)
 
         return parsed_data
 
@@ -365,110 +846,24 @@ class WorkerEngine:
         s = re.sub(r'_+', '_', s)
         return s.strip('._')
 
-    def generate_word_report(self, parsed_data, agent_type, model_name, timestamp, prefix, row_data=None):
+    def generate_word_report(self, parsed_data, agent_type, model_name, timestamp, prefix, row_data=None,
+                             render_stage=None):
+        """
+        Renders the report (see core/docx_renderer.py) and returns its path.
+        With a `render_stage` the rendering is queued to the process pool and a
+        Future of the path is returned instead.
+        """
         template_path = os.path.join(self.templates_dir, 'template_xalq.docx')
         if not os.path.exists(template_path):
             self.log_and_progress(f"Template not found: {template_path}", "error")
             return None
             
         try:
-            doc = Document(template_path)
-
-            # Extract CSV fields for header placeholders
-            nome_empresa = prefix  # fallback
-            carimbo = timestamp
-            if row_data is not None:
-                # Company name: tiered search (most specific first)
-                name_priorities = [
-                    ['nome da empresa'],
-                    ['razão social', 'razao social'],
-                    ['cliente', 'company', 'organization'],
-                ]
-                for tier in name_priorities:
-                    found = False
-                    for col_name, val in row_data.items():
-                        col_lower = str(col_name).lower().strip()
-                        if any(col_lower == k or col_lower.startswith(k) for k in tier):
-                            nome_empresa = str(val).strip()
-                            found = True
-                            break
-                    if found:
-                        break
-
-                # Timestamp: first column matching date keywords
-                for col_name, val in row_data.items():
-                    col_lower = str(col_name).lower().strip()
-                    if any(k in col_lower for k in ['carimbo', 'data/hora', 'timestamp']):
-                        carimbo = str(val)
-                        break
-
-            # 2. Clear existing body content (paragraphs and tables) to treat template as base
-            # We iterate backwards to avoid index issues when deleting
-            for i in range(len(doc.paragraphs) - 1, -1, -1):
-                p = doc.paragraphs[i]
-                p._element.getparent().remove(p._element)
-                
-            for i in range(len(doc.tables) - 1, -1, -1):
-                t = doc.tables[i]
-                t._element.getparent().remove(t._element)
-
-            # 3. Dynamic Body Generation
-            # Define human-readable titles for sections
-            section_titles = {
-                "RESUMO_EXECUTIVO": "Resumo Executivo",
-                "DIAGNOSTICO": "Diagnóstico Situacional",
-                "LACUNAS": "Lacunas & Gaps",
-                "CLASSIFICACAO": "Classificação de Maturidade",
-                "ESTRUTURA_TO_BE": "Estrutura Recomendada (To-Be)",
-                "MATRIZ_DE_METRICAS": "Matriz de Métricas",
-                "ARQUITETURA_CONCEITUAL_DE_DADOS": "Arquitetura Conceitual de Dados",
-                "PERGUNTAS_DECISORIAS": "Perguntas Decisórias",
-                "KPIS_ASSOCIADOS": "KPIs Associados",
-                "VISUALIZACAO_CONCEITUAL": "Visualização Conceitual",
-                "RISCOS_ATUAIS": "Riscos Atuais",
-                "RISCOS_SE_NAO_IMPLEMENTAR": "Riscos de Não Implementação",
-                "OBSERVACOES_XALQ": "Observações XALQ",
-                "PROXIMOS_PASSOS": "Próximos Passos"
-            }
-
-            # Order must match parse_response sections or be defined here
-            ordered_sections = [
-                "RESUMO_EXECUTIVO", "DIAGNOSTICO", "LACUNAS", "CLASSIFICACAO",
-                "ESTRUTURA_TO_BE", "MATRIZ_DE_METRICAS", "ARQUITETURA_CONCEITUAL_DE_DADOS",
-                "PERGUNTAS_DECISORIAS", "KPIS_ASSOCIADOS", "VISUALIZACAO_CONCEITUAL",
-                "RISCOS_ATUAIS", "RISCOS_SE_NAO_IMPLEMENTAR",
-                "OBSERVACOES_XALQ", "PROXIMOS_PASSOS"
-            ]
-
-            for sec_key in ordered_sections:
-                content = parsed_data.get(sec_key, '').strip()
-                if content:
-                    # Add Heading
-                    title = section_titles.get(sec_key, sec_key.replace('_', ' ').title())
-                    doc.add_heading(title, level=1)
-                    
-                    # Add Content
-                    # We can do basic processing here like handling list items if they start with - or *
-                    for line in content.split('\n'):
-                        line = line.strip()
-                        if not line:
-                            continue
-                        
-                        if line.startswith('- ') or line.startswith('* '):
-                            doc.add_paragraph(line[2:], style='List Bullet')
-                        elif line[0].isdigit() and line[1:3] in ['. ', ') ']:
-                             # Simple heuristic for numbered lists
-                             doc.add_paragraph(line, style='List Number')
-                        else:
-                            doc.add_paragraph(line)
-                    
-                    # Add spacing between sections
-                    doc.add_paragraph() 
-
             out_name = f"{self.sanitize_filename(prefix)}_{self.sanitize_filename(model_name)}_report_{timestamp}.docx"
             out_path = os.path.join(self.output_dir, out_name)
-            doc.save(out_path)
-            return out_path
+            if render_stage is not None:
+                return render_stage.submit(parsed_data, template_path, out_path)
+            return render_report(parsed_data, template_path, out_path)
         except Exception as e:
             self.log_and_progress(f"Erro na geração do DOCX: {e}", "error")
             return None
@@ -481,128 +876,494 @@ class WorkerEngine:
     def get_prompts_list(self):
         try:
              # Just list local ones + hardcoded knowns
-             local = [os.path.splitext(f)[0] for f in os.listdir(self.prompts_dir) if f.endswith('.md')]
+             local = self.prompts.names()
              return list(set(local + ["revenue", "operations"]))
         except:
              return ["revenue", "operations"]
              
-    def load_data(self, file_path):
+    @staticmethod
+    def _read_spreadsheet(file_path):
         import pandas as pd
+        if file_path.endswith('.csv'):
+            return pd.read_csv(file_path)
+        return pd.read_excel(file_path)
+
+    def column_roles(self, columns):
+        """ColumnRoles of a loaded file (see core/column_roles.py), e.g. for the UI."""
+        return infer_column_roles(columns)
+
+    def load_dataframe(self, file_path):
+        """The spreadsheet as a DataFrame, or None if it is empty or unreadable."""
+        try:
+            # Parsed once per file version, then served from memory / processing/datasets
+            df = self.datasets.get(file_path, self._read_spreadsheet)
+        except Exception as e:
+            self.log_and_progress(f"Erro ao carregar dados: {e}", "error")
+            return None
+        # Simple validation
+        return None if df.empty else df
+
+    def load_data(self, file_path):
+        """DataFrame plus the "Index: CompanyName" items of the UI list."""
+        df = self.load_dataframe(file_path)
+        if df is None:
+            return None, []
         try:
-            if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path)
-            else:
-                df = pd.read_excel(file_path)
-            
-            # Simple validation
-            if df.empty:
-                return None, []
-                
             # Create a list of "Index: CompanyName" for combo box
-            # Improved heuristic for Company Name
-            company_col = None
-            candidates = ['nome da empresa', 'empresa', 'company', 'name', 'cliente', 'organization', 'razão social', 'razao social']
-            
-            # 1. Search for exact/partial match
-            for col in df.columns:
-                if any(c in str(col).lower() for c in candidates):
-                    company_col = col
-                    break
-            
-            # 2. Fallback: First column that is NOT a timestamp
-            if not company_col:
-                for col in df.columns:
-                    col_str = str(col).lower()
-                    # Check for date keywords
-                    if any(x in col_str for x in ['data', 'date', 'time', 'carimbo', 'timestamp', 'hora']):
-                        continue
-                    company_col = col
-                    break
-            
-            # 3. Final Fallback
-            if not company_col:
-                company_col = df.columns[0]
-            
-            items = []
-            for idx, row in df.iterrows():
-                val = str(row[company_col])
-                items.append(f"{idx}: {val}")
-                
+            company_col = infer_column_roles(df.columns).label
+            items = (df.index.astype(str) + ": " + df[company_col].map(str)).tolist()
             return df, items
         except Exception as e:
             self.log_and_progress(f"Erro ao carregar dados: {e}", "error")
             return None, []
 
-    def process_file(self, file_path, model_override=None, rows_to_process=None, prompt_type_override=None):
-        import pandas as pd
+    def _get_bool_setting(self, key, env_var, default=False):
+        """Reads a boolean option with precedence Env > QSettings > default."""
+        value = os.environ.get(env_var) or self.settings.value(key, "")
+        if value in (None, ""):
+            return default
+        return str(value).strip().lower() in ("1", "true", "yes", "sim", "on")
+
+    def _get_int_setting(self, key, env_var, default, minimum=1):
+        """Reads an integer option with precedence Env > QSettings > default."""
+        value = os.environ.get(env_var) or self.settings.value(key, default)
+        try:
+            return max(minimum, int(value))
+        except (TypeError, ValueError):
+            return default
+
+    def _load_rate_limits(self):
+        """
+        Per-model quotas as JSON, e.g. {"gemini-2.5-pro": {"rpm": 150, "tpm": 2000000}}.
+        Env XALQ_RATE_LIMITS > QSettings "rate_limits"; unlisted models use RateLimiter defaults.
+        """
+        raw = os.environ.get("XALQ_RATE_LIMITS") or self.settings.value("rate_limits", "")
+        if not raw:
+            return {}
+        try:
+            return json.loads(raw)
+        except (TypeError, ValueError) as e:
+            self.log_and_progress(f"XALQ_RATE_LIMITS inválido, usando padrões: {e}", "error")
+            return {}
+
+    def process_file(self, file_path, model_override=None, rows_to_process=None, prompt_type_override=None,
+                     max_workers=None, use_cache=True, stream=None, batch_size=None, prompt_cache=None,
+                     hedge=None, row_deadline=None, structured=None, render_workers=None, stream_rows=None,
+                     resume=False):
+        """
+        Processes the spreadsheet rows, running up to `max_workers` AI calls in flight.
+        Returns the generated report paths in row order, regardless of completion order.
+        With `use_cache=False` every row is sent to the AI even if a cached response exists.
+        `stream=True` streams each generation, reporting sections as they arrive.
+        `batch_size > 1` packs rows sharing a prompt into a single request (see core/batching.py).
+        `prompt_cache=True` caches the shared prompt prefix server-side for the duration of the run.
+        `hedge=True` races the next healthy model when the primary is slower than usual.
+        `row_deadline` (seconds) bounds each row across all retries and fallback models.
+        `structured=True` asks for JSON against the section schema (see core/structured_output.py).
+        `render_workers > 0` renders the DOCX reports in a process pool instead of on the row threads.
+        `stream_rows=True` reads the file in chunks while processing instead of loading it whole.
+        `rows_to_process` selects rows by index labels (list, range), position (slice) or a filter
+        callable `f(df) -> boolean mask` (see core/row_selection.py); only those rows are visited.
+        Every run is journaled in processing/jobs.sqlite3 (see core/job_journal.py); `resume=True`
+        continues the last unfinished run of the same file, prompt and model, skipping rendered rows
+        and rendering rows that already have a response without calling the AI again.
+        """
         self.log_and_progress(f"Lendo arquivo: {file_path}")
-        
-        df, items = self.load_data(file_path)
-        if df is None: return []
 
-        generated_files = []
-        
+        # An empty list or range means every row, as before
+        selection = rows_to_process if rows_to_process or callable(rows_to_process) else None
+        if stream_rows is None:
+            stream_rows = self._get_bool_setting("stream_rows", "XALQ_STREAM_ROWS")
+        row_stream = None
+        if stream_rows:
+            # Rows go to the pool as they are parsed; memory stays flat with the file size
+            try:
+                row_stream = RowStream(
+                    file_path, self._get_int_setting("stream_chunk_rows", "XALQ_STREAM_CHUNK_ROWS", 1000)
+                )
+            except Exception as e:
+                self.log_and_progress(f"Erro ao carregar dados: {e}", "error")
+                return []
+            columns, total = row_stream.columns, row_stream.total
+            rows = iter_selected(iter(row_stream), selection)
+            selected = None
+        else:
+            df = self.load_dataframe(file_path)
+            if df is None: return []
+            columns, total = df.columns, len(df)
+            df = select_rows(df, selection)
+            rows, selected = df.iterrows(), len(df)
+
         # User Defined Defaults
         config = {
             'model': model_override or 'gemini-1.5-pro',
-            'temperature': 0.1 # Base temp, call_ai_api adjusts per model
+            'temperature': 0.1, # Base temp, call_ai_api adjusts per model
+            'top_p': 0.9,
+            'max_output_tokens': 6144,
+            'use_cache': use_cache,
+            'stream': self._get_bool_setting("streaming", "XALQ_STREAMING") if stream is None else stream,
+            'input_token_budget': self._get_int_setting("input_token_budget", "XALQ_INPUT_TOKEN_BUDGET", 32000),
+            'routing': self._get_bool_setting("model_routing", "XALQ_MODEL_ROUTING"),
+            'hedge': self._get_bool_setting("hedge", "XALQ_HEDGE") if hedge is None else hedge,
+            'hedge_after': self._get_int_setting("hedge_after", "XALQ_HEDGE_AFTER", 120),
+            'hedge_percentile': self._get_int_setting("hedge_percentile", "XALQ_HEDGE_PERCENTILE", 90),
+            'row_deadline': row_deadline or self._get_int_setting("row_deadline", "XALQ_ROW_DEADLINE", 1200),
+            'structured': (
+                self._get_bool_setting("structured_output", "XALQ_STRUCTURED_OUTPUT")
+                if structured is None else structured
+            ),
         }
 
-        total = len(df)
-        self.log_and_progress(f"Iniciando processamento de {total} linhas...")
+        if max_workers is None:
+            max_workers = self._get_int_setting("max_workers", "XALQ_MAX_WORKERS", 1)
+        if batch_size is None:
+            batch_size = self._get_int_setting("batch_size", "XALQ_BATCH_SIZE", 1)
+        if config['structured'] and batch_size > 1:
+            # One JSON object per request: the batch delimiters do not fit the schema
+            self.log_and_progress("Modo JSON estruturado ativo: lotes desativados (1 empresa por requisição).", "info")
+            batch_size = 1
+
+        if prompt_cache is None:
+            prompt_cache = self._get_bool_setting("prompt_cache", "XALQ_PROMPT_CACHE")
+        if prompt_cache:
+            config['prefix_cache'] = PrefixCacheSession(
+                self.backend,
+                min_prefix_tokens=self._get_int_setting(
+                    "prompt_cache_min_tokens", "XALQ_PROMPT_CACHE_MIN_TOKENS", 1024
+                ),
+            )
+
+        if render_workers is None:
+            render_workers = self._get_int_setting("render_workers", "XALQ_RENDER_WORKERS", 0, minimum=0)
+        if render_workers:
+            config['render_stage'] = RenderStage(render_workers)
+
+        # Column roles are inferred once per file; rows are then read by column name
+        config['roles'] = infer_column_roles(columns)
+
+        journal = run = None
+        try:
+            journal = JobJournal(self.journal_path)
+            run = config['journal'] = journal.start(file_path, prompt_type_override, config['model'], resume=resume)
+            if run.resumed:
+                self.log_and_progress(
+                    "↻ Retomando processamento interrompido: linhas concluídas serão puladas.", "info"
+                )
+        except Exception as e:
+            # The journal only adds resumability: never block a run because of it
+            self.log_and_progress(f"Diário de processamento indisponível: {e}", "error")
+            if journal is not None:
+                journal.close()
+            journal = run = None
+
+        if selected is None:
+            self.log_and_progress(f"Iniciando processamento em streaming ({max_workers} em paralelo)...")
+        else:
+            self.log_and_progress(f"Iniciando processamento de {selected} linhas ({max_workers} em paralelo)...")
+
+        results = {}
+        in_flight = {}
+        pending = {}  # prompt type -> rows waiting to fill a batch
+        resumed_rows = 0
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="xalq-row") as pool:
+
+                def collect(future):
+                    for position, path in zip(in_flight.pop(future), future.result()):
+                        results[position] = path
+
+                def submit(unit):
+                    # Bounded submission: wait for a free slot before queueing the next unit
+                    while len(in_flight) >= max_workers:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            collect(future)
+                    if run is not None:
+                        run.mark([row_idx for _, row_idx, _ in unit], QUEUED)
+                    future = pool.submit(self._process_unit, unit, columns, total, config, prompt_type_override)
+                    in_flight[future] = [position for position, _, _ in unit]
+
+                cancelled = False
+                for position, (row_idx, row) in enumerate(rows):
+                    if self.check_cancellation and self.check_cancellation():
+                        self.log_and_progress("Processamento interrompido pelo usuário.", "error")
+                        cancelled = True
+                        break
 
-        for row_idx, row in df.iterrows():
+                    report = run.report(row_idx) if run is not None and run.resumed else None
+                    if report:
+                        # Rendered by the interrupted run
+                        results[position] = report
+                        resumed_rows += 1
+                        continue
+
+                    if batch_size <= 1:
+                        submit([(position, row_idx, row)])
+                        continue
+
+                    # Rows are batched per prompt type, since the prompt prefix is shared
+                    p_type = self._row_prompt_type(row, config['roles'], prompt_type_override)
+                    group = pending.setdefault(p_type, [])
+                    group.append((position, row_idx, row))
+                    limit = adaptive_batch_size(batch_size, config['max_output_tokens'], self._expected_report_tokens())
+                    if len(group) >= limit:
+                        submit(pending.pop(p_type))
+
+                # Flush partially filled batches
+                if not cancelled:
+                    for group in pending.values():
+                        submit(group)
+
+                for future in list(as_completed(in_flight)):
+                    collect(future)
+        finally:
+            if row_stream is not None:
+                row_stream.close()
+            if config.get('prefix_cache'):
+                # Expire cached prefixes as soon as the run ends
+                config['prefix_cache'].close()
+            if config.get('render_stage'):
+                # Waits for queued reports, unless the user cancelled
+                config['render_stage'].shutdown(cancel=bool(self.check_cancellation and self.check_cancellation()))
+            if journal is not None:
+                # After the render stage, so reports it finished are already journaled
+                try:
+                    run.finish(cancelled=bool(self.check_cancellation and self.check_cancellation()))
+                finally:
+                    journal.close()
+
+        # Reports rendered by the render stage finish in any order; paths keep row order
+        for position, result in results.items():
+            if isinstance(result, Future):
+                results[position] = self._report_path(result)
+
+        generated_files = [results[pos] for pos in sorted(results) if results[pos]]
+        if resumed_rows:
+            self.log_and_progress(
+                f"↻ {resumed_rows} linhas já concluídas na execução anterior foram reaproveitadas.", "info"
+            )
+
+        self.log_and_progress("Processamento finalizado.")
+        return generated_files
+
+    def _process_unit(self, unit, columns, total, config, prompt_type_override=None):
+        """Pool task: a single row or a batch of rows. Returns report paths aligned with `unit`."""
+        if len(unit) == 1:
+            _, row_idx, row = unit[0]
+            return [self._process_row(row_idx, row, columns, total, config, prompt_type_override)]
+        return self._process_batch(unit, columns, total, config, prompt_type_override)
+
+    def _row_prefix(self, row_idx, row, roles):
+        # Name Prefix
+        if roles.prefix is None:
+            return f"Row_{row_idx}"
+        return str(row[roles.prefix])
+
+    def _row_prompt_type(self, row, roles, prompt_type_override=None):
+        if prompt_type_override and "Automático" not in prompt_type_override:
+            return prompt_type_override
+        # Auto detect: the "modelo de atuação" column
+        if roles.prompt_selector is None:
+            return "revenue" # Default backup
+        return str(row[roles.prompt_selector]).strip()
+
+    def _prepare_row(self, row_idx, row, columns, total, config, prompt_type_override=None):
+        """
+        Resolves name prefix, prompt type and prompt text, and fits the row to the token
+        budget. Returns (prefix, p_type, prompt_text, row, input_tokens) or None if the row
+        must be skipped.
+        """
+        roles = config.get('roles') or infer_column_roles(columns)
+        prefix = self._row_prefix(row_idx, row, roles)
+        self.log_and_progress(f"--- Processando: {prefix} ({row_idx+1}/{total or '?'}) ---")
+        self._journal(config, row_idx, IN_FLIGHT)
+        
+        # 1. Determine Prompt
+        p_type = self._row_prompt_type(row, roles, prompt_type_override)
+        
+        # 2. Load Prompt
+        prompt_text = self.load_agent_prompt(p_type)
+        if not prompt_text:
+            self.log_and_progress(f"[{prefix}] Prompt não encontrado para '{p_type}'. Pulando.", "error")
+            self._journal(config, row_idx, FAILED, error=f"Prompt não encontrado: {p_type}")
+            return None
+        row, input_tokens = self._fit_row_to_budget(prompt_text, row, config, prefix)
+        return prefix, p_type, prompt_text, row, input_tokens
+
+    def _journal(self, config, row_idx, state, **fields):
+        """Records a row transition in the job journal of this run (if any)."""
+        run = config.get('journal')
+        if run is None or row_idx is None:
+            return
+        try:
+            run.mark([row_idx], state, **fields)
+        except Exception as e:
+            self.logger.error(f"Falha ao registrar linha {row_idx} no diário: {e}")
+
+    def _journaled_response(self, row_idx, config):
+        """Response recorded for this row by the interrupted run being resumed."""
+        run = config.get('journal')
+        return run.response(row_idx) if run is not None and run.resumed else None
+
+    def _finish_row(self, prefix, p_type, row, response, config, parsed=None, row_idx=None):
+        """Parses the AI response (unless already parsed) and renders the DOCX report."""
+        self._journal(config, row_idx, AI_DONE, response=response)
+        self._observe_report_tokens(response)
+        if parsed is None:
+            parsed = self.parse_response(response)
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        rpt = self.generate_word_report(
+            parsed, p_type, config['model'], timestamp, prefix, row_data=row, render_stage=config.get('render_stage')
+        )
+
+        if isinstance(rpt, Future):
+            # Rendered in the process pool: the row thread is free for the next request
+            def rendered(f):
+                if not f.cancelled() and f.exception() is None:
+                    self._journal(config, row_idx, RENDERED, report=f.result())
+                    self.log_and_progress(f"[{prefix}] Relatório gerado com sucesso.", "info")
+            rpt.add_done_callback(rendered)
+        elif rpt:
+            self._journal(config, row_idx, RENDERED, report=rpt)
+            self.log_and_progress(f"[{prefix}] Relatório gerado com sucesso.", "info")
+        return rpt
+
+    def _report_path(self, future):
+        """Waits for a report queued to the render stage; None if rendering failed."""
+        if future.cancelled():
+            return None
+        try:
+            return future.result()
+        except Exception as e:
+            self.log_and_progress(f"Erro na geração do DOCX: {e}", "error")
+            return None
+
+    def _process_row(self, row_idx, row, columns, total, config, prompt_type_override=None):
+        """Runs prompt loading, AI call, parsing and DOCX rendering for a single row."""
+        try:
             if self.check_cancellation and self.check_cancellation():
-                self.log_and_progress("Processamento interrompido pelo usuário.", "error")
-                break
+                return None
 
-            if rows_to_process and row_idx not in rows_to_process: continue
-            
-            # Name Prefix
-            prefix = f"Row_{row_idx}"
-            
-            # Re-detect col for prefix (redundant but safe)
-            for col in df.columns:
-                 if any(c in str(col).lower() for c in ['nome da empresa', 'empresa', 'company']):
-                      prefix = str(row[col])
-                      break
-            
-            self.log_and_progress(f"--- Processando: {prefix} ({row_idx+1}/{total}) ---")
-            
-            # 1. Determine Prompt
-            if prompt_type_override and "Automático" not in prompt_type_override:
-                p_type = prompt_type_override
-            else:
-                 # Auto detect
-                 # Heuristic: Find a column asking for "modelo de atuação"
-                 p_type = "revenue" # Default backup
-                 for c in df.columns:
-                     if "modelo" in str(c).lower():
-                         p_type = str(row[c]).strip()
-                         break
-            
-            # 2. Load Prompt
-            prompt_text = self.load_agent_prompt(p_type)
-            if not prompt_text:
-                self.log_and_progress(f"Prompt não encontrado para '{p_type}'. Pulando.", "error")
-                continue
+            prepared = self._prepare_row(row_idx, row, columns, total, config, prompt_type_override)
+            if not prepared:
+                return None
+        except Exception as e:
+            # A failing row must not take the whole batch down with it
+            self.log_and_progress(f"Erro ao processar linha {row_idx}: {e}", "error")
+            self._journal(config, row_idx, FAILED, error=str(e))
+            return None
+        return self._run_prepared_row(row_idx, prepared, columns, config)
+
+    def _run_prepared_row(self, row_idx, prepared, columns, config):
+        """AI call, parsing and DOCX rendering for a row already through _prepare_row."""
+        try:
+            prefix, p_type, prompt_text, row, input_tokens = prepared
+
+            journaled = self._journaled_response(row_idx, config)
+            if journaled:
+                # Answered before the interruption: only the DOCX is missing
+                self.log_and_progress(
+                    f"[{prefix}] Resposta registrada na execução anterior. Gerando relatório...", "info"
+                )
+                return self._finish_row(prefix, p_type, row, journaled, config, row_idx=row_idx)
                 
-            # 3. Call AI
-            full_prompt = f"{prompt_text}\n\nDADOS DO CLIENTE:\n{row.to_string()}"
-            response = self.call_ai_api(full_prompt, config)
+            # 3. Call AI (compact `coluna: valor` block, see core/prompt_template.py)
+            template = compile_template(prompt_text, columns)
+            full_prompt = template.render(row)
+            if config.get('structured'):
+                full_prompt = with_json_instructions(full_prompt)
+            config = self._route_config(input_tokens, config, prefix)
+            response = self.call_ai_cached(full_prompt, prompt_text, row, config, prefix, cached_prefix=template.prefix)
             
             if not response:
-                self.log_and_progress("Falha na geração da IA.", "error")
-                continue
+                if getattr(self._row_outcome, 'timed_out', False):
+                    self._journal(
+                        config, row_idx, TIMED_OUT, error=f"Tempo limite de {config['row_deadline']}s esgotado"
+                    )
+                    return None
+                self.log_and_progress(f"[{prefix}] Falha na geração da IA.", "error")
+                self._journal(config, row_idx, FAILED, error="Falha na geração da IA")
+                return None
                 
             # 4. Parse & Save
-            parsed = self.parse_response(response)
-            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            rpt = self.generate_word_report(parsed, p_type, config['model'], timestamp, prefix, row_data=row)
-            
-            if rpt:
-                generated_files.append(rpt)
-                self.log_and_progress("Relatório gerado com sucesso.", "info")
-        
-        self.log_and_progress("Processamento finalizado.")
-        return generated_files
+            return self._finish_row(prefix, p_type, row, response, config, row_idx=row_idx)
+        except Exception as e:
+            # A failing row must not take the whole batch down with it
+            self.log_and_progress(f"Erro ao processar linha {row_idx}: {e}", "error")
+            self._journal(config, row_idx, FAILED, error=str(e))
+            return None
+
+    def _process_batch(self, unit, columns, total, config, prompt_type_override=None):
+        """
+        Sends several rows (same prompt type) in one request and demultiplexes the answer.
+        Cached rows are served from cache; rows whose slice is missing or unparseable
+        fall back to a single-row call.
+        """
+        paths = [None] * len(unit)
+        try:
+            prepared = {}
+            for i, (_, row_idx, row) in enumerate(unit):
+                if self.check_cancellation and self.check_cancellation():
+                    return paths
+                ctx = self._prepare_row(row_idx, row, columns, total, config, prompt_type_override)
+                if not ctx:
+                    continue
+                prefix, p_type, prompt_text, row, _ = ctx
+                cached = (
+                    self._journaled_response(row_idx, config)
+                    or self._cached_response(prompt_text, row, config, prefix)
+                )
+                if cached:
+                    paths[i] = self._finish_row(prefix, p_type, row, cached, config, row_idx=row_idx)
+                else:
+                    prepared[i] = ctx
+
+            if not prepared:
+                return paths
+            template = compile_template(prepared[next(iter(prepared))][2], columns)
+            if len(prepared) == 1 or not template.batchable:
+                # Prompts with inline row fields cannot be shared by several companies
+                for i in prepared:
+                    paths[i] = self._run_prepared_row(unit[i][1], prepared[i], columns, config)
+                return paths
+
+            indexes = list(prepared)
+            prompt_text = prepared[indexes[0]][2]
+            batch_prompt = build_batch_prompt(
+                template.prefix, [template.render_block(prepared[i][3]) for i in indexes]
+            )
+            self.log_and_progress(f"📦 Enviando lote de {len(indexes)} empresas em uma única requisição...", "info")
+            response = self.call_ai_api(batch_prompt, config, cached_prefix=template.prefix)
+
+            slices = split_batch_response(response, len(indexes))
+            for i, answer in zip(indexes, slices):
+                if self.check_cancellation and self.check_cancellation():
+                    return paths
+                prefix, p_type, _, row, _ = prepared[i]
+                parsed = self.parse_response(answer) if answer else None
+                if parsed and sum(1 for v in parsed.values() if v) >= 3:
+                    self._store_response(prompt_text, row, config, answer)
+                    paths[i] = self._finish_row(prefix, p_type, row, answer, config, parsed=parsed, row_idx=unit[i][1])
+                else:
+                    self.log_and_progress(
+                        f"[{prefix}] Resposta do lote incompleta. Reprocessando individualmente...", "info"
+                    )
+                    paths[i] = self._run_prepared_row(unit[i][1], prepared[i], columns, config)
+        except Exception as e:
+            self.log_and_progress(f"Erro ao processar lote: {e}", "error")
+        return paths
+
+    def _expected_report_tokens(self):
+        """Observed average size of one report (output tokens), or the configured default."""
+        if self._report_tokens_avg:
+            return int(self._report_tokens_avg)
+        return self._get_int_setting("expected_report_tokens", "XALQ_EXPECTED_REPORT_TOKENS", 2000)
+
+    def _observe_report_tokens(self, response):
+        # Local token estimate; exponential moving average keeps it cheap and adaptive
+        tokens = estimate_tokens(response)
+        if self._report_tokens_avg:
+            self._report_tokens_avg = 0.8 * self._report_tokens_avg + 0.2 * tokens
+        else:
+            self._report_tokens_avg = tokens
@@ -0,0 +1,32 @@
+import sys
+import os
+import pytest
+import logging
+from unittest.mock import MagicMock, patch
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+
+from core.worker_engine import WorkerEngine
+from core.fake_backend import FakeBackend
+
+# Mock internal dependencies to avoid side effects (file system, network)
+@pytest.fixture
+def mock_engine(tmp_path):
+    with patch("core.worker_engine.QSettings") as mock_settings:
+        # Mock settings to avoid registry access
+        mock_settings.return_value.value.return_value = "" 
+        
+        # Instantiate engine with a mock progress callback; logs/, cache/, output/ and
+        # processing/ go to tmp_path, only the read-only templates come from the repo
+        engine = WorkerEngine(
+            base_dir=str(tmp_path), api_key="test_key", progress_callback=MagicMock(), backend=FakeBackend()
+        )
+        engine.templates_dir = os.path.join(REPO_DIR, "templates")
+        
+        # Redirect logger to capture logs for inspection
+        engine.logger = logging.getLogger("TestWorkerEngine")
+        engine.logger.setLevel(logging.INFO) # Fix: Set level to INFO to capture info logs
+        engine.logger.handlers = [] # Clear handlers
+        
+        return engine
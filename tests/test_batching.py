@@ -0,0 +1,22 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.batching import build_batch_prompt, split_batch_response, adaptive_batch_size
+
+
+def test_build_and_split_batch():
+    prompt = build_batch_prompt("PROMPT", ["a: 1", "a: 2"])
+    assert prompt.startswith("PROMPT")
+    assert "DADOS DO CLIENTE (EMPRESA 2):\na: 2" in prompt
+
+    answer = "<<<EMPRESA 2>>>\nsegunda\n<<<FIM EMPRESA 2>>>\n<<< EMPRESA 1 >>>primeira<<<FIM EMPRESA 1>>>\n<<<EMPRESA 3>>>cortada"
+    assert split_batch_response(answer, 3) == ["primeira", "segunda", None]
+    assert split_batch_response(None, 2) == [None, None]
+
+def test_adaptive_batch_size_respects_output_limit():
+    assert adaptive_batch_size(1, 6144, 2000) == 1
+    assert adaptive_batch_size(10, 6144, 2000) == 2
+    assert adaptive_batch_size(10, 6144, 500) == 10
+    assert adaptive_batch_size(10, 6144, 9000) == 1
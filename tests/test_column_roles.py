@@ -0,0 +1,54 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.column_roles import infer_column_roles
+
+
+FORM_COLUMNS = [
+    "Carimbo de data/hora",
+    "Razão Social",
+    "Nome da Empresa",
+    "Qual o modelo de atuação?",
+    "Funcionários",
+]
+
+
+def test_infers_roles_from_form_headers():
+    roles = infer_column_roles(FORM_COLUMNS)
+    assert roles.prefix == "Nome da Empresa"
+    assert roles.company == "Nome da Empresa"
+    assert roles.label == "Razão Social"
+    assert roles.timestamp == "Carimbo de data/hora"
+    assert roles.prompt_selector == "Qual o modelo de atuação?"
+    assert infer_column_roles(list(FORM_COLUMNS)) is roles
+
+
+def test_fallbacks_without_known_headers():
+    roles = infer_column_roles(["Data", "Segmento", "Faturamento"])
+    assert roles.prefix is None
+    assert roles.company is None
+    assert roles.timestamp is None
+    assert roles.prompt_selector is None
+    # First column that does not look like a date
+    assert roles.label == "Segmento"
+    assert infer_column_roles(["Data", "Hora"]).label == "Data"
+
+
+def test_rows_are_read_through_roles_without_scanning_headers(mock_engine):
+    df = pd.DataFrame({
+        "Carimbo de data/hora": ["2024-01-01"], "Nome da Empresa": ["Alpha"], "Modelo de atuação": ["operations"],
+    })
+    mock_engine.load_dataframe = MagicMock(return_value=df)
+    mock_engine.load_agent_prompt = MagicMock(return_value="prompt")
+    mock_engine.call_ai_api = MagicMock(return_value="resposta")
+    mock_engine.parse_response = MagicMock(return_value={"RESUMO_EXECUTIVO": "x"})
+    mock_engine.generate_word_report = MagicMock(return_value="Alpha.docx")
+
+    assert mock_engine.process_file("fake.csv", prompt_type_override="Automático", use_cache=False) == ["Alpha.docx"]
+    mock_engine.load_agent_prompt.assert_called_once_with("operations")
+    assert mock_engine.generate_word_report.call_args.args[4] == "Alpha"
@@ -0,0 +1,79 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.dataset_cache import DatasetCache, get_dataset_cache, file_version
+
+
+def make_csv(path, companies):
+    pd.DataFrame({"Nome da Empresa": companies, "Modelo": ["revenue"] * len(companies)}).to_csv(path, index=False)
+
+
+def test_loads_each_file_version_once(tmp_path):
+    source = tmp_path / "empresas.csv"
+    make_csv(source, ["Alpha", "Beta"])
+    loader = MagicMock(side_effect=pd.read_csv)
+    cache = DatasetCache(str(tmp_path / "datasets"))
+
+    first = cache.get(str(source), loader)
+    second = cache.get(str(source), loader)
+    assert second is first
+    assert loader.call_count == 1
+
+    make_csv(source, ["Alpha", "Beta", "Gama"])
+    os.utime(source, ns=(0, 10**18))
+    assert list(cache.get(str(source), loader)["Nome da Empresa"]) == ["Alpha", "Beta", "Gama"]
+    assert loader.call_count == 2
+
+
+def test_new_session_reads_the_local_copy(tmp_path):
+    source = tmp_path / "empresas.csv"
+    make_csv(source, ["Alpha", "Beta"])
+    store = str(tmp_path / "datasets")
+    original = DatasetCache(store).get(str(source), pd.read_csv)
+    # Only the current version is kept on disk
+    assert len(os.listdir(store)) == 1
+
+    loader = MagicMock(side_effect=AssertionError("spreadsheet parsed again"))
+    reloaded = DatasetCache(store).get(str(source), loader)
+    pd.testing.assert_frame_equal(reloaded, original)
+
+
+def test_mixed_type_columns_survive_the_local_copy(tmp_path):
+    source = tmp_path / "empresas.csv"
+    source.write_text("x")
+    df = pd.DataFrame({"Empresa": ["Alpha", 2, None], 10: [1.5, 2.0, 3.0]})
+    store = str(tmp_path / "datasets")
+    DatasetCache(store).get(str(source), lambda _: df)
+    pd.testing.assert_frame_equal(DatasetCache(store).get(str(source), None), df)
+
+
+def test_store_is_capped_across_workbooks(tmp_path):
+    store = tmp_path / "datasets"
+    cache = DatasetCache(str(store), max_size_mb=1)
+    # ~300 KB per copy, incompressible
+    df = pd.DataFrame({"Empresa": [os.urandom(500).hex() for _ in range(300)]})
+    for n in range(6):
+        source = tmp_path / f"planilha{n}.csv"
+        source.write_text("x")
+        cache.get(str(source), lambda _: df)
+    sizes = [os.path.getsize(store / name) for name in os.listdir(store)]
+    assert 1 < len(sizes) < 6
+    assert sum(sizes) <= 1024 * 1024
+    # The most recent workbook is still there
+    assert cache._read_store(cache._key(str(tmp_path / "planilha5.csv")), file_version(str(source))) is not None
+
+    # Copies unused for longer than max_age_days are pruned on the next write
+    old = DatasetCache(str(store), max_age_days=-1)
+    source = tmp_path / "nova.csv"
+    source.write_text("x")
+    old.get(str(source), lambda _: df)
+    assert len(os.listdir(store)) == 1
+
+
+def test_engines_share_the_cache(tmp_path):
+    assert get_dataset_cache(str(tmp_path)) is get_dataset_cache(str(tmp_path / "."))
@@ -0,0 +1,96 @@
+import os
+import sys
+import shutil
+from unittest.mock import patch
+
+from docx import Document
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import core.docx_renderer as docx_renderer
+from core.docx_renderer import TemplateCache
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates", "template_xalq.docx")
+
+
+def body_texts(path):
+    return [p.text for p in Document(path).paragraphs]
+
+
+def test_template_is_parsed_once_and_each_report_starts_clean(tmp_path):
+    cache = TemplateCache()
+    with patch.object(docx_renderer, "Document", wraps=Document) as loader:
+        first = cache.document(TEMPLATE)
+        first.add_paragraph("relatório A")
+        first.save(tmp_path / "a.docx")
+        second = cache.document(TEMPLATE)
+        second.add_paragraph("relatório B")
+        second.save(tmp_path / "b.docx")
+    assert loader.call_count == 1
+    assert body_texts(tmp_path / "a.docx") == ["relatório A"]
+    assert body_texts(tmp_path / "b.docx") == ["relatório B"]
+    # Section properties (page setup, header/footer references) survive the reset
+    assert Document(tmp_path / "b.docx").sections[0].page_width == Document(TEMPLATE).sections[0].page_width
+
+
+def test_template_is_reloaded_when_the_file_changes(tmp_path):
+    template = tmp_path / "template.docx"
+    shutil.copy(TEMPLATE, template)
+    cache = TemplateCache()
+    with patch.object(docx_renderer, "Document", wraps=Document) as loader:
+        cache.document(str(template))
+        os.utime(template, ns=(0, 10**18))
+        cache.document(str(template))
+    assert loader.call_count == 2
+
+
+def test_engine_reports_reuse_the_skeleton(mock_engine):
+    parsed = {"RESUMO_EXECUTIVO": "Texto\n- item\n1. passo", "LACUNAS": "Outra"}
+    paths = [mock_engine.generate_word_report(parsed, "revenue", "m", f"t{i}", f"Empresa{i}") for i in range(2)]
+    try:
+        for path in paths:
+            assert body_texts(path) == ["Resumo Executivo", "Texto", "item", "1. passo", "", "Lacunas & Gaps", "Outra", ""]
+    finally:
+        for path in paths:
+            if path and os.path.exists(path):
+                os.remove(path)
+
+
+GOLDEN_SECTIONS = {
+    "RESUMO_EXECUTIVO": "Resumo com acentuação & <símbolos> \"aspas\".\n\n- Primeiro tópico\n* Segundo tópico\n-   Tópico com espaços",
+    "DIAGNOSTICO": "1. Passo numerado\n2) Outro passo\n10. Dois dígitos\nTexto\tcom tabulação",
+    "LACUNAS": "",
+    "CLASSIFICACAO": "Nível 3 de 5",
+    "PROXIMOS_PASSOS": "- Ação final\nLinha comum",
+}
+
+
+def document_xml(path):
+    import zipfile
+    with zipfile.ZipFile(path) as package:
+        return package.read("word/document.xml")
+
+
+def test_fast_emitter_matches_golden_document(tmp_path):
+    from core.docx_renderer import render_report
+
+    golden = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "report_document.xml")
+    out = render_report(GOLDEN_SECTIONS, TEMPLATE, str(tmp_path / "report.docx"))
+    with open(golden, "rb") as f:
+        assert document_xml(out) == f.read()
+
+
+def test_fast_emitter_matches_add_paragraph(tmp_path):
+    from core.docx_renderer import emit_paragraphs, report_paragraphs
+
+    paragraphs = report_paragraphs({
+        "RISCOS_ATUAIS": "- a & b\n3) x\n*  y\n\tz\ntexto < fim",
+        "OBSERVACOES_XALQ": "só texto",
+    })
+    fast, slow = Document(TEMPLATE), Document(TEMPLATE)
+    emit_paragraphs(fast, paragraphs)
+    for style, text in paragraphs:
+        slow.add_paragraph(text, style=style) if text else slow.add_paragraph()
+    fast.save(tmp_path / "fast.docx")
+    slow.save(tmp_path / "slow.docx")
+    assert document_xml(tmp_path / "fast.docx") == document_xml(tmp_path / "slow.docx")
@@ -0,0 +1,137 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.job_journal import JobJournal, QUEUED, AI_DONE, RENDERED, FAILED, TIMED_OUT
+from core.worker_engine import RowTimeout
+
+
+def test_rows_keep_their_response_across_transitions(tmp_path):
+    source = tmp_path / "empresas.csv"
+    source.write_text("x")
+    journal = JobJournal(str(tmp_path / "jobs.sqlite3"))
+    run = journal.start(str(source), "revenue", "gemini-2.5-pro")
+    run.mark([0, 1], QUEUED)
+    run.mark([0], AI_DONE, response="resposta 0")
+    run.mark([0], QUEUED)
+    run.mark([1], FAILED, error="boom")
+    assert journal.row_states(run.job_id) == {"0": QUEUED, "1": FAILED}
+    assert run.finish() == "incomplete"
+    journal.close()
+
+    # A new connection (e.g. after a crash) sees everything that was committed
+    journal = JobJournal(str(tmp_path / "jobs.sqlite3"))
+    resumed = journal.start(str(source), "revenue", "gemini-2.5-pro", resume=True)
+    assert resumed.job_id == run.job_id
+    assert resumed.response(0) == "resposta 0"
+    assert resumed.report(0) is None
+    # Other prompt or model, or no resume: a new job
+    assert journal.start(str(source), "operations", "gemini-2.5-pro", resume=True).job_id != run.job_id
+    assert journal.start(str(source), "revenue", "gemini-2.5-pro").job_id != run.job_id
+    journal.close()
+
+
+def test_completed_run_is_compacted_and_not_resumed(tmp_path):
+    source = tmp_path / "empresas.csv"
+    source.write_text("x")
+    journal = JobJournal(str(tmp_path / "jobs.sqlite3"))
+    interrupted = journal.start(str(source), "revenue", "gemini-2.5-pro")
+    interrupted.mark([0], AI_DONE, response="resposta antiga")
+    assert interrupted.finish(cancelled=True) == "cancelled"
+
+    done = journal.start(str(source), "revenue", "gemini-2.5-pro")
+    done.mark([0], RENDERED, response="resposta 0", report=str(tmp_path / "A.docx"))
+    assert done.finish() == "done"
+    # Responses of the completed run and of the run it superseded are gone
+    assert journal.row_states(done.job_id) == {}
+    assert journal.row_states(interrupted.job_id) == {}
+    assert journal.unfinished_jobs() == []
+
+    # Nothing to resume once a newer run completed
+    fresh = journal.start(str(source), "revenue", "gemini-2.5-pro", resume=True)
+    assert fresh.job_id not in (interrupted.job_id, done.job_id)
+    assert not fresh.resumed
+    journal.close()
+
+
+def test_old_jobs_are_pruned_on_open(tmp_path):
+    source = tmp_path / "empresas.csv"
+    source.write_text("x")
+    journal = JobJournal(str(tmp_path / "jobs.sqlite3"))
+    run = journal.start(str(source), "revenue", "gemini-2.5-pro")
+    run.mark([0], AI_DONE, response="resposta 0")
+    run.finish()
+    journal.prune(max_age=-1)
+    assert journal.unfinished_jobs() == []
+    assert journal.row_states(run.job_id) == {}
+    journal.close()
+
+
+def test_expired_row_is_journaled_as_timed_out(mock_engine, tmp_path):
+    source = str(tmp_path / "empresas.csv")
+    pd.DataFrame({"Nome da Empresa": ["A"]}).to_csv(source, index=False)
+    mock_engine.datasets = MagicMock(get=lambda file_path, loader: loader(file_path))
+    mock_engine.load_agent_prompt = MagicMock(return_value="prompt")
+    mock_engine._generate_once = MagicMock(side_effect=RowTimeout())
+
+    assert mock_engine.process_file(source, max_workers=1, use_cache=False, row_deadline=5) == []
+    journal = JobJournal(mock_engine.journal_path)
+    (job_id, *_), = journal.unfinished_jobs()
+    assert journal.row_states(job_id) == {"0": TIMED_OUT}
+    journal.close()
+
+
+def test_resume_skips_rendered_rows_and_rerenders_answered_ones(mock_engine, tmp_path):
+    source = str(tmp_path / "empresas.csv")
+    pd.DataFrame({"Nome da Empresa": ["A", "B", "C", "D"]}).to_csv(source, index=False)
+    mock_engine.datasets = MagicMock(get=lambda file_path, loader: loader(file_path))
+    mock_engine.load_agent_prompt = MagicMock(return_value="prompt")
+    mock_engine.parse_response = MagicMock(side_effect=lambda r: {"RESUMO_EXECUTIVO": r})
+
+    def render(parsed, p_type, model, ts, prefix, **kw):
+        if prefix == "C":
+            return None  # DOCX generation fails for C
+        path = str(tmp_path / f"{prefix}.docx")
+        open(path, "w").close()
+        return path
+
+    mock_engine.generate_word_report = MagicMock(side_effect=render)
+    mock_engine.call_ai_api = MagicMock(side_effect=lambda prompt, config, **kw: f"resposta {prompt.strip()[-1]}")
+    # Cancelled after the third row was submitted
+    submitted = []
+    mock_engine.set_cancellation_callback(lambda: len(submitted) >= 3)
+    original_prepare = mock_engine._prepare_row
+
+    def prepare(row_idx, *args, **kwargs):
+        submitted.append(row_idx)
+        return original_prepare(row_idx, *args, **kwargs)
+
+    mock_engine._prepare_row = prepare
+    first = mock_engine.process_file(source, max_workers=1, use_cache=False)
+    assert [os.path.basename(p) for p in first] == ["A.docx", "B.docx"]
+    assert mock_engine.call_ai_api.call_count == 3  # A, B, and C whose DOCX failed
+
+    mock_engine.set_cancellation_callback(None)
+    mock_engine._prepare_row = original_prepare
+    mock_engine.call_ai_api.reset_mock()
+    second = mock_engine.process_file(source, max_workers=1, use_cache=False, resume=True)
+    assert [os.path.basename(p) for p in second] == ["A.docx", "B.docx", "D.docx"]
+    # Only D goes to the AI: C's response was journaled
+    assert mock_engine.call_ai_api.call_count == 1
+
+    mock_engine.call_ai_api.reset_mock()
+    mock_engine.generate_word_report = MagicMock(
+        side_effect=lambda parsed, p_type, model, ts, prefix, **kw: str(tmp_path / f"{prefix}.docx")
+    )
+    files = mock_engine.process_file(source, max_workers=1, use_cache=False, resume=True)
+    assert [os.path.basename(p) for p in files] == ["A.docx", "B.docx", "C.docx", "D.docx"]
+    assert mock_engine.call_ai_api.call_count == 0
+    assert [call.args[4] for call in mock_engine.generate_word_report.call_args_list] == ["C"]
+
+    journal = JobJournal(mock_engine.journal_path)
+    assert journal.unfinished_jobs() == []
+    journal.close()
@@ -0,0 +1,57 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.model_health import ModelHealthRegistry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_not_found_models_are_skipped_for_session():
+    registry = ModelHealthRegistry()
+    registry.record_not_found("gemini-3-pro-preview")
+    assert registry.order(["gemini-3-pro-preview", "gemini-2.5-pro"]) == ["gemini-2.5-pro"]
+    assert registry.seconds_until_available(["gemini-3-pro-preview"]) is None
+
+def test_circuit_opens_then_half_opens_after_cooldown():
+    clock = FakeClock()
+    registry = ModelHealthRegistry(failure_threshold=2, cooldown=60, clock=clock)
+
+    registry.record_failure("flash")
+    assert registry.is_available("flash")
+    registry.record_failure("flash")
+    assert not registry.is_available("flash")
+    assert registry.order(["flash", "pro"]) == ["pro"]
+    assert registry.seconds_until_available(["flash"]) == 60
+
+    clock.now = 61
+    # Half-open: only one probe at a time
+    assert registry.acquire("flash")
+    assert not registry.acquire("flash")
+
+    registry.record_success("flash", latency=1.5)
+    assert registry.acquire("flash") and registry.acquire("flash")
+    assert registry.latencies("flash") == [1.5]
+
+def test_half_open_failure_reopens_circuit():
+    clock = FakeClock()
+    registry = ModelHealthRegistry(failure_threshold=1, cooldown=10, clock=clock)
+    registry.record_failure("pro")
+    clock.now = 11
+    assert registry.acquire("pro")
+    registry.record_failure("pro")
+    assert not registry.is_available("pro")
+
+def test_order_prefers_healthier_models_and_keeps_chain_order_on_ties():
+    registry = ModelHealthRegistry(failure_threshold=10)
+    for _ in range(5):
+        registry.record_failure("a")
+    registry.record_success("a")
+    assert registry.order(["a", "b", "c"]) == ["b", "c", "a"]
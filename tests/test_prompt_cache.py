@@ -0,0 +1,89 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.prompt_cache import PrefixCacheSession
+from core.fake_backend import FakeBackend
+
+
+LONG_PROMPT = "instruções " * 1000
+
+
+class RefusingBackend(FakeBackend):
+    def create_cached_prefix(self, model_name, prefix_text, ttl_seconds):
+        self.calls["cache_create"] += 1
+        raise RuntimeError("400 cached content is too small")
+
+
+def test_session_creates_prefix_once_and_expires_on_close():
+    backend = FakeBackend()
+    session = PrefixCacheSession(backend, min_prefix_tokens=100)
+    first = session.handle_for("gemini-2.5-pro", LONG_PROMPT)
+    assert session.handle_for("gemini-2.5-pro", LONG_PROMPT) == first
+    assert backend.calls["cache_create"] == 1
+    # Short prompts are never cached
+    assert session.handle_for("gemini-2.5-pro", "curto") is None
+    # The minimum uses the same token estimate as the input budget and routing
+    sized = PrefixCacheSession(FakeBackend(), min_prefix_tokens=100)
+    assert sized.handle_for("gemini-2.5-pro", "x" * 350) is not None
+    assert sized.handle_for("gemini-2.5-pro", "x" * 340) is None
+    session.close()
+    assert backend.calls["cache_delete"] == 1
+
+def test_session_remembers_refused_prefixes():
+    backend = RefusingBackend()
+    session = PrefixCacheSession(backend, min_prefix_tokens=100)
+    assert session.handle_for("gemini-2.5-flash", LONG_PROMPT) is None
+    assert session.handle_for("gemini-2.5-flash", LONG_PROMPT) is None
+    assert backend.calls["cache_create"] == 1
+
+def test_call_ai_api_sends_only_row_data_with_cached_prefix(mock_engine):
+    backend = mock_engine.backend
+    config = {"model": "gemini-2.5-pro", "prefix_cache": PrefixCacheSession(backend, min_prefix_tokens=100)}
+
+    for company in ("A", "B"):
+        full = f"{LONG_PROMPT}\n\nDADOS DO CLIENTE:\n{company}"
+        assert mock_engine.call_ai_api(full, config, cached_prefix=LONG_PROMPT)
+
+    assert backend.calls["cache_create"] == 1
+    assert backend.prompts == ["\n\nDADOS DO CLIENTE:\nA", "\n\nDADOS DO CLIENTE:\nB"]
+
+class FlakyCacheBackend(FakeBackend):
+    """Fails the first request made with a cached prefix with `error`."""
+
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    def generate(self, model_name, contents, generation_config, timeout=600, cached_prefix=None):
+        if cached_prefix is not None and self.error:
+            error, self.error = self.error, None
+            raise Exception(error)
+        return super().generate(model_name, contents, generation_config, timeout, cached_prefix)
+
+
+def test_expired_prefix_is_recreated(mock_engine):
+    backend = mock_engine.backend = FlakyCacheBackend("403 PermissionDenied: CachedContent not found (or permission denied)")
+    session = PrefixCacheSession(backend, min_prefix_tokens=100)
+    config = {"model": "gemini-2.5-pro", "prefix_cache": session}
+    full = f"{LONG_PROMPT}\n\nDADOS DO CLIENTE:\nA"
+
+    assert mock_engine.call_ai_api(full, config, cached_prefix=LONG_PROMPT)
+    assert backend.calls["cache_create"] == 2
+    # Still cached for the next rows; the model was not blamed
+    assert session.handle_for("gemini-2.5-pro", LONG_PROMPT) is not None
+    assert mock_engine.model_health.snapshot()["gemini-2.5-pro"]["error_rate"] == 0.0
+
+
+def test_other_errors_with_a_cached_prefix_take_the_normal_retry_path(mock_engine):
+    backend = mock_engine.backend = FlakyCacheBackend("503 ServiceUnavailable: the model is overloaded")
+    session = PrefixCacheSession(backend, min_prefix_tokens=100)
+    config = {"model": "gemini-2.5-pro", "prefix_cache": session}
+    full = f"{LONG_PROMPT}\n\nDADOS DO CLIENTE:\nA"
+    mock_engine._sleep_cancellable = lambda seconds, deadline=None: True
+
+    assert mock_engine.call_ai_api(full, config, cached_prefix=LONG_PROMPT)
+    # Same handle reused on the retry, and the failure was recorded against the model
+    assert backend.calls["cache_create"] == 1
+    assert mock_engine.model_health.snapshot()["gemini-2.5-pro"]["error_rate"] > 0
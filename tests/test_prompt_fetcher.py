@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.prompt_fetcher import PromptFetcher
+
+URL = "https://raw.githubusercontent.com/andreocc/XALQ-Agent/main/prompts/revenue.md"
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+
+class FakeSession:
+    """Answers 200 with an ETag, then 304 when the client sends it back."""
+
+    def __init__(self, body="prompt v1", etag='"abc"', status=200):
+        self.body = body
+        self.etag = etag
+        self.status = status
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append(dict(headers or {}))
+        if self.status != 200:
+            return FakeResponse(self.status)
+        if headers and headers.get("If-None-Match") == self.etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.body, {"ETag": self.etag})
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fresh_entries_skip_the_network_and_stale_ones_revalidate_with_etag(tmp_path):
+    session, clock = FakeSession(), FakeClock()
+    fetcher = PromptFetcher(str(tmp_path), session=session, fresh_ttl=60, max_stale=0, clock=clock)
+    assert fetcher.fetch(URL) == "prompt v1"
+    assert fetcher.fetch(URL) == "prompt v1"
+    assert len(session.requests) == 1
+
+    clock.now += 120
+    assert fetcher.fetch(URL, {"Authorization": "token x"}) == "prompt v1"
+    assert session.requests[-1] == {"Authorization": "token x", "If-None-Match": '"abc"'}
+
+    # A new process reuses the on-disk copy
+    other = PromptFetcher(str(tmp_path), session=session, fresh_ttl=60, clock=clock)
+    assert other.fetch(URL) == "prompt v1"
+    assert len(session.requests) == 2
+
+
+def test_stale_copy_is_served_while_revalidating_in_background(tmp_path):
+    session, clock = FakeSession(), FakeClock()
+    fetcher = PromptFetcher(str(tmp_path), session=session, fresh_ttl=60, clock=clock)
+    fetcher.fetch(URL)
+    session.body, session.etag = "prompt v2", '"def"'
+    clock.now += 120
+    assert fetcher.fetch(URL) == "prompt v1"
+    deadline = time.monotonic() + 2
+    while fetcher.fetch(URL) != "prompt v2" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fetcher.fetch(URL) == "prompt v2"
+
+
+def test_failures_are_cached_only_for_the_negative_ttl(tmp_path):
+    session, clock = FakeSession(status=404), FakeClock()
+    fetcher = PromptFetcher(str(tmp_path), session=session, negative_ttl=30, clock=clock)
+    assert fetcher.fetch(URL) is None
+    assert fetcher.fetch(URL) is None
+    assert fetcher.last_error(URL) == "HTTP 404"
+    assert len(session.requests) == 1
+
+    session.status = 200
+    clock.now += 31
+    assert fetcher.fetch(URL) == "prompt v1"
@@ -0,0 +1,67 @@
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.prompt_registry import PromptRegistry, get_registry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def test_resolves_exact_and_normalized_names(tmp_path):
+    write(tmp_path / "1_Diagnóstico-Revenue.md", "revenue prompt")
+    write(tmp_path / "notes.txt", "ignored")
+    registry = PromptRegistry(str(tmp_path))
+    assert registry.names() == ["1_Diagnóstico-Revenue"]
+    assert registry.resolve("1_Diagnóstico-Revenue.md") == "1_Diagnóstico-Revenue.md"
+    assert registry.resolve("1 diagnostico revenue") == "1_Diagnóstico-Revenue.md"
+    assert registry.resolve("operations") is None
+
+
+def test_serves_bodies_from_memory_until_file_changes(tmp_path):
+    write(tmp_path / "p.md", "v1")
+    clock = FakeClock()
+    registry = PromptRegistry(str(tmp_path), check_interval=2.0, clock=clock)
+    assert registry.resolve("p") == "p.md"
+    assert registry.read("p.md") == "v1"
+
+    with patch("builtins.open", side_effect=AssertionError("file reopened")), \
+            patch("os.listdir", side_effect=AssertionError("directory rescanned")):
+        for _ in range(100):
+            assert registry.resolve("p") == "p.md"
+            assert registry.read("p.md") == "v1"
+
+    write(tmp_path / "p.md", "version 2")
+    clock.now += 5
+    assert registry.read("p.md") == "version 2"
+
+
+def test_new_files_appear_after_directory_mtime_changes(tmp_path):
+    clock = FakeClock()
+    registry = PromptRegistry(str(tmp_path), clock=clock)
+    assert registry.names() == []
+    write(tmp_path / "novo.md", "x")
+    os.utime(tmp_path, ns=(0, 10**18))
+    clock.now += 5
+    assert registry.names() == ["novo"]
+
+
+def test_writes_are_visible_to_every_engine_at_once(tmp_path):
+    shared = get_registry(str(tmp_path))
+    assert get_registry(str(tmp_path)) is shared
+    shared.write("edit.md", "conteúdo novo")
+    assert get_registry(str(tmp_path)).read("edit.md") == "conteúdo novo"
+    assert "edit" in get_registry(str(tmp_path)).names()
+    assert not [f for f in os.listdir(tmp_path) if f.endswith(".tmp")]
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import hashlib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.prompt_sync import PromptSync, build_manifest
+
+BASE = "https://raw.githubusercontent.com/andreocc/XALQ-Agent/main/prompts/"
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+
+
+class FakeSession:
+    def __init__(self, files, version="v2", corrupt=()):
+        self.files = files
+        self.corrupt = set(corrupt)
+        self.version = version
+        self.requested = []
+
+    def get(self, url, headers=None, timeout=None):
+        name = url[len(BASE):]
+        self.requested.append(name)
+        if name == "manifest.json":
+            entries = [{"name": n, "sha256": hashlib.sha256(d).hexdigest(), "size": len(d)}
+                       for n, d in sorted(self.files.items())]
+            entries.append({"name": "../evil.md", "sha256": "x", "size": 1})
+            return FakeResponse(200, json.dumps({"version": self.version, "prompts": entries}).encode())
+        if name not in self.files:
+            return FakeResponse(404)
+        data = self.files[name]
+        return FakeResponse(200, b"tampered" if name in self.corrupt else data)
+
+
+def make_sync(tmp_path, session, **kwargs):
+    prompts = tmp_path / "prompts"
+    prompts.mkdir(exist_ok=True)
+    return PromptSync(str(prompts), str(tmp_path / "cache" / "prompt_sync.json"), session, BASE, **kwargs)
+
+
+def test_downloads_only_changed_prompts_and_skips_unchanged_manifest(tmp_path):
+    session = FakeSession({"a.md": "olá".encode("utf-8"), "b.md": b"novo"})
+    sync = make_sync(tmp_path, session)
+    (tmp_path / "prompts" / "a.md").write_bytes("olá".encode("utf-8"))
+    (tmp_path / "prompts" / "b.md").write_bytes(b"antigo")
+
+    updated, failed = sync.sync("v2")
+    assert (updated, failed) == (["b.md"], [])
+    assert (tmp_path / "prompts" / "b.md").read_bytes() == b"novo"
+    assert sorted(session.requested) == ["b.md", "manifest.json"]
+    assert not (tmp_path / "evil.md").exists()
+
+    session.requested.clear()
+    assert sync.sync("v2") == ([], [])
+    assert session.requested == []
+
+
+def test_hash_mismatch_keeps_local_file_and_retries_next_time(tmp_path):
+    session = FakeSession({"a.md": b"certo"}, corrupt={"a.md"})
+    notified = []
+    sync = make_sync(tmp_path, session, on_updated=notified.append)
+    (tmp_path / "prompts" / "a.md").write_bytes(b"local")
+
+    assert sync.sync("v2") == ([], ["a.md"])
+    assert (tmp_path / "prompts" / "a.md").read_bytes() == b"local"
+    assert notified == []
+
+    session.corrupt.clear()
+    assert sync.sync("v2") == (["a.md"], [])
+    assert notified == [["a.md"]]
+
+
+def test_build_manifest_lists_markdown_prompts(tmp_path):
+    (tmp_path / "x.md").write_bytes(b"abc")
+    (tmp_path / "manifest.json").write_text("{}")
+    manifest = build_manifest(str(tmp_path), "v1")
+    assert manifest == {"version": "v1", "prompts": [
+        {"name": "x.md", "sha256": hashlib.sha256(b"abc").hexdigest(), "size": 3}
+    ]}
+
+
+def test_locally_edited_prompt_is_not_overwritten(tmp_path):
+    session = FakeSession({"revenue_full.md": b"v1"}, version="1")
+    sync = make_sync(tmp_path, session)
+    assert sync.sync("1") == (["revenue_full.md"], [])
+
+    # Edited in Settings, then upstream publishes a new version
+    (tmp_path / "prompts" / "revenue_full.md").write_bytes(b"editado localmente")
+    session.files["revenue_full.md"] = b"v2"
+    assert sync.sync("2") == ([], [])
+    assert (tmp_path / "prompts" / "revenue_full.md").read_bytes() == b"editado localmente"
+
+
+def test_unsynced_local_prompt_is_backed_up_before_update(tmp_path):
+    session = FakeSession({"a.md": b"remoto"})
+    sync = make_sync(tmp_path, session)
+    (tmp_path / "prompts" / "a.md").write_bytes(b"local")
+    assert sync.sync("v2") == (["a.md"], [])
+    assert (tmp_path / "prompts" / "a.md").read_bytes() == b"remoto"
+    assert (tmp_path / "prompts" / "a.md.bak").read_bytes() == b"local"
+
+    # Unedited since this sync: later versions update it normally
+    session.files["a.md"] = b"remoto v3"
+    assert sync.sync("v3") == (["a.md"], [])
+
+
+def test_updater_syncs_prompts_without_an_engine(tmp_path, monkeypatch):
+    from unittest.mock import MagicMock, patch
+    from core.updater import Updater
+
+    monkeypatch.delenv("GITHUB_PAT", raising=False)
+    monkeypatch.delenv("XALQ_PROMPT_SYNC_WORKERS", raising=False)
+    session = FakeSession({"a.md": b"novo"})
+    (tmp_path / "prompts").mkdir()
+    with patch("core.updater.QSettings") as settings, \
+            patch("core.updater.get_fetcher", return_value=MagicMock(session=session)), \
+            patch("core.worker_engine.WorkerEngine", side_effect=AssertionError("engine built for a sync")):
+        settings.return_value.value.side_effect = lambda key, default=None: default
+        updater = Updater(str(tmp_path))
+        assert updater.sync_prompts("v2") == (["a.md"], [])
+    assert (tmp_path / "prompts" / "a.md").read_bytes() == b"novo"
+    assert (tmp_path / "cache" / "prompt_sync.json").exists()
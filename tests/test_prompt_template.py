@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.batching import build_batch_prompt
+from core.prompt_template import compile_template
+
+COLUMNS = ["Carimbo de data/hora", "Nome da Empresa", "Faturamento", "Principais desafios"]
+
+
+def row(*values):
+    return pd.Series(values, index=COLUMNS)
+
+
+def test_plain_prompt_appends_compact_block_without_empty_cells():
+    template = compile_template("Analise a empresa.", COLUMNS)
+    rendered = template.render(row("2026-01-01", "ACME", 1200.0, float("nan")))
+    assert rendered == (
+        "Analise a empresa.\n\nDADOS DO CLIENTE:\n"
+        "Carimbo de data/hora: 2026-01-01\nNome da Empresa: ACME\nFaturamento: 1200"
+    )
+    assert template.batchable
+    assert rendered.startswith(template.prefix)
+
+
+def test_placeholders_and_field_selection():
+    prompt = (
+        "<!-- campos: nome da empresa | Principais desafios | Coluna inexistente -->\n"
+        "Relatório para {{Nome da Empresa}}.\n{{DADOS_CLIENTE}}\nFim. {{não é coluna}}"
+    )
+    template = compile_template(prompt, COLUMNS)
+    rendered = template.render(row("2026-01-01", "ACME", 10, "  "))
+    assert rendered == "Relatório para ACME.\nNome da Empresa: ACME\nFim. {{não é coluna}}"
+    assert not template.batchable
+    assert template.prefix == "Relatório para "
+
+
+def test_prompt_ending_with_data_placeholder_batches_without_the_placeholder():
+    template = compile_template("Analise a empresa.\n{{DADOS_CLIENTE}}\n", COLUMNS)
+    assert template.batchable
+    assert template.prefix == "Analise a empresa.\n"
+    assert template.render(row("x", "ACME", None, None)).startswith(template.prefix)
+    batch = build_batch_prompt(template.prefix, ["Nome da Empresa: A", "Nome da Empresa: B"])
+    assert batch.startswith(template.prefix)
+    assert "{{" not in batch
+
+
+def test_ignored_fields_and_compiled_once():
+    prompt = "<!-- ignorar: Carimbo de data/hora -->P"
+    template = compile_template(prompt, COLUMNS)
+    assert compile_template(prompt, pd.Index(COLUMNS)) is template
+    assert template.render_block(row("x", "ACME", None, "dados")) == "Nome da Empresa: ACME\nPrincipais desafios: dados"
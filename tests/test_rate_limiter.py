@@ -0,0 +1,54 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.rate_limiter import RateLimiter, RetryPolicy, TokenBucket, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)  # 1 token/s
+    assert bucket.try_consume(60) == 0
+    assert bucket.try_consume(1) == 1.0
+    clock.now = 1.0
+    assert bucket.try_consume(1) == 0
+
+def test_rate_limiter_blocks_at_rpm_ceiling():
+    clock = FakeClock()
+    limiter = RateLimiter({"models/gemini-2.5-pro": {"rpm": 2, "tpm": 0}}, clock=clock, sleep=clock.sleep)
+    assert limiter.acquire("gemini-2.5-pro")
+    assert limiter.acquire("models/gemini-2.5-pro")
+    assert limiter.acquire("gemini-2.5-pro")
+    # Third request had to wait for the bucket to refill (2/min -> 30s per request)
+    assert clock.now >= 30
+
+def test_rate_limiter_penalize_and_cancel():
+    clock = FakeClock()
+    limiter = RateLimiter(clock=clock, sleep=clock.sleep)
+    limiter.penalize("gemini-2.5-flash", 10)
+    assert limiter.acquire("gemini-2.5-flash")
+    assert clock.now >= 10
+    limiter.penalize("gemini-2.5-flash", 10)
+    assert not limiter.acquire("gemini-2.5-flash", cancel_check=lambda: True)
+    assert not limiter.acquire("gemini-2.5-flash", max_wait=1)
+
+def test_parse_retry_after_and_classification():
+    err = Exception("429 Resource exhausted. Please retry in 12.5s. [retry_delay { seconds: 12 }]")
+    assert parse_retry_after(err) == 12
+    assert parse_retry_after(Exception("429 quota, retry in 3.5s")) == 3.5
+    assert parse_retry_after(Exception("boom")) is None
+    assert RetryPolicy.is_rate_limit(err) and RetryPolicy.is_retryable(err)
+    assert not RetryPolicy.is_retryable(ValueError("bad prompt"))
+    assert RetryPolicy(max_delay=5).delay(1, retry_after=30) == 5
@@ -0,0 +1,27 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.response_parser import StreamingSectionParser
+
+
+def test_streaming_parser_reports_sections_split_across_chunks():
+    parser = StreamingSectionParser()
+    chunks = ["intro [RESUMO_EXEC", "UTIVO]Texto do res", "umo[/RESUMO_EXECUTIVO]\n[lacunas]a", "\nb[/LAC", "UNAS] fim"]
+    completed = [parser.feed(c) for c in chunks]
+    assert completed == [[], [], ["RESUMO_EXECUTIVO"], [], ["LACUNAS"]]
+    assert parser.sections == {"RESUMO_EXECUTIVO": "Texto do resumo", "LACUNAS": "a\nb"}
+
+
+def test_single_pass_parser_matches_previous_parse_response():
+    import random
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+    from bench_parser import legacy_parse, single_pass_parse, synthetic_corpus
+
+    rng = random.Random(7)
+    pieces = ["[RESUMO_EXECUTIVO]", "[/RESUMO_EXECUTIVO]", "[lacunas]", "[/LACUNAS]", "[/DIAGNOSTICO]",
+              "[DIAGNOSTICO]", "## Riscos Atuais:", "**Próximos Passos**", "CLASSIFICAÇÃO", "texto", "\n", " "]
+    fuzz = ["".join(rng.choice(pieces) for _ in range(rng.randint(0, 40))) for _ in range(300)]
+    for response in synthetic_corpus() + fuzz:
+        assert single_pass_parse(response) == legacy_parse(response)
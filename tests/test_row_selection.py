@@ -0,0 +1,68 @@
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.row_selection import select_rows, iter_selected
+
+
+DF = pd.DataFrame({"Empresa": [f"E{i}" for i in range(10)], "Funcionários": range(0, 100, 10)})
+
+
+def labels(rows):
+    return [row_idx for row_idx, _ in rows]
+
+
+def test_select_rows_by_labels_slices_and_filters():
+    assert select_rows(DF, None) is DF
+    assert list(select_rows(DF, [7, 2, 2, 99]).index) == [2, 7]
+    assert list(select_rows(DF, range(3, 6)).index) == [3, 4, 5]
+    assert list(select_rows(DF, slice(8, None)).index) == [8, 9]
+    assert list(select_rows(DF, lambda df: df["Funcionários"] >= 70).index) == [7, 8, 9]
+    # File order, even when the labels are not sorted
+    shuffled = DF.loc[[5, 9, 2]]
+    assert list(select_rows(shuffled, [2, 5]).index) == [5, 2]
+
+
+def test_iter_selected_matches_select_rows_and_stops_early():
+    for selection in ([7, 2, 99], range(3, 6), slice(1, 9, 3), lambda df: df["Funcionários"] >= 70):
+        assert labels(iter_selected(DF.iterrows(), selection)) == list(select_rows(DF, selection).index)
+
+    visited = []
+
+    def rows():
+        for row_idx, row in DF.iterrows():
+            visited.append(row_idx)
+            yield row_idx, row
+
+    assert labels(iter_selected(rows(), [1, 3])) == [1, 3]
+    assert visited == [0, 1, 2, 3]
+
+
+def test_process_file_only_visits_selected_rows(mock_engine):
+    df = pd.DataFrame({"Nome da Empresa": [f"E{i}" for i in range(1000)]})
+    mock_engine.load_dataframe = MagicMock(return_value=df)
+    mock_engine.load_agent_prompt = MagicMock(return_value="prompt")
+    mock_engine.call_ai_api = MagicMock(return_value="resposta")
+    mock_engine.parse_response = MagicMock(return_value={"RESUMO_EXECUTIVO": "x"})
+    mock_engine.generate_word_report = MagicMock(side_effect=lambda parsed, p_type, model, ts, prefix, **kw: prefix)
+    mock_engine._prepare_row = MagicMock(wraps=mock_engine._prepare_row)
+
+    mock_engine.load_data = MagicMock(side_effect=AssertionError("UI list built for a run"))
+
+    files = mock_engine.process_file("fake.csv", rows_to_process=[999, 5, 500], use_cache=False)
+    assert files == ["E5", "E500", "E999"]
+    assert mock_engine._prepare_row.call_count == 3
+
+
+def test_load_data_lists_companies_without_iterrows(mock_engine, tmp_path):
+    path = str(tmp_path / "empresas.csv")
+    pd.DataFrame({"Carimbo": ["2024"] * 3, "Empresa": ["Alpha", None, "Gama"]}).to_csv(path, index=False)
+    mock_engine.datasets = MagicMock(get=lambda file_path, loader: loader(file_path))
+
+    with patch.object(pd.DataFrame, "iterrows", side_effect=AssertionError("iterrows over the whole frame")):
+        df, items = mock_engine.load_data(path)
+    assert items == ["0: Alpha", "1: nan", "2: Gama"]
@@ -0,0 +1,62 @@
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.row_stream import RowStream
+from core.prompt_template import format_value, _is_empty
+
+
+def as_text(rows):
+    """Row contents as the prompt sees them (dtype differences do not matter)."""
+    return [(idx, {k: None if _is_empty(v) else format_value(v) for k, v in row.items()}) for idx, row in rows]
+
+
+def test_csv_stream_matches_read_csv(tmp_path):
+    path = str(tmp_path / "empresas.csv")
+    pd.DataFrame({
+        "Nome da Empresa": [f"Empresa {i}" for i in range(7)],
+        "Funcionários": [10, None, 30, 40, 50, 60, 70],
+    }).to_csv(path, index=False)
+
+    with RowStream(path, chunk_rows=3) as stream:
+        assert list(stream.columns) == ["Nome da Empresa", "Funcionários"]
+        assert stream.total is None
+        streamed = as_text(stream)
+    assert streamed == as_text(pd.read_csv(path).iterrows())
+
+
+def test_xlsx_stream_matches_read_excel(tmp_path):
+    path = str(tmp_path / "empresas.xlsx")
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Carimbo", "Empresa", None, "Empresa"])
+    ws.append(["2024-01-01", "Alpha", 1, "dup"])
+    ws.append([None, None, None, None])
+    ws.append(["2024-01-02", "Beta", 2.5, None])
+    ws.append([None, None, None, None])
+    wb.save(path)
+
+    with RowStream(path) as stream:
+        assert list(stream.columns) == ["Carimbo", "Empresa", "Unnamed: 2", "Empresa.1"]
+        streamed = as_text(stream)
+    assert streamed == as_text(pd.read_excel(path).iterrows())
+
+
+def test_process_file_streams_rows_without_loading_the_file(mock_engine, tmp_path):
+    path = str(tmp_path / "empresas.csv")
+    pd.DataFrame({"Nome da Empresa": list("ABCDE")}).to_csv(path, index=False)
+    mock_engine.load_dataframe = MagicMock(side_effect=AssertionError("whole file loaded"))
+    mock_engine.load_agent_prompt = MagicMock(return_value="prompt")
+    mock_engine.call_ai_api = MagicMock(side_effect=lambda prompt, config, **kw: prompt.strip()[-1])
+    mock_engine.parse_response = MagicMock(side_effect=lambda r: {"RESUMO_EXECUTIVO": r})
+    mock_engine.generate_word_report = MagicMock(
+        side_effect=lambda parsed, *a, **kw: f"{parsed['RESUMO_EXECUTIVO']}.docx"
+    )
+
+    files = mock_engine.process_file(path, max_workers=2, use_cache=False, stream_rows=True, rows_to_process=[1, 3])
+    assert files == ["B.docx", "D.docx"]
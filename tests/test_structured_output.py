@@ -0,0 +1,32 @@
+import os
+import sys
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.response_parser import SECTIONS
+from core.structured_output import parse_structured, structured_generation_config, RESPONSE_SCHEMA
+
+
+def test_valid_json_maps_every_section():
+    payload = {s: f"texto {s}" for s in SECTIONS[:5]}
+    payload["lacunas"] = ["- a", "- b"]
+    parsed = parse_structured("```json\n" + json.dumps(payload) + "\n```")
+    assert list(parsed) == SECTIONS
+    assert parsed["RESUMO_EXECUTIVO"] == "texto RESUMO_EXECUTIVO"
+    assert parsed["LACUNAS"] == "- a\n- b"
+    assert parsed["PROXIMOS_PASSOS"] == ""
+
+
+def test_invalid_or_incomplete_json_falls_back():
+    assert parse_structured("[RESUMO_EXECUTIVO]x[/RESUMO_EXECUTIVO]") is None
+    assert parse_structured('{"RESUMO_EXECUTIVO": "x", "LACUNAS": ') is None
+    assert parse_structured('["RESUMO_EXECUTIVO"]') is None
+    assert parse_structured(json.dumps({"RESUMO_EXECUTIVO": "x", "LACUNAS": "y"})) is None
+
+
+def test_generation_config_declares_schema():
+    config = structured_generation_config({"temperature": 0.1})
+    assert config["response_mime_type"] == "application/json"
+    assert config["response_schema"] is RESPONSE_SCHEMA
+    assert RESPONSE_SCHEMA["required"] == SECTIONS
@@ -0,0 +1,26 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.token_budget import estimate_tokens, fit_values, route_model, TRUNCATION_MARKER
+
+
+def test_fit_values_trims_only_the_longest_columns():
+    values = {"curta": "ok", "media": "m" * 350, "longa": "l" * 35000}
+    fitted, trimmed = fit_values(values, 300)
+    assert trimmed == ["longa"]
+    assert fitted["curta"] == "ok" and fitted["media"] == values["media"]
+    assert fitted["longa"].endswith(TRUNCATION_MARKER)
+    assert sum(estimate_tokens(v) for v in fitted.values()) <= 300
+
+def test_fit_values_noop_when_under_budget():
+    values = {"a": "x" * 10}
+    assert fit_values(values, 100) == (values, [])
+
+def test_route_model_picks_cheapest_that_fits():
+    chain = ["gemini-2.5-pro", "models/gemini-2.5-pro", "gemini-2.5-flash", "gemini-2.0-flash"]
+    assert route_model(chain, 5000, 4000) == "gemini-2.0-flash"
+    # 2.0-flash cannot emit 20k output tokens
+    assert route_model(chain, 5000, 20000) == "gemini-2.5-flash"
+    assert route_model(chain, 5_000_000, 100) is None
@@ -1,29 +1,12 @@
 import sys
 import os
-import pytest
 import logging
 from unittest.mock import MagicMock, patch
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.worker_engine import WorkerEngine
-
-# Mock internal dependencies to avoid side effects (file system, network)
-@pytest.fixture
-def mock_engine():
-    with patch("core.worker_engine.QSettings") as mock_settings:
-        # Mock settings to avoid registry access
-        mock_settings.return_value.value.return_value = "" 
-        
-        # Instantiate engine with a mock progress callback
-        engine = WorkerEngine(api_key="test_key", progress_callback=MagicMock())
-        
-        # Redirect logger to capture logs for inspection
-        engine.logger = logging.getLogger("TestWorkerEngine")
-        engine.logger.setLevel(logging.INFO) # Fix: Set level to INFO to capture info logs
-        engine.logger.handlers = [] # Clear handlers
-        
-        return engine
+from core.ai_backend import GenerationStream
+from core.fake_backend import FakeBackend
 
 def test_sanitize_filename_basics(mock_engine):
     assert mock_engine.sanitize_filename("valid_file.txt") == "valid_file.txt"
@@ -62,3 +45,301 @@ def test_log_sanitization(mock_engine):
     assert "Using key:" in log_content
     assert secret_key not in log_content # Key should NOT be visible
 
+
+def test_process_file_concurrent_keeps_row_order(mock_engine):
+    import time
+    import pandas as pd
+
+    df = pd.DataFrame({"Nome da Empresa": ["A", "B", "C", "D"]})
+    mock_engine.load_dataframe = MagicMock(return_value=df)
+    mock_engine.load_agent_prompt = MagicMock(return_value="prompt")
+
+    def slow_ai(prompt, config, **kwargs):
+        # First rows finish last
+        time.sleep(0.05 * (4 - "ABCD".index(prompt.strip()[-1])))
+        return prompt.strip()[-1]
+
+    mock_engine.call_ai_api = MagicMock(side_effect=slow_ai)
+    mock_engine.parse_response = MagicMock(side_effect=lambda r: {"RESUMO_EXECUTIVO": r})
+    mock_engine.generate_word_report = MagicMock(
+        side_effect=lambda parsed, *a, **kw: f"{parsed['RESUMO_EXECUTIVO']}.docx"
+    )
+
+    files = mock_engine.process_file("fake.csv", max_workers=4, use_cache=False)
+    assert files == ["A.docx", "B.docx", "C.docx", "D.docx"]
+
+def test_response_cache_roundtrip_and_eviction(tmp_path):
+    import time
+    from core.response_cache import ResponseCache
+
+    cache = ResponseCache(str(tmp_path), max_age_days=1, max_size_mb=1)
+    key = ResponseCache.make_key("prompt", '{"a": 1}', "gemini-2.5-pro", {"temperature": 0.1})
+    assert key == ResponseCache.make_key("prompt", '{"a": 1}', "gemini-2.5-pro", {"temperature": 0.1})
+    assert key != ResponseCache.make_key("prompt", '{"a": 1}', "gemini-2.5-pro", {"temperature": 0.2})
+
+    assert cache.get(key) is None
+    cache.put(key, "[RESUMO_EXECUTIVO]ok[/RESUMO_EXECUTIVO]")
+    assert cache.get(key) == "[RESUMO_EXECUTIVO]ok[/RESUMO_EXECUTIVO]"
+
+    # Expired entries are dropped
+    old = time.time() - 2 * 86400
+    os.utime(os.path.join(str(tmp_path), f"{key}.json"), (old, old))
+    assert cache.get(key) is None
+
+def test_response_cache_scans_only_past_the_cap_or_every_n_writes(tmp_path):
+    from core.response_cache import ResponseCache
+
+    cache = ResponseCache(str(tmp_path), max_size_mb=1, evict_every=50)
+    cache.evict = MagicMock(wraps=cache.evict)
+    for n in range(40):
+        cache.put(f"k{n}", "resposta")
+    assert cache.evict.call_count == 1  # first write only
+    for n in range(40, 60):
+        cache.put(f"k{n}", "resposta")
+    assert cache.evict.call_count == 2  # every 50 writes
+
+    # Passing the cap triggers a scan right away, which trims back to the limit
+    cache.put("grande", "x" * 1024 * 1024)
+    assert cache.evict.call_count == 3
+    assert sum(os.path.getsize(os.path.join(str(tmp_path), n)) for n in os.listdir(str(tmp_path))) <= 1024 * 1024
+
+def test_call_ai_cached_skips_api_on_hit(mock_engine, tmp_path):
+    import pandas as pd
+    from core.response_cache import ResponseCache
+
+    mock_engine.response_cache = ResponseCache(str(tmp_path))
+    mock_engine.call_ai_api = MagicMock(return_value="resposta")
+    row = pd.Series({"Empresa": "ACME"})
+    config = {"model": "gemini-2.5-pro", "temperature": 0.1, "top_p": 0.9, "max_output_tokens": 6144}
+
+    assert mock_engine.call_ai_cached("p\nACME", "p", row, config) == "resposta"
+    assert mock_engine.call_ai_cached("p\nACME", "p", row, config) == "resposta"
+    assert mock_engine.call_ai_api.call_count == 1
+
+    # Per-run bypass
+    mock_engine.call_ai_cached("p\nACME", "p", row, dict(config, use_cache=False))
+    assert mock_engine.call_ai_api.call_count == 2
+
+def test_call_ai_api_remembers_not_found_models(mock_engine):
+    mock_engine.backend = FakeBackend(not_found_models={"gemini-3-pro-preview"})
+    assert mock_engine.call_ai_api("p", {"model": "gemini-3-pro-preview"}).startswith("[RESUMO_EXECUTIVO]")
+    assert mock_engine.call_ai_api("p", {"model": "gemini-3-pro-preview"}).startswith("[RESUMO_EXECUTIVO]")
+    # Both spellings 404'd once on the first row; the second row skipped them
+    assert mock_engine.backend.calls["gemini-3-pro-preview"] == 2
+    assert mock_engine.backend.calls["gemini-2.5-pro"] == 2
+
+def test_call_ai_api_retries_same_model_after_429(mock_engine):
+    answers = iter([Exception("429 ResourceExhausted, retry in 0.01s"), "ok"])
+
+    def respond(contents):
+        answer = next(answers)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    mock_engine.backend = FakeBackend(responses=respond)
+    assert mock_engine.call_ai_api("p", {"model": "gemini-2.5-pro"}) == "ok"
+    assert mock_engine.backend.calls["gemini-2.5-pro"] == 2
+
+def test_call_ai_api_streaming_reports_sections(mock_engine):
+    mock_engine.backend = FakeBackend(responses=lambda c: "[LACUNAS]x[/LACUNAS][RISCOS_ATUAIS]y[/RISCOS_ATUAIS]")
+    text = mock_engine.call_ai_api("p", {"model": "gemini-2.5-pro", "stream": True})
+    assert text == "[LACUNAS]x[/LACUNAS][RISCOS_ATUAIS]y[/RISCOS_ATUAIS]"
+    messages = [c.args[0] for c in mock_engine.progress_callback.call_args_list]
+    assert any("LACUNAS (1/14)" in m for m in messages)
+    assert any("RISCOS_ATUAIS (2/14)" in m for m in messages)
+
+def test_call_ai_api_streaming_aborts_on_cancel(mock_engine):
+    cancelled = {"flag": False}
+
+    class CancelMidStream(GenerationStream):
+        def __init__(self):
+            self.cancel = MagicMock()
+
+        def __iter__(self):
+            yield "[LACUNAS]x"
+            cancelled["flag"] = True
+            yield "[/LACUNAS]"
+            raise AssertionError("stream consumed after cancellation")
+
+    stream = CancelMidStream()
+    mock_engine.backend = FakeBackend()
+    mock_engine.backend.stream = MagicMock(return_value=stream)
+    mock_engine.set_cancellation_callback(lambda: cancelled["flag"])
+    assert mock_engine.call_ai_api("p", {"model": "gemini-2.5-pro", "stream": True}) is None
+    assert mock_engine.backend.stream.call_count == 1
+    stream.cancel.assert_called_once()
+
+def test_process_file_batches_rows_and_falls_back_on_missing_slice(mock_engine):
+    import pandas as pd
+
+    df = pd.DataFrame({"Nome da Empresa": ["A", "B", "C"]})
+    mock_engine.load_dataframe = MagicMock(return_value=df)
+    mock_engine.load_agent_prompt = MagicMock(return_value="prompt")
+    mock_engine._expected_report_tokens = MagicMock(return_value=100)
+    sections = "[RESUMO_EXECUTIVO]{0}[/RESUMO_EXECUTIVO][LACUNAS]x[/LACUNAS][RISCOS_ATUAIS]y[/RISCOS_ATUAIS]"
+
+    def fake_ai(prompt, config, **kwargs):
+        if "EMPRESA 3" in prompt:
+            # Slice for the 2nd company is missing
+            return (f"<<<EMPRESA 1>>>{sections.format('A')}<<<FIM EMPRESA 1>>>"
+                    f"<<<EMPRESA 3>>>{sections.format('C')}<<<FIM EMPRESA 3>>>")
+        return sections.format("B-single")
+
+    mock_engine.call_ai_api = MagicMock(side_effect=fake_ai)
+    mock_engine.generate_word_report = MagicMock(
+        side_effect=lambda parsed, *a, **kw: f"{parsed['RESUMO_EXECUTIVO']}.docx"
+    )
+
+    mock_engine._prepare_row = MagicMock(wraps=mock_engine._prepare_row)
+
+    files = mock_engine.process_file("fake.csv", batch_size=3, use_cache=False)
+    assert files == ["A.docx", "B-single.docx", "C.docx"]
+    assert mock_engine.call_ai_api.call_count == 2
+    # The fallback reuses the prepared row: one "Processando" line and one budget trim per row
+    assert [c.args[0] for c in mock_engine._prepare_row.call_args_list] == [0, 1, 2]
+
+def test_fit_row_to_budget_trims_oversized_columns(mock_engine):
+    import pandas as pd
+
+    row = pd.Series({"Empresa": "ACME", "Comentários": "texto longo " * 5000})
+    config = {"model": "gemini-2.5-pro", "input_token_budget": 2000}
+    fitted, input_tokens = mock_engine._fit_row_to_budget("prompt", row, config)
+    assert fitted["Empresa"] == "ACME"
+    assert len(fitted["Comentários"]) < len(row["Comentários"])
+    assert input_tokens <= 2000
+    assert row["Comentários"].startswith("texto")  # original row untouched
+    assert mock_engine._fit_row_to_budget("prompt", row, dict(config, input_token_budget=None))[0] is row
+
+
+def test_exact_token_count_calls_the_api_once_per_prompt(mock_engine, monkeypatch):
+    import pandas as pd
+
+    monkeypatch.setenv("XALQ_EXACT_TOKEN_COUNT", "true")
+    mock_engine.backend.count_tokens = MagicMock(return_value=500)
+    config = {"model": "gemini-2.5-pro", "input_token_budget": 32000, "routing": True}
+    for company in ("A", "B", "C"):
+        row = pd.Series({"Empresa": company, "Comentários": "texto"})
+        fitted, input_tokens = mock_engine._fit_row_to_budget("prompt fixo", row, config)
+        routed = mock_engine._route_config(input_tokens, config)
+        assert routed["model"]
+    # Prompt counted once; row sizes and routing reuse it
+    mock_engine.backend.count_tokens.assert_called_once_with("gemini-2.5-pro", "prompt fixo")
+
+def test_call_ai_api_hedges_slow_primary(mock_engine):
+    import time
+
+    class SlowPrimaryBackend(FakeBackend):
+        def generate(self, model_name, contents, generation_config, timeout=600, cached_prefix=None):
+            # The hedge is slower than one cancellation poll (0.25s), the primary much slower
+            time.sleep(1.5 if model_name == "gemini-2.5-pro" else 0.6)
+            return super().generate(model_name, contents, generation_config, timeout, cached_prefix)
+
+    mock_engine.backend = SlowPrimaryBackend()
+    config = {"model": "gemini-2.5-pro", "hedge": True, "hedge_after": 0.2, "row_deadline": 30}
+    started = time.monotonic()
+    text = mock_engine.call_ai_api("p", config)
+    assert time.monotonic() - started < 1.2
+    assert text.startswith("[RESUMO_EXECUTIVO]")
+    # Next distinct model in the chain answered ('models/gemini-2.5-pro' is the same model)
+    assert mock_engine.backend.calls["gemini-3-pro-preview"] == 1
+    # The hedge ran on the row's budget, not on the hedge trigger time
+    assert mock_engine.model_health.snapshot()["gemini-3-pro-preview"]["error_rate"] == 0.0
+    # The cancelled primary still leaves a (censored) latency sample of at least the threshold
+    (censored,) = mock_engine.model_health.latencies("gemini-2.5-pro")
+    assert 0.2 <= censored < 1.5
+
+def test_hedge_is_not_used_up_by_a_skipped_primary(mock_engine):
+    acquire = mock_engine.model_health.acquire
+    # The primary's circuit opens between ordering and the request
+    mock_engine.model_health.acquire = lambda name: name != "gemini-2.5-pro" and acquire(name)
+    mock_engine._generate_hedged = MagicMock(wraps=mock_engine._generate_hedged)
+    config = {"model": "gemini-2.5-pro", "hedge": True, "hedge_after": 5, "row_deadline": 30}
+    assert mock_engine.call_ai_api("p", config).startswith("[RESUMO_EXECUTIVO]")
+    # The next model still gets its hedge
+    assert [c.args[0] for c in mock_engine._generate_hedged.call_args_list] == [
+        "gemini-2.5-pro", "models/gemini-2.5-pro"
+    ]
+
+def test_hedge_threshold_uses_latency_percentile(mock_engine):
+    for latency in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]:
+        mock_engine.model_health.record_success("gemini-2.5-pro", latency)
+    assert mock_engine._hedge_threshold("gemini-2.5-pro", {"hedge_percentile": 90}) == 10
+    assert mock_engine._hedge_threshold("gemini-2.5-pro", {"hedge_percentile": 50}) == 6
+    assert mock_engine._hedge_threshold("gemini-2.0-flash", {"hedge_after": 42}) == 42
+
+def test_call_ai_api_row_deadline_spans_fallback_chain(mock_engine):
+    import time
+    from core.fake_backend import constant
+
+    mock_engine.backend = FakeBackend(latency=constant(5.0))
+    started = time.monotonic()
+    assert mock_engine.call_ai_api("p", {"model": "gemini-2.5-pro", "row_deadline": 0.5}) is None
+    assert time.monotonic() - started < 1.5
+    mock_engine.backend.interrupt()
+    # Budget exhausted on the primary: fallback models were never tried
+    assert set(mock_engine.backend.calls) <= {"gemini-2.5-pro"}
+
+def test_backoff_past_the_row_deadline_moves_to_the_next_model(mock_engine):
+    from core.rate_limiter import RetryPolicy
+
+    class UnavailablePrimary(FakeBackend):
+        def generate(self, model_name, contents, generation_config, timeout=600, cached_prefix=None):
+            if "2.5-pro" in model_name:
+                raise Exception("503 Service Unavailable")
+            return super().generate(model_name, contents, generation_config, timeout, cached_prefix)
+
+    mock_engine.backend = UnavailablePrimary()
+    mock_engine.retry_policy = RetryPolicy(base_delay=60.0, jitter=0)
+    text = mock_engine.call_ai_api("p", {"model": "gemini-2.5-pro", "row_deadline": 30})
+    assert text.startswith("[RESUMO_EXECUTIVO]")
+    assert mock_engine.backend.calls["gemini-3-pro-preview"] == 1
+    assert not mock_engine._row_outcome.timed_out
+
+    # Same backoff on every model: the row ends as timed out, not as a generic failure
+    mock_engine.backend = FakeBackend(error_rate=1.0)
+    assert mock_engine.call_ai_api("p", {"model": "gemini-2.5-pro", "row_deadline": 30}) is None
+    assert mock_engine._row_outcome.timed_out
+
+def test_cooldown_wait_is_bounded_by_the_row_deadline(mock_engine):
+    import time
+
+    for name in mock_engine._candidate_models("gemini-2.5-pro"):
+        for _ in range(3):
+            mock_engine.model_health.record_failure(name)
+    started = time.monotonic()
+    assert mock_engine.call_ai_api("p", {"model": "gemini-2.5-pro", "row_deadline": 0.5}) is None
+    assert time.monotonic() - started < 1.5
+    assert mock_engine._row_outcome.timed_out
+
+def test_call_ai_api_cancels_blocking_call_in_flight(mock_engine):
+    import time
+    import threading
+    from core.fake_backend import constant
+
+    mock_engine.backend = FakeBackend(latency=constant(5.0))
+    stop = threading.Event()
+    mock_engine.set_cancellation_callback(stop.is_set)
+    threading.Timer(0.2, stop.set).start()
+    started = time.monotonic()
+    assert mock_engine.call_ai_api("p", {"model": "gemini-2.5-pro"}) is None
+    assert time.monotonic() - started < 1.0
+    mock_engine.backend.interrupt()
+
+def test_structured_mode_feeds_json_sections_without_text_parsing(mock_engine):
+    text = mock_engine.call_ai_api("p", {"model": "gemini-2.5-pro", "structured": True})
+    assert text.startswith("{")
+    with patch("core.worker_engine.parse_tagged", side_effect=AssertionError("text parser used")):
+        parsed = mock_engine.parse_response(text)
+    assert all(parsed.values()) and len(parsed) == 14
+
+def test_process_file_renders_reports_in_process_pool_in_row_order(mock_engine, tmp_path):
+    import pandas as pd
+
+    df = pd.DataFrame({"Nome da Empresa": ["A", "B", "C"]})
+    mock_engine.load_dataframe = MagicMock(return_value=df)
+    mock_engine.load_agent_prompt = MagicMock(return_value="prompt")
+    mock_engine.output_dir = str(tmp_path)
+    files = mock_engine.process_file("dummy.csv", max_workers=2, use_cache=False, render_workers=2)
+    assert [os.path.basename(f).split("_")[0] for f in files] == ["A", "B", "C"]
+    assert all(os.path.exists(f) for f in files)
@@ -6,13 +6,14 @@ from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QFileDialog, QComboBox,
     QTextEdit, QProgressBar, QMessageBox, QFrame,
-    QLineEdit, QStatusBar
+    QLineEdit, QStatusBar, QCheckBox, QListWidget, QListWidgetItem, QAbstractItemView
 )
 from PySide6.QtCore import Qt, QThread, QTimer
 from PySide6.QtGui import QPixmap
 
 from core.worker_engine import WorkerEngine
 from core.processing_worker import ProcessingWorker
+from core.prompt_sync_worker import PromptSyncWorker
 from core.updater import Updater
 from ui.settings_dialog import SettingsDialog
 from ui.resource_monitor import ResourceMonitor
@@ -226,15 +227,30 @@ class MainWindow(QMainWindow):
         file_row.addWidget(btn_file)
         card_layout.addLayout(file_row)
 
-        # Company selection row
+        # Company selection: none selected = process every row
         company_row = QHBoxLayout()
-        company_row.addWidget(QLabel("Empresa:"))
-        self.combo_company = QComboBox()
-        self.combo_company.addItem("Todas (Processar tudo)")
-        self.combo_company.setMinimumWidth(300)
-        company_row.addWidget(self.combo_company, 1)
+        company_row.addWidget(QLabel("Empresas:"))
+        self.company_filter = QLineEdit()
+        self.company_filter.setPlaceholderText("Filtrar empresas... (nenhuma selecionada = processar todas)")
+        self.company_filter.textChanged.connect(self.filter_companies)
+        company_row.addWidget(self.company_filter, 1)
+        self.lbl_company_selection = QLabel("Todas")
+        company_row.addWidget(self.lbl_company_selection)
         card_layout.addLayout(company_row)
 
+        self.list_company = QListWidget()
+        self.list_company.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.list_company.setMinimumWidth(300)
+        self.list_company.setMaximumHeight(140)
+        self.list_company.itemSelectionChanged.connect(self.update_company_selection)
+        card_layout.addWidget(self.list_company)
+
+        # Column roles detected in the file (company, timestamp, prompt selector)
+        self.lbl_column_roles = QLabel("")
+        self.lbl_column_roles.setStyleSheet("color: #64748B; font-size: 11px;")
+        self.lbl_column_roles.hide()
+        card_layout.addWidget(self.lbl_column_roles)
+
         # Options Row
         opts_row = QHBoxLayout()
 
@@ -256,6 +272,10 @@ class MainWindow(QMainWindow):
         opts_row.addLayout(type_col)
 
         card_layout.addLayout(opts_row)
+
+        # Cache bypass (per run)
+        self.chk_bypass_cache = QCheckBox("Ignorar cache de respostas (forçar nova análise da IA)")
+        card_layout.addWidget(self.chk_bypass_cache)
         content_layout.addWidget(config_frame)
 
         # Buttons Layout
@@ -265,8 +285,16 @@ class MainWindow(QMainWindow):
         self.btn_process = QPushButton("▶  Iniciar Processamento")
         self.btn_process.setObjectName("btnStart")
         self.btn_process.setFixedHeight(50)
-        self.btn_process.clicked.connect(self.start_processing)
+        self.btn_process.clicked.connect(lambda: self.start_processing())
         btn_layout.addWidget(self.btn_process)
+
+        # Resume Button: continues the last interrupted run of the same file (see core/job_journal.py)
+        self.btn_resume = QPushButton("↻ Retomar")
+        self.btn_resume.setFixedHeight(50)
+        self.btn_resume.setToolTip("Continua o último processamento interrompido deste arquivo, "
+                                   "pulando as empresas já concluídas")
+        self.btn_resume.clicked.connect(lambda: self.start_processing(resume=True))
+        btn_layout.addWidget(self.btn_resume)
         
         # Cancel Button
         self.btn_cancel = QPushButton("⏹ Cancelar")
@@ -333,14 +361,12 @@ class MainWindow(QMainWindow):
 
     def load_prompts_from_disk(self):
         """Load .md prompt files from prompts/ into combo box."""
-        prompts_dir = os.path.join(self.project_root, 'prompts')
         try:
-            files = sorted([f for f in os.listdir(prompts_dir) if f.endswith('.md')])
-            if files:
-                for f in files:
-                    name = os.path.splitext(f)[0]
+            names = self.worker_engine.prompts.names()
+            if names:
+                for name in names:
                     self.combo_prompt_type.addItem(name)
-                self.log(f"{len(files)} prompts carregados de disco.", "success")
+                self.log(f"{len(names)} prompts carregados de disco.", "success")
         except Exception as e:
             self.log(f"Erro ao listar prompts: {e}", "error")
 
@@ -357,14 +383,37 @@ class MainWindow(QMainWindow):
             self.update_status_footer("error")
 
     def check_remote_version(self):
+        manifest_version = None
         try:
             has_update, new_v = self.updater.check_for_updates()
+            if isinstance(new_v, dict):
+                manifest_version = new_v.get('assets', {}).get('prompt_manifest_v')
             if has_update:
                 version_str = new_v.get('version', '?') if isinstance(new_v, dict) else str(new_v)
                 self.update_banner.setText(f"🚀 Nova versão disponível ({version_str})! Reinicie para aplicar.")
                 self.update_banner.show()
         except Exception as e:
             print(f"Update check failed: {e}")
+        self.start_prompt_sync(manifest_version)
+
+    def start_prompt_sync(self, manifest_version=None):
+        """Downloads changed prompts in the background (see core/prompt_sync.py)."""
+        self.prompt_sync_thread = QThread()
+        self.prompt_sync_worker = PromptSyncWorker(manifest_version)
+        self.prompt_sync_worker.moveToThread(self.prompt_sync_thread)
+        self.prompt_sync_thread.started.connect(self.prompt_sync_worker.run)
+        self.prompt_sync_worker.progress.connect(self.update_log_from_worker)
+        self.prompt_sync_worker.finished.connect(self.on_prompt_sync_finished)
+        self.prompt_sync_thread.start()
+
+    def on_prompt_sync_finished(self, updated):
+        self.prompt_sync_thread.quit()
+        self.prompt_sync_thread.wait()
+        # New prompts show up in the selector without restarting
+        known = {self.combo_prompt_type.itemText(i) for i in range(self.combo_prompt_type.count())}
+        for name in self.worker_engine.prompts.names():
+            if name not in known:
+                self.combo_prompt_type.addItem(name)
 
     def check_github_connectivity(self):
         try:
@@ -447,8 +496,9 @@ class MainWindow(QMainWindow):
             self.log("⚠️ Cancelamento solicitado pelo usuário...", "warning")
             self.btn_cancel.setEnabled(False)
             self.btn_process.setEnabled(False) # Wait for finish signal to re-enable
+            self.btn_resume.setEnabled(False)
 
-    def start_processing(self):
+    def start_processing(self, resume=False):
         file_path = self.file_path_input.text()
         if not file_path:
             QMessageBox.warning(self, "Aviso", "Selecione um arquivo primeiro.")
@@ -460,23 +510,22 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Aviso", "Selecione um tipo de análise (prompt) antes de processar.")
             return
 
-        # Company selection -> rows_to_process
-        rows_to_process = None
-        company_sel = self.combo_company.currentText()
-        if "Todas" not in company_sel:
-            try:
-                row_idx = int(company_sel.split(":")[0].strip())
-                rows_to_process = [row_idx]
-            except ValueError:
-                pass
+        # Company selection -> rows_to_process (row indexes; None = all)
+        rows_to_process = self.selected_rows() or None
 
         self.btn_process.setEnabled(False)
+        self.btn_resume.setEnabled(False)
         self.btn_cancel.setEnabled(True) # Enable Cancel
         self.progress_bar.setRange(0, 0)
         self.update_status_footer("processing")
 
         self.processing_thread = QThread()
-        self.worker = ProcessingWorker(file_path, model, rows_to_process, prompt_type_override=prompt_type)
+        self.worker = ProcessingWorker(
+            file_path, model, rows_to_process,
+            prompt_type_override=prompt_type,
+            use_cache=not self.chk_bypass_cache.isChecked(),
+            resume=resume
+        )
         self.worker.moveToThread(self.processing_thread)
 
         self.processing_thread.started.connect(self.worker.run)
@@ -513,6 +562,7 @@ class MainWindow(QMainWindow):
     def on_processing_finished(self):
         self._stop_elapsed_timer()
         self.btn_process.setEnabled(True)
+        self.btn_resume.setEnabled(True)
         self.btn_cancel.setEnabled(False)
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(100)
@@ -536,6 +586,7 @@ class MainWindow(QMainWindow):
     def on_processing_error(self, err_msg):
         self._stop_elapsed_timer()
         self.btn_process.setEnabled(True)
+        self.btn_resume.setEnabled(True)
         self.btn_cancel.setEnabled(False)
         self.progress_bar.setRange(0, 100)
         self.progress_bar.setValue(0)
@@ -592,16 +643,42 @@ class MainWindow(QMainWindow):
                     self.select_file_logic(f)
                     break
 
+    def selected_rows(self):
+        """Row indexes of the selected companies, in file order."""
+        return sorted(item.data(Qt.UserRole) for item in self.list_company.selectedItems())
+
+    def update_company_selection(self):
+        count = len(self.list_company.selectedItems())
+        self.lbl_company_selection.setText(f"{count} selecionada(s)" if count else "Todas")
+
+    def filter_companies(self, text):
+        text = text.strip().lower()
+        self.list_company.setUpdatesEnabled(False)
+        for i in range(self.list_company.count()):
+            item = self.list_company.item(i)
+            item.setHidden(bool(text) and text not in item.text().lower())
+        self.list_company.setUpdatesEnabled(True)
+
     def select_file_logic(self, f):
         # Shared logic for file selection
-        self.combo_company.clear()
-        self.combo_company.addItem("Todas (Processar tudo)")
+        self.list_company.clear()
+        self.company_filter.clear()
+        self.update_company_selection()
+        self.lbl_column_roles.hide()
         try:
             df, items = self.worker_engine.load_data(f)
             if items:
-                for item in items:
-                    self.combo_company.addItem(item)
+                self.list_company.setUpdatesEnabled(False)
+                for row_idx, item in zip(df.index, items):
+                    list_item = QListWidgetItem(item)
+                    list_item.setData(Qt.UserRole, int(row_idx))
+                    self.list_company.addItem(list_item)
+                self.list_company.setUpdatesEnabled(True)
                 self.log(f"{len(items)} empresas encontradas.", "success")
+            if df is not None:
+                roles = self.worker_engine.column_roles(df.columns)
+                self.lbl_column_roles.setText(f"Colunas detectadas — {roles.describe()}")
+                self.lbl_column_roles.show()
         except Exception as e:
             self.log(f"Erro ao listar empresas: {e}", "error")
 